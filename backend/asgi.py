@@ -0,0 +1,140 @@
+"""ASGI entry point for the OpenLearnX backend.
+
+The async test-flow routes run natively on the worker's event loop, so one
+worker can hold many in-flight motor calls, and live exam streams (SSE) are
+served there too, so open streams don't hold thread-pool threads. Every
+other route is served by the Flask app through WSGIMiddleware (in a thread
+pool), unchanged.
+
+Run with:  gunicorn -c gunicorn.conf.py asgi:app   (uvicorn worker class)
+      or:  uvicorn asgi:app --port 5000
+"""
+import asyncio
+import logging
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from main import app as flask_app, CORS_OPTIONS
+from routes.test_flow import get_user_from_token, start_test_flow, submit_answer_flow
+from routes.exam import open_exam_stream, exam_snapshot, EXAM_STREAM_HEADERS
+from services.exam_events import exam_events
+
+logger = logging.getLogger(__name__)
+
+
+def get_mongo_service():
+    return flask_app.config.get('MONGO_SERVICE')
+
+
+def authenticated_user(request: Request):
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    return get_user_from_token(token, flask_app.config['SECRET_KEY'])
+
+
+async def read_json(request: Request):
+    try:
+        return await request.json()
+    except Exception:
+        return None
+
+
+# ===================================================================
+# ✅ Native async routes (/api/test)
+# ===================================================================
+
+def native_api():
+    """Sub-application for native async routes, with the Flask app's CORS policy"""
+    api = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
+    api.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_OPTIONS["origins"],
+        allow_methods=CORS_OPTIONS["methods"],
+        allow_headers=CORS_OPTIONS["allow_headers"],
+        allow_credentials=CORS_OPTIONS["supports_credentials"],
+        expose_headers=CORS_OPTIONS["expose_headers"],
+    )
+    return api
+
+
+test_api = native_api()
+
+
+@test_api.post('/start')
+async def start_test(request: Request):
+    """Start a new test session"""
+    user_id = authenticated_user(request)
+    if not user_id:
+        return JSONResponse({"error": "Authentication required"}, status_code=401)
+
+    payload, status = await start_test_flow(get_mongo_service(), user_id, await read_json(request))
+    return JSONResponse(payload, status_code=status)
+
+
+@test_api.post('/answer')
+async def submit_answer(request: Request):
+    """Submit answer and get feedback"""
+    user_id = authenticated_user(request)
+    if not user_id:
+        return JSONResponse({"error": "Authentication required"}, status_code=401)
+
+    payload, status = await submit_answer_flow(get_mongo_service(), user_id, await read_json(request))
+    return JSONResponse(payload, status_code=status)
+
+
+# ===================================================================
+# ✅ Native live exam streams (/api/exam/stream)
+# ===================================================================
+
+exam_stream_api = native_api()
+
+
+@exam_stream_api.get('/{exam_code}')
+async def stream_exam(exam_code: str, request: Request):
+    """Live leaderboard / host dashboard events for an exam (Server-Sent Events)"""
+    exam_code = exam_code.upper()
+    last_event_id = request.headers.get('last-event-id') or request.query_params.get('last_event_id')
+    stream, error, status = await asyncio.to_thread(
+        open_exam_stream, exam_code, last_event_id, asyncio.get_running_loop()
+    )
+    if stream is None:
+        headers = {"Retry-After": str(error["retry_after"])} if status == 429 else None
+        return JSONResponse(error, status_code=status, headers=headers)
+
+    return StreamingResponse(exam_events.aframes(stream, lambda: exam_snapshot(exam_code)),
+                             media_type='text/event-stream', headers=EXAM_STREAM_HEADERS)
+
+
+# ===================================================================
+# ✅ Application: async routes first, everything else via Flask
+# ===================================================================
+
+app = FastAPI(title="OpenLearnX API", docs_url=None, redoc_url=None, openapi_url=None)
+
+
+@app.on_event("startup")
+async def startup():
+    """Check the motor client from this worker's event loop, and the exam event source"""
+    mongo_service = get_mongo_service()
+    if mongo_service is not None:
+        try:
+            await mongo_service.client.admin.command('ping')
+            logger.info("✅ Async MongoDB client ready")
+        except Exception as e:
+            logger.warning(f"⚠️ Async MongoDB client not reachable yet: {e}")
+    # Change streams need a replica set; a standalone server falls back to in-process events
+    await asyncio.to_thread(exam_events.check_source)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    mongo_service = get_mongo_service()
+    if mongo_service is not None:
+        await mongo_service.close_connection()
+
+
+app.mount('/api/test', test_api)
+app.mount('/api/exam/stream', exam_stream_api)
+app.mount('/', WSGIMiddleware(flask_app))
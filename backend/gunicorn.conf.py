@@ -0,0 +1,51 @@
+"""Gunicorn configuration for the OpenLearnX backend.
+
+Database clients are created per worker after the fork, warmed up before
+the worker accepts requests, and closed when the worker exits.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+# Loaded before the app, so services sizing themselves by worker count
+# (exam_events picks its event source from it) see the configured value
+os.environ['GUNICORN_WORKERS'] = str(workers)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# asgi:app needs the uvicorn worker; set GUNICORN_WORKER_CLASS=sync to serve main:app as plain WSGI
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+
+# Import the app once in the master so workers share its memory; this is
+# safe because no MongoClient is opened at import time (see mongo_registry).
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# How long a worker waits for MongoDB before reporting ready anyway
+mongo_warmup_timeout = float(os.getenv('MONGO_WARMUP_TIMEOUT', 10))
+
+
+def post_fork(server, worker):
+    """Drop any client state inherited from the master"""
+    from services.mongo_registry import mongo_registry
+    mongo_registry.reset_after_fork()
+
+
+def post_worker_init(worker):
+    """Warm the worker's MongoDB pool and run start-up self-tests before it accepts requests"""
+    from main import run_startup_checks
+    try:
+        run_startup_checks(warmup_timeout=mongo_warmup_timeout)
+    except Exception as e:
+        worker.log.warning(f"Start-up checks failed for worker {worker.pid}: {e}")
+
+
+def worker_exit(server, worker):
+    """Stop grading and live exam streams, flush buffered counters, then close the worker's MongoDB pool cleanly"""
+    from services.counter_buffer import counter_buffer
+    from services.exam_events import exam_events
+    from services.grading_queue import grading_queue
+    from services.mongo_registry import mongo_registry
+    grading_queue.stop()
+    exam_events.stop()
+    counter_buffer.stop()
+    mongo_registry.close()
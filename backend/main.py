@@ -9,7 +9,6 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity, create_access_token
 from dotenv import load_dotenv
-from pymongo import MongoClient
 from bson import ObjectId
 import hashlib
 import time
@@ -28,6 +27,20 @@ load_dotenv()
 # Services
 from mongo_service import MongoService
 from web3_service import Web3Service
+from services.mongo_registry import mongo_registry
+from services.index_manager import apply_indexes
+from services.counter_buffer import counter_buffer
+from services.read_routing import read_router
+from services.response_cache import response_cache
+from services.rank_index import xp_rank_index
+from services.leaderboard_snapshot import leaderboard_snapshot
+from services.skill_taxonomy import skill_taxonomy
+from services.request_fanout import request_fanout
+# Exam grading engine and submission queue (calculate_dynamic_score stays importable from main)
+from services.grading_engine import grading_engine, calculate_dynamic_score  # noqa: F401
+from services.grading_queue import grading_queue
+from services.grading_cache import grading_cache
+from services.exam_events import exam_events
 
 # ✅ CORRECTED: Import dashboard blueprint with comprehensive endpoints
 try:
@@ -42,6 +55,7 @@ except ImportError:
 # ✅ CRITICAL: Import certificate blueprint
 try:
     from routes.certificate import bp as certificate_bp
+    from routes.certificate import run_certificate_startup_checks, certificate_store_status
     CERTIFICATE_BLUEPRINT_AVAILABLE = True
     print("✅ Certificate blueprint with all fixes available")
 except ImportError:
@@ -131,6 +145,7 @@ app.config.update(
     # ✅ Dashboard specific configs
     DASHBOARD_CACHE_TIMEOUT=int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 300)),
     MAX_ACTIVITY_RECORDS=int(os.getenv('MAX_ACTIVITY_RECORDS', 1000)),
+    DASHBOARD_BOOTSTRAP_TIMEOUT=float(os.getenv('DASHBOARD_BOOTSTRAP_TIMEOUT', 2.0)),
     # ✅ Certificate encryption key
     AES_ENCRYPTION_KEY=os.getenv('AES_ENCRYPTION_KEY')
 )
@@ -138,8 +153,8 @@ app.config.update(
 # ✅ Initialize JWT with your configuration
 jwt = JWTManager(app)
 
-# ✅ ENHANCED CORS configuration for professional dashboard
-CORS(app, resources={r"/api/*": {
+# ✅ ENHANCED CORS configuration for professional dashboard (shared with asgi.py)
+CORS_OPTIONS = {
     "origins": [
         "http://localhost:3000", 
         "http://127.0.0.1:3000",
@@ -155,11 +170,14 @@ CORS(app, resources={r"/api/*": {
         "X-Requested-With",
         "X-User-ID",  # Custom header for user identification
         "X-Session-Token",
-        "X-Firebase-Token"  # Firebase authentication
+        "X-Firebase-Token",  # Firebase authentication
+        "If-None-Match",  # Dashboard cache revalidation
+        "Last-Event-ID"  # Live exam stream resume
     ],
     "supports_credentials": True,
-    "expose_headers": ["Authorization", "X-Total-Count", "X-Rate-Limit"]
-}})
+    "expose_headers": ["Authorization", "X-Total-Count", "X-Rate-Limit", "ETag", "X-Cache", "Server-Timing", "Retry-After"]
+}
+CORS(app, resources={r"/api/*": CORS_OPTIONS})
 
 # Enhanced logging with your configuration
 logging.basicConfig(
@@ -177,6 +195,9 @@ def initialize_services():
     """Initialize all services with your environment configuration"""
     services_initialized = {}
     
+    # Shared pymongo client registry (built lazily in each worker)
+    mongo_registry.configure(uri=app.config['MONGODB_URI'])
+    
     # MongoDB Service with your URI
     try:
         mongo_service = MongoService(app.config['MONGODB_URI'])
@@ -260,15 +281,37 @@ def register_blueprints():
 # Register blueprints
 blueprints_registered, blueprints_failed = register_blueprints()
 
-# ✅ FIXED: Database connection with proper None handling
+# ✅ Per-worker readiness: warm the pool and run one-off self-tests
+def run_startup_checks(warmup_timeout=10.0):
+    """Warm MongoDB and run start-up self-tests before serving requests"""
+    mongo_ready = mongo_registry.warm_up(timeout=warmup_timeout)
+    if mongo_ready and os.getenv('MONGO_AUTO_INDEX', 'true').lower() == 'true':
+        try:
+            apply_indexes(mongo_registry.get_db())
+        except Exception as e:
+            logger.error(f"❌ Index spec not applied: {e}")
+    if mongo_ready:
+        # Start the background build so the first dashboard load doesn't fall back to a count
+        xp_rank_index.ensure_fresh()
+        # Pick up submissions queued before this worker started
+        grading_queue.ensure_started()
+        # Change streams need a replica set; a standalone server falls back to in-process events
+        exam_events.check_source()
+    if mongo_ready and CERTIFICATE_BLUEPRINT_AVAILABLE:
+        if run_certificate_startup_checks():
+            logger.info("✅ Certificate store self-test passed")
+        else:
+            logger.error("❌ Certificate store self-test failed")
+    return mongo_ready
+
+# ✅ Database handle from the process-wide pooled client
 def get_db():
-    """Get MongoDB database connection"""
+    """Get MongoDB database connection (None if the liveness probe reports it down)"""
     try:
-        client = MongoClient(app.config['MONGODB_URI'])
-        db = client.openlearnx
-        # Test the connection
-        db.command('ismaster')
-        return db
+        if not mongo_registry.is_available():
+            logger.error(f"Database unavailable: {mongo_registry.status().get('last_error')}")
+            return None
+        return mongo_registry.current_db()
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
         return None
@@ -321,10 +364,11 @@ def wallet_login():
             }
             db.users.insert_one(user)
         else:
-            # Update last login
-            db.users.update_one(
+            # Update last login (buffered write-behind)
+            counter_buffer.record(
+                "users",
                 {"wallet_address": address},
-                {"$set": {"last_login": datetime.now().isoformat()}}
+                max_fields={"last_login": datetime.now().isoformat()}
             )
             user_id = user['user_id']
         
@@ -395,15 +439,15 @@ def api_health():
     collections_count = {}
     if db is not None:
         try:
-            db.command('ismaster')
+            # Metadata counts - no collection scans on every health check
             collections_count = {
-                "users": db.users.count_documents({}),
-                "user_stats": db.user_stats.count_documents({}),
-                "user_courses": db.user_courses.count_documents({}),
-                "user_quizzes": db.user_quizzes.count_documents({}),
-                "user_submissions": db.user_submissions.count_documents({}),
-                "user_achievements": db.user_achievements.count_documents({}),
-                "certificates": db.certificates.count_documents({})
+                "users": db.users.estimated_document_count(),
+                "user_stats": db.user_stats.estimated_document_count(),
+                "user_courses": db.user_courses.estimated_document_count(),
+                "user_quizzes": db.user_quizzes.estimated_document_count(),
+                "user_submissions": db.user_submissions.estimated_document_count(),
+                "user_achievements": db.user_achievements.estimated_document_count(),
+                "certificates": db.certificates.estimated_document_count()
             }
         except Exception as e:
             db_status = f"error: {str(e)}"
@@ -426,6 +470,19 @@ def api_health():
             "aes256_encryption": CERTIFICATE_BLUEPRINT_AVAILABLE
         },
         "collections": collections_count,
+        "mongodb_pool": mongo_registry.status(),
+        "counter_buffer": counter_buffer.stats(),
+        "read_routing": read_router.stats(),
+        "dashboard_cache": response_cache.stats(),
+        "rank_index": xp_rank_index.stats(),
+        "leaderboard_snapshot": leaderboard_snapshot.stats(),
+        "skill_taxonomy": skill_taxonomy.stats(),
+        "request_fanout": request_fanout.stats(),
+        "grading_engine": grading_engine.stats(),
+        "grading_queue": grading_queue.stats(),
+        "grading_cache": grading_cache.stats(),
+        "exam_events": exam_events.stats(),
+        "certificate_store": certificate_store_status if CERTIFICATE_BLUEPRINT_AVAILABLE else None,
         "blueprints_registered": blueprints_registered,
         "blueprints_failed": blueprints_failed,
         "version": "5.0.0-blueprint-based-certificates"
@@ -522,6 +579,9 @@ if __name__ == "__main__":
     # Set MongoDB URI as environment variable
     os.environ['MONGODB_URI'] = app.config['MONGODB_URI']
     
+    # Open the MongoDB pool before serving (gunicorn does this in gunicorn.conf.py)
+    run_startup_checks(warmup_timeout=float(os.getenv('MONGO_WARMUP_TIMEOUT', 10)))
+    
     try:
         app.run(
             host=app.config['HOST'],
@@ -536,3 +596,8 @@ if __name__ == "__main__":
         print(f"❌ Server startup failed: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        grading_queue.stop()
+        exam_events.stop()
+        counter_buffer.stop()
+        mongo_registry.close()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, TypedDict
 from pydantic import BaseModel
 
 class UserStats(BaseModel):
@@ -40,3 +40,72 @@ class BlockchainTransaction(BaseModel):
     description: str
     timestamp: datetime = datetime.now()
     confirmed: bool = False
+
+
+# ===================================================================
+# Read models for the dashboard stats endpoint. These are TypedDicts
+# rather than BaseModels so raw documents are used as-is without a
+# validation pass; each projection lists exactly the fields its
+# calculate_real_* helpers read.
+# ===================================================================
+
+class CourseProgressRead(TypedDict, total=False):
+    completed: bool
+    completed_at: datetime
+    points: int
+    topic: str
+
+COURSE_PROGRESS_PROJECTION = {"_id": 0, "completed": 1, "completed_at": 1, "points": 1, "topic": 1}
+
+class QuizResultRead(TypedDict, total=False):
+    score: int
+    points: int
+    completed_at: datetime
+    topic: str
+
+QUIZ_RESULT_PROJECTION = {"_id": 0, "score": 1, "points": 1, "completed_at": 1, "topic": 1}
+
+class SubmissionRead(TypedDict, total=False):
+    submitted_at: datetime
+    points_earned: int
+    language: str
+
+SUBMISSION_PROJECTION = {"_id": 0, "submitted_at": 1, "points_earned": 1, "language": 1}
+
+class AchievementRead(TypedDict, total=False):
+    _id: str
+    title: str
+    description: str
+    earned_at: datetime
+    points: int
+    rarity: str
+    type: str
+    blockchain_verified: bool
+
+ACHIEVEMENT_PROJECTION = {
+    "title": 1, "description": 1, "earned_at": 1, "points": 1,
+    "rarity": 1, "type": 1, "blockchain_verified": 1
+}
+
+class UserStatsRead(TypedDict, total=False):
+    total_xp: int
+    current_streak: int
+    longest_streak: int
+    last_active_day: str
+    monthly_target: int
+    avg_session_minutes: float
+
+USER_STATS_PROJECTION = {"_id": 0, "total_xp": 1, "current_streak": 1, "longest_streak": 1, "last_active_day": 1, "monthly_target": 1, "avg_session_minutes": 1}
+
+class BlockchainSummaryRead(TypedDict, total=False):
+    total_earned: float
+    transactions: List[dict]
+
+BLOCKCHAIN_SUMMARY_PROJECTION = {"_id": 0, "total_earned": 1, "transactions": 1}
+
+# Recent-activity feed: display fields only, never submitted code or test output
+ACTIVITY_FEED_PROJECTION = {
+    "title": 1, "name": 1, "description": 1, "points": 1, "points_earned": 1,
+    "score": 1, "completion_percentage": 1, "difficulty": 1, "language": 1,
+    "blockchain_verified": 1, "completed_at": 1, "submitted_at": 1, "earned_at": 1
+}
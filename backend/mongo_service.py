@@ -1,5 +1,8 @@
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.errors import ServerSelectionTimeoutError
+from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 
@@ -8,9 +11,12 @@ class MongoService:
     def __init__(self, uri: str):
         self.uri = uri  # Store URI for sync operations
         try:
-            # Simple connection without custom SSL context
+            # Simple connection without custom SSL context. connect=False defers
+            # server discovery to first use, so no monitor threads are started
+            # in the gunicorn master before it forks workers.
             self.client = AsyncIOMotorClient(
                 uri,
+                connect=False,
                 serverSelectionTimeoutMS=30000,
                 connectTimeoutMS=30000,
                 socketTimeoutMS=30000
@@ -19,7 +25,7 @@ class MongoService:
         except Exception as e:
             print(f"MongoDB connection failed: {e}")
             # Fallback to basic connection
-            self.client = AsyncIOMotorClient(uri)
+            self.client = AsyncIOMotorClient(uri, connect=False)
         
         self.db = self.client.openlearnx
         # Collections
@@ -36,15 +42,10 @@ class MongoService:
             await self.client.admin.command('ping')
             print("MongoDB connection successful!")
             
-            # Create indexes
-            await self.users.create_index("wallet_address", unique=True)
-            await self.users.create_index("email", unique=True, sparse=True)
-            await self.questions.create_index("subject")
-            await self.questions.create_index("difficulty")
-            await self.test_sessions.create_index("user_id")
-            await self.test_sessions.create_index("created_at")
-            await self.certificates.create_index("user_id")
-            await self.certificates.create_index("token_id", unique=True)
+            # Create indexes from the shared declarative spec
+            from services.mongo_registry import mongo_registry
+            from services.index_manager import apply_indexes
+            await asyncio.to_thread(apply_indexes, mongo_registry.get_db())
             
             # Insert sample questions if none exist
             if await self.questions.count_documents({}) == 0:
@@ -83,6 +84,96 @@ class MongoService:
             {"$set": {"last_login": datetime.utcnow()}}
         )
 
+    # ===================================================================
+    # Test sessions and questions (adaptive test flow)
+    # ===================================================================
+
+    @staticmethod
+    def _object_id(value) -> Optional[ObjectId]:
+        """Parse an id coming from a client; None if it isn't a valid ObjectId"""
+        if isinstance(value, ObjectId):
+            return value
+        try:
+            return ObjectId(str(value))
+        except (InvalidId, TypeError):
+            return None
+
+    async def create_test_session(self, user_id: str, subject: str,
+                                  fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Create a new test session"""
+        now = datetime.utcnow()
+        session = {
+            "user_id": user_id,
+            "subject": subject,
+            "questions": [],
+            "answers": [],
+            "current_question": 0,
+            "status": "in_progress",
+            "created_at": now,
+            "updated_at": now,
+            **(fields or {})
+        }
+        result = await self.test_sessions.insert_one(session)
+        session["_id"] = result.inserted_id
+        return session
+
+    async def get_test_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a test session by id"""
+        oid = self._object_id(session_id)
+        if oid is None:
+            return None
+        return await self.test_sessions.find_one({"_id": oid})
+
+    async def update_test_session(self, session_id: str, updates: Dict[str, Any]) -> bool:
+        """Set fields on a test session"""
+        oid = self._object_id(session_id)
+        if oid is None:
+            return False
+        result = await self.test_sessions.update_one(
+            {"_id": oid},
+            {"$set": {**updates, "updated_at": datetime.utcnow()}}
+        )
+        return result.matched_count > 0
+
+    async def record_test_answer(self, session_id: str, answer: Dict[str, Any],
+                                 next_question_id: Optional[str] = None,
+                                 completed: bool = False,
+                                 updates: Optional[Dict[str, Any]] = None) -> bool:
+        """Append an answer (and the next question) to a session in one update"""
+        oid = self._object_id(session_id)
+        if oid is None:
+            return False
+        update: Dict[str, Any] = {
+            "$push": {"answers": answer},
+            "$inc": {"current_question": 1},
+            "$set": {**(updates or {}), "updated_at": datetime.utcnow()}
+        }
+        if next_question_id:
+            update["$push"]["questions"] = next_question_id
+        if completed:
+            update["$set"]["status"] = "completed"
+        result = await self.test_sessions.update_one({"_id": oid}, update)
+        return result.matched_count > 0
+
+    async def get_question(self, question_id: str) -> Optional[Dict[str, Any]]:
+        """Get a question by id"""
+        oid = self._object_id(question_id)
+        if oid is None:
+            return None
+        return await self.questions.find_one({"_id": oid})
+
+    async def get_questions_by_difficulty(self, difficulty, limit: int = 1,
+                                          subject: Optional[str] = None,
+                                          exclude_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get questions at a difficulty (served by the difficulty/subject index)"""
+        query: Dict[str, Any] = {"difficulty": difficulty}
+        if subject:
+            query["subject"] = subject
+        excluded = [oid for oid in (self._object_id(q) for q in exclude_ids or []) if oid is not None]
+        if excluded:
+            query["_id"] = {"$nin": excluded}
+        return await self.questions.find(query).limit(limit).to_list(length=limit)
+
     async def insert_sample_questions(self):
         """Insert sample questions - implement based on your needs"""
         # You'll need to implement this method based on your question structure
@@ -107,36 +198,30 @@ class MongoService:
 
     def create_user_sync(self, wallet_address: str):
         """Synchronous user creation using pymongo instead of motor"""
-        import pymongo
+        from services.mongo_registry import mongo_registry
         
-        # Create a synchronous connection for this operation only
-        client = pymongo.MongoClient(self.uri)
-        db = client.openlearnx
-        users = db.users
+        # Reuse the process-wide pymongo pool instead of a one-off client
+        users = mongo_registry.get_db().users
         
-        try:
-            # Check if user exists
-            user = users.find_one({"wallet_address": wallet_address.lower()})
-            
-            if not user:
-                # Create new user
-                new_user = {
-                    "wallet_address": wallet_address.lower(),
-                    "created_at": datetime.utcnow(),
-                    "last_login": datetime.utcnow(),
-                    "total_tests": 0,
-                    "certificates": []
-                }
-                result = users.insert_one(new_user)
-                new_user["_id"] = result.inserted_id
-                return new_user
-            else:
-                # Update last login
-                users.update_one(
-                    {"wallet_address": wallet_address.lower()},
-                    {"$set": {"last_login": datetime.utcnow()}}
-                )
-                return user
-        finally:
-            # Always close the connection
-            client.close()
\ No newline at end of file
+        # Check if user exists
+        user = users.find_one({"wallet_address": wallet_address.lower()})
+        
+        if not user:
+            # Create new user
+            new_user = {
+                "wallet_address": wallet_address.lower(),
+                "created_at": datetime.utcnow(),
+                "last_login": datetime.utcnow(),
+                "total_tests": 0,
+                "certificates": []
+            }
+            result = users.insert_one(new_user)
+            new_user["_id"] = result.inserted_id
+            return new_user
+        else:
+            # Update last login
+            users.update_one(
+                {"wallet_address": wallet_address.lower()},
+                {"$set": {"last_login": datetime.utcnow()}}
+            )
+            return user
\ No newline at end of file
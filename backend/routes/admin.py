@@ -2,16 +2,18 @@ from flask import Blueprint, request, jsonify
 from functools import wraps
 import uuid
 from datetime import datetime
-from pymongo import MongoClient
+from services.mongo_registry import mongo_registry
+from services.read_routing import read_router
+from services.skill_taxonomy import skill_taxonomy, skill_levels
+from services.admin_counters import admin_counters, breakdown_list
+import numpy as np
 import os
 from bson import ObjectId
 
 bp = Blueprint('admin', __name__)
 
-# MongoDB connection
-mongo_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
-client = MongoClient(mongo_uri)
-db = client.openlearnx
+# MongoDB connection (shared per-process pool, resolved lazily after fork)
+db = mongo_registry.lazy_db()
 
 def admin_required(f):
     @wraps(f)
@@ -106,10 +108,12 @@ def test_admin():
 def admin_dashboard():
     """Get admin dashboard statistics"""
     try:
-        total_courses = db.courses.count_documents({})
-        total_lessons = db.lessons.count_documents({})
-        total_modules = db.modules.count_documents({})
-        active_students = db.users.count_documents({"status": "active"}) or 2341
+        # Materialized counters (one document read, maintained by the write endpoints below)
+        counters = admin_counters.read()
+        total_courses = counters.get("courses", 0)
+        total_lessons = counters.get("lessons", 0)
+        total_modules = counters.get("modules", 0)
+        active_students = counters.get("active_students", 0) or 2341
         
         stats = {
             "total_courses": total_courses,
@@ -172,6 +176,7 @@ def create_course():
         }
         
         result = db.courses.insert_one(new_course)
+        admin_counters.courses_created([new_course])
         print(f"Course created with ID: {result.inserted_id}")
         
         # Remove _id field before returning
@@ -206,15 +211,17 @@ def update_course(course_id):
         update_data = {k: v for k, v in update_data.items() if v is not None}
         print(f"Filtered update data: {update_data}")
         
-        result = db.courses.update_one(
+        previous = db.courses.find_one_and_update(
             {"id": course_id}, 
-            {"$set": update_data}
+            {"$set": update_data},
+            {"_id": 0, "subject": 1, "difficulty": 1}
         )
         
-        print(f"Update result: matched={result.matched_count}, modified={result.modified_count}")
+        print(f"Update result: matched={previous is not None}")
         
-        if result.matched_count == 0:
+        if previous is None:
             return jsonify({"error": "Course not found"}), 404
+        admin_counters.course_updated(previous, {**previous, **update_data})
         
         # Get updated course without _id field
         updated_course = db.courses.find_one({"id": course_id}, {"_id": 0})
@@ -240,9 +247,11 @@ def delete_course(course_id):
         print(f"Deleted {module_result.deleted_count} related modules")
         
         # Delete the course
-        result = db.courses.delete_one({"id": course_id})
+        deleted = db.courses.find_one_and_delete({"id": course_id}, {"_id": 0, "subject": 1, "difficulty": 1})
+        admin_counters.course_deleted(deleted, modules=module_result.deleted_count,
+                                      lessons=lesson_result.deleted_count)
         
-        if result.deleted_count == 0:
+        if deleted is None:
             return jsonify({"error": "Course not found"}), 404
         
         return jsonify({"success": True, "message": "Course deleted successfully"})
@@ -297,6 +306,7 @@ def create_module(course_id):
         }
         
         result = db.modules.insert_one(module)
+        admin_counters.apply(modules=1)
         module['id'] = str(result.inserted_id)
         if '_id' in module:
             del module['_id']
@@ -382,6 +392,7 @@ def delete_module(module_id):
         
         # Delete the module
         result = db.modules.delete_one({"_id": ObjectId(module_id)})
+        admin_counters.apply(modules=-result.deleted_count, lessons=-lesson_result.deleted_count)
         
         if result.deleted_count == 0:
             return jsonify({"error": "Module not found"}), 404
@@ -444,6 +455,7 @@ def create_lesson(module_id):
         }
         
         result = db.lessons.insert_one(lesson)
+        admin_counters.apply(lessons=1)
         lesson['id'] = str(result.inserted_id)
         if '_id' in lesson:
             del lesson['_id']
@@ -529,6 +541,7 @@ def delete_lesson(lesson_id):
         print(f"Deleting lesson: {lesson_id}")
         
         result = db.lessons.delete_one({"_id": ObjectId(lesson_id)})
+        admin_counters.apply(lessons=-result.deleted_count)
         
         if result.deleted_count == 0:
             return jsonify({"error": "Lesson not found"}), 404
@@ -562,6 +575,7 @@ def add_lesson_legacy(course_id):
         
         # Insert lesson
         db.lessons.insert_one(lesson)
+        admin_counters.apply(lessons=1)
         
         # Remove _id field before returning
         lesson_response = serialize_course(lesson)
@@ -575,9 +589,9 @@ def add_lesson_legacy(course_id):
 def initialize_default_courses():
     """Initialize database with default courses"""
     try:
-        existing_count = db.courses.count_documents({})
-        if existing_count > 0:
-            return jsonify({"message": f"Courses already initialized ({existing_count} courses found)"}), 200
+        # Existence check on the collection itself, not the materialized counter (which can drift)
+        if db.courses.find_one({}, {"_id": 1}) is not None:
+            return jsonify({"message": "Courses already initialized"}), 200
         
         default_courses = [
             {
@@ -643,6 +657,7 @@ def initialize_default_courses():
         ]
         
         result = db.courses.insert_many(default_courses)
+        admin_counters.courses_created(default_courses)
         print(f"Initialized {len(result.inserted_ids)} default courses")
         
         return jsonify({
@@ -656,31 +671,20 @@ def initialize_default_courses():
 
 @bp.route("/stats", methods=["GET"])
 @admin_required
+@read_router.secondary_ok
 def get_admin_stats():
     """Get detailed admin statistics"""
     try:
-        total_courses = db.courses.count_documents({})
-        total_lessons = db.lessons.count_documents({})
-        total_modules = db.modules.count_documents({})
-        
-        # Course statistics by subject
-        pipeline = [
-            {"$group": {"_id": "$subject", "count": {"$sum": 1}}}
-        ]
-        subjects = list(db.courses.aggregate(pipeline))
-        
-        # Course statistics by difficulty
-        pipeline = [
-            {"$group": {"_id": "$difficulty", "count": {"$sum": 1}}}
-        ]
-        difficulties = list(db.courses.aggregate(pipeline))
+        counters = admin_counters.read()
         
         stats = {
-            "total_courses": total_courses,
-            "total_lessons": total_lessons,
-            "total_modules": total_modules,
-            "subjects": subjects,
-            "difficulties": difficulties,
+            "total_courses": counters.get("courses", 0),
+            "total_lessons": counters.get("lessons", 0),
+            "total_modules": counters.get("modules", 0),
+            # Course statistics by subject / difficulty (same shape as the old $group results)
+            "subjects": breakdown_list(counters.get("subjects", {})),
+            "difficulties": breakdown_list(counters.get("difficulties", {})),
+            "counters_reconciled_at": counters["reconciled_at"].isoformat() if counters.get("reconciled_at") else None,
             "last_updated": datetime.now().isoformat()
         }
         
@@ -689,6 +693,103 @@ def get_admin_stats():
         print(f"Error getting stats: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@bp.route("/stats/reconcile", methods=["POST"])
+@admin_required
+def reconcile_admin_stats():
+    """Recount the materialized admin counters from the collections"""
+    try:
+        result = admin_counters.reconcile()
+        counters = result["counters"]
+        return jsonify({
+            "success": True,
+            "drift": result["drift"],
+            "total_courses": counters["courses"],
+            "total_lessons": counters["lessons"],
+            "total_modules": counters["modules"],
+            "active_students": counters["active_students"],
+            "reconciled_at": counters["reconciled_at"].isoformat()
+        })
+    except Exception as e:
+        print(f"Error reconciling stats: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/skill-taxonomy", methods=["GET"])
+@admin_required
+def get_skill_taxonomy():
+    """Get the active topic-to-skill taxonomy"""
+    try:
+        taxonomy = skill_taxonomy.current()
+        return jsonify({
+            "version": taxonomy.version,
+            "taxonomy": taxonomy.definition,
+            "stats": taxonomy.stats()
+        })
+    except Exception as e:
+        print(f"Error getting skill taxonomy: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/skill-taxonomy", methods=["PUT"])
+@admin_required
+def update_skill_taxonomy():
+    """Replace the topic-to-skill taxonomy (every worker reloads it without a restart)"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+        try:
+            taxonomy = skill_taxonomy.save(data.get("taxonomy", data), updated_by="admin")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        print(f"✅ Skill taxonomy updated to v{taxonomy.version}")
+        return jsonify({
+            "success": True,
+            "version": taxonomy.version,
+            "taxonomy": taxonomy.definition,
+            "message": "Taxonomy updated. Run scripts/rebuild_skill_vectors.py to rescore existing users."
+        })
+    except Exception as e:
+        print(f"Error updating skill taxonomy: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/skills/cohort", methods=["GET"])
+@admin_required
+@read_router.secondary_ok
+def get_skill_cohort():
+    """Skill level distribution across every learner, computed in one vectorized pass"""
+    try:
+        taxonomy = skill_taxonomy.current()
+        user_ids, raw = taxonomy.matrix_from_rollups(db.user_stats.find(
+            {"rollup.skills_raw": {"$exists": True}}, {"_id": 0, "user_id": 1, "rollup.skills_raw": 1}
+        ))
+        levels = skill_levels(raw)
+        # Learners with no skill points at all have no dominant skill
+        active = raw.max(axis=1, initial=0.0) > 0
+        dominant = np.bincount(raw[active].argmax(axis=1), minlength=len(taxonomy.skills))
+
+        skills = {}
+        for index, skill in enumerate(taxonomy.skills):
+            column = levels[active, index]
+            quartiles = np.percentile(column, [25, 50, 75]) if column.size else [0, 0, 0]
+            skills[skill] = {
+                "mean_level": round(float(column.mean()), 2) if column.size else 0,
+                "p25": float(quartiles[0]),
+                "median": float(quartiles[1]),
+                "p75": float(quartiles[2]),
+                "total_points": round(float(raw[:, index].sum()), 2),
+                "dominant_learners": int(dominant[index])
+            }
+
+        return jsonify({
+            "taxonomy_version": taxonomy.version,
+            "learners": len(user_ids),
+            "learners_with_skills": int(active.sum()),
+            "skills": skills,
+            "last_updated": datetime.now().isoformat()
+        })
+    except Exception as e:
+        print(f"Error getting skill cohort: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @bp.route("/health", methods=["GET"])
 def admin_health():
     """Admin health check endpoint"""
@@ -714,6 +815,10 @@ def admin_health():
             "DELETE /api/admin/lessons/<lesson_id>",
             "POST /api/admin/initialize",
             "GET /api/admin/test",
-            "GET /api/admin/stats"
+            "GET /api/admin/stats",
+            "POST /api/admin/stats/reconcile",
+            "GET /api/admin/skill-taxonomy",
+            "PUT /api/admin/skill-taxonomy",
+            "GET /api/admin/skills/cohort"
         ]
     })
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
-from pymongo import MongoClient
+from services.mongo_registry import mongo_registry
+from services.counter_buffer import counter_buffer
 import os
 import uuid
 import jwt
@@ -11,10 +12,8 @@ from web3 import Web3
 bp = Blueprint('auth', __name__)
 logger = logging.getLogger(__name__)
 
-# MongoDB connection
-mongo_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
-client = MongoClient(mongo_uri)
-db = client.openlearnx
+# MongoDB connection (shared per-process pool, resolved lazily after fork)
+db = mongo_registry.lazy_db()
 
 # JWT secret
 JWT_SECRET = os.getenv('JWT_SECRET', 'your-secret-key-here')
@@ -114,13 +113,12 @@ def verify_signature():
             user["_id"] = str(result.inserted_id)
             logger.info(f"✅ Created new user: {wallet_address}")
         else:
-            # Update existing user
-            db.users.update_one(
+            # Update existing user (buffered - logins for the same wallet are merged)
+            counter_buffer.record(
+                "users",
                 {"wallet_address": wallet_address.lower()},
-                {
-                    "$set": {"last_login": datetime.now()},
-                    "$inc": {"login_count": 1}
-                }
+                inc={"login_count": 1},
+                max_fields={"last_login": datetime.now()}
             )
             user["_id"] = str(user["_id"])
             logger.info(f"✅ Updated existing user: {wallet_address}")
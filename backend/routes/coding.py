@@ -184,10 +184,9 @@ def get_run_command(language, filename):
 
 def log_coding_attempt(session_id, code, language):
     """Log all coding attempts for monitoring"""
-    from pymongo import MongoClient
+    from services.mongo_registry import mongo_registry
     
-    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
-    db = client.openlearnx
+    db = mongo_registry.get_db()
     
     db.coding_logs.insert_one({
         "session_id": session_id,
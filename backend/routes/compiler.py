@@ -10,10 +10,8 @@ bp = Blueprint('compiler', __name__)
 
 def get_db():
     """Get MongoDB database connection"""
-    from pymongo import MongoClient
-    from flask import current_app
-    client = MongoClient(current_app.config['MONGODB_URI'])
-    return client.openlearnx
+    from services.mongo_registry import mongo_registry
+    return mongo_registry.get_db()
 
 @bp.route('/execute', methods=['POST', 'OPTIONS'])
 def execute_code():
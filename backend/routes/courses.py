@@ -1,13 +1,10 @@
 from flask import Blueprint, jsonify, current_app
-from pymongo import MongoClient
-import os
+from services.mongo_registry import mongo_registry
 
 bp = Blueprint('courses', __name__)
 
-# MongoDB connection
-mongo_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
-client = MongoClient(mongo_uri)
-db = client.openlearnx
+# MongoDB connection (shared per-process pool, resolved lazily after fork)
+db = mongo_registry.lazy_db()
 
 @bp.route("/", methods=["GET"])
 @bp.route("", methods=["GET"])
@@ -1,19 +1,36 @@
-from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
-from pymongo import MongoClient
-import os
+from flask import Blueprint, request, jsonify, current_app
+from datetime import datetime, timedelta, MINYEAR, MAXYEAR
+import time
+from services.mongo_registry import mongo_registry
+from services.read_routing import read_router
+from services.response_cache import response_cache
+from services.rank_index import xp_rank_index
+from services.leaderboard_snapshot import leaderboard_snapshot
+from services.request_fanout import request_fanout
+from services.activity_feed import (
+    activity_feed, serialize_item, ACTIVITY_SOURCES, DEFAULT_PAGE_SIZE
+)
+from models.dashboard_models import (
+    CourseProgressRead, QuizResultRead, SubmissionRead, AchievementRead, UserStatsRead,
+    BLOCKCHAIN_SUMMARY_PROJECTION
+)
+from services.user_stats_rollup import (
+    user_stats_rollup, stats_from_rollup, rollup_counts
+)
+from services.skill_taxonomy import skill_taxonomy
+from services.activity_buckets import (
+    activity_buckets, resolve_timezone, is_valid_timezone, local_today
+)
+from typing import List
 from bson import ObjectId
 import logging
-import uuid
 import jwt  # ✅ Add proper JWT import at top level
 
 bp = Blueprint('dashboard', __name__)
 logger = logging.getLogger(__name__)
 
-# MongoDB connection
-mongo_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
-client = MongoClient(mongo_uri)
-db = client.openlearnx
+# MongoDB connection (shared per-process pool, resolved lazily after fork)
+db = mongo_registry.lazy_db()
 
 def verify_wallet_authentication():
     """✅ FIXED: Verify MetaMask wallet authentication with proper JWT handling"""
@@ -60,6 +77,7 @@ def verify_wallet_authentication():
     return None, None
 
 @bp.route('/comprehensive-stats', methods=['GET', 'OPTIONS'])
+@response_cache.cached('comprehensive-stats', verify_wallet_authentication, user_stats_rollup.cache_fingerprint)
 def get_comprehensive_stats():
     """Get ONLY REAL data from MongoDB - NO FAKE/DEMO DATA"""
     if request.method == "OPTIONS":
@@ -78,171 +96,18 @@ def get_comprehensive_stats():
         
         logger.info(f"📊 Fetching REAL MongoDB data for wallet: {user_id}")
         
-        # Database connection check
-        try:
-            db.command('ping')
-            logger.info("✅ Database connection verified")
-        except Exception as e:
-            logger.error(f"❌ Database connection failed: {e}")
+        # Database connection check (background liveness probe, no per-request ping)
+        if not mongo_registry.is_available():
+            logger.error(f"❌ Database connection failed: {mongo_registry.status().get('last_error')}")
             raise Exception("Database connection failed")
         
-        # ✅ GET USER PROFILE (REAL DATA ONLY)
+        # ✅ GET USER PROFILE (REAL DATA ONLY) and the per-user rollup
         user_profile = db.user_profiles.find_one({"user_id": user_id})
-        if not user_profile:
-            # ✅ Create basic profile for new users to prevent loops
-            basic_profile = {
-                "user_id": user_id,
-                "wallet_address": wallet_address,
-                "display_name": None,
-                "username_set": False,
-                "avatar_url": f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_id}",
-                "created_at": datetime.now()
-            }
-            
-            try:
-                db.user_profiles.insert_one(basic_profile.copy())
-                logger.info(f"✅ Created basic profile for new user: {user_id}")
-            except Exception as e:
-                logger.warning(f"⚠️ Failed to create user profile: {e}")
-            
-            return jsonify({
-                "success": True,
-                "username_required": True,
-                "user_profile": basic_profile,
-                "message": "Please set your username to continue",
-                "user_id": user_id,
-                "wallet_address": wallet_address
-            })
-        
-        # Convert ObjectId to string for JSON serialization
-        if '_id' in user_profile:
-            user_profile['_id'] = str(user_profile['_id'])
-        
-        # Check if username is set
-        if not user_profile.get('display_name') or not user_profile.get('username_set', False):
-            return jsonify({
-                "success": True,
-                "username_required": True,
-                "user_profile": user_profile,
-                "message": "Please set your username to continue",
-                "user_id": user_id,
-                "wallet_address": wallet_address
-            })
-        
-        # ✅ FETCH ONLY REAL DATA FROM MONGODB
-        user_stats = db.user_stats.find_one({"user_id": user_id})
-        courses = list(db.user_courses.find({"user_id": user_id}))
-        quizzes = list(db.user_quizzes.find({"user_id": user_id}))
-        coding_submissions = list(db.user_submissions.find({"user_id": user_id}))
-        blockchain_data = db.user_blockchain.find_one({"user_id": user_id})
-        achievements = list(db.user_achievements.find({"user_id": user_id}))
-        
-        # Convert ObjectIds to strings for JSON serialization
-        for collection in [courses, quizzes, coding_submissions, achievements]:
-            for item in collection:
-                if '_id' in item:
-                    item['_id'] = str(item['_id'])
-        
-        if user_stats and '_id' in user_stats:
-            user_stats['_id'] = str(user_stats['_id'])
-        if blockchain_data and '_id' in blockchain_data:
-            blockchain_data['_id'] = str(blockchain_data['_id'])
-        
-        logger.info(f"📊 REAL MongoDB data found:")
-        logger.info(f"   - User stats: {'✅' if user_stats else '❌'}")
-        logger.info(f"   - Courses: {len(courses)}")
-        logger.info(f"   - Quizzes: {len(quizzes)}")
-        logger.info(f"   - Coding submissions: {len(coding_submissions)}")
-        logger.info(f"   - Achievements: {len(achievements)}")
-        
-        # ✅ IF NO REAL DATA EXISTS, RETURN EMPTY STATE (NO FAKE DATA)
-        if not user_stats and not courses and not quizzes and not coding_submissions and not achievements:
-            logger.info(f"📊 No real learning data found for wallet {user_id}")
-            return jsonify({
-                "success": True,
-                "data": get_empty_stats(wallet_address),
-                "user_profile": user_profile,
-                "timestamp": datetime.now().isoformat(),
-                "user_id": user_id,
-                "wallet_address": wallet_address,
-                "data_source": "empty_real_data",
-                "message": "No learning data found. Start learning to see your real progress!"
-            })
-        
-        # ✅ CALCULATE STATISTICS FROM ONLY REAL DATA
-        current_time = datetime.now()
-        
-        # Real calculations (no fake data)
-        total_xp = calculate_real_total_xp(courses, quizzes, coding_submissions, achievements)
-        courses_completed = len([c for c in courses if c.get('completed', False)])
-        coding_problems_solved = len(coding_submissions)
-        quiz_accuracy = calculate_real_quiz_accuracy(quizzes)
-        coding_streak = calculate_real_coding_streak(coding_submissions)
-        longest_streak = user_stats.get('longest_streak', coding_streak) if user_stats else coding_streak
-        weekly_activity = calculate_real_weekly_activity(courses, quizzes, coding_submissions)
-        skill_levels = calculate_real_skill_levels(courses, quizzes, coding_submissions)
-        
-        # ✅ REAL COMPREHENSIVE STATISTICS
-        comprehensive_stats = {
-            "total_xp": total_xp,
-            "courses_completed": courses_completed,
-            "coding_problems_solved": coding_problems_solved,
-            "quiz_accuracy": quiz_accuracy,
-            "coding_streak": coding_streak,
-            "longest_streak": max(longest_streak, coding_streak),
-            "total_courses": len(courses),
-            "total_quizzes": len(quizzes),
-            "global_rank": calculate_real_global_rank(user_stats, user_id) if user_stats else 0,
-            "weekly_activity": weekly_activity,
-            "monthly_goals": {
-                "target": user_stats.get('monthly_target', 0) if user_stats else 0,
-                "completed": calculate_real_monthly_completed(courses, quizzes, coding_submissions, current_time)
-            },
-            "blockchain": {
-                "wallet_connected": True,
-                "wallet_address": wallet_address,
-                "total_earned": blockchain_data.get('total_earned', 0) if blockchain_data else 0,
-                "transactions": len(blockchain_data.get('transactions', [])) if blockchain_data else 0,
-                "certificates": len([a for a in achievements if a.get('type') == 'certificate']),
-                "verified_achievements": len([a for a in achievements if a.get('blockchain_verified', False)])
-            },
-            "learning_analytics": {
-                "time_spent_hours": calculate_real_time_spent(courses, quizzes, coding_submissions),
-                "average_session_minutes": user_stats.get('avg_session_minutes', 0) if user_stats else 0,
-                "completion_rate": calculate_real_completion_rate(courses, quizzes),
-                "favorite_topics": calculate_real_favorite_topics(courses, quizzes),
-                "skill_levels": skill_levels
-            },
-            "recent_achievements": [
-                {
-                    "id": str(a.get('_id', uuid.uuid4())),
-                    "title": a.get('title', ''),
-                    "description": a.get('description', ''),
-                    "earned_at": a.get('earned_at', current_time).isoformat() if isinstance(a.get('earned_at'), datetime) else str(a.get('earned_at', current_time.isoformat())),
-                    "points": a.get('points', 0),
-                    "rarity": a.get('rarity', 'common')
-                } for a in achievements[-5:]  # Only last 5 REAL achievements
-            ]
-        }
-        
-        logger.info(f"✅ REAL statistics calculated for wallet {user_id}")
-        
-        return jsonify({
-            "success": True,
-            "data": comprehensive_stats,
-            "user_profile": user_profile,
-            "username_required": False,
-            "timestamp": current_time.isoformat(),
-            "user_id": user_id,
-            "wallet_address": wallet_address,
-            "data_source": "pure_mongodb_data",  # Indicates real data only
-            "collections_count": {
-                "courses": len(courses),
-                "quizzes": len(quizzes),
-                "coding_submissions": len(coding_submissions),
-                "achievements": len(achievements)
-            }
-        })
+        user_stats = None
+        if user_profile:
+            # The synced stats document the cache fingerprint already read
+            user_stats = response_cache.fingerprint_state(lambda: user_stats_rollup.synced(user_id))
+        return jsonify(comprehensive_stats_payload(user_id, wallet_address, user_profile, user_stats))
         
     except Exception as e:
         logger.error(f"❌ Error fetching real stats: {str(e)}")
@@ -254,7 +119,99 @@ def get_comprehensive_stats():
             "data_source": "error"
         }), 500
 
+def comprehensive_stats_payload(user_id, wallet_address, user_profile, user_stats):
+    """comprehensive-stats body from the already fetched profile and stats documents"""
+    if not user_profile:
+        # ✅ Create basic profile for new users to prevent loops
+        basic_profile = {
+            "user_id": user_id,
+            "wallet_address": wallet_address,
+            "display_name": None,
+            "username_set": False,
+            "avatar_url": f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_id}",
+            "created_at": datetime.now()
+        }
+        
+        try:
+            db.user_profiles.insert_one(basic_profile.copy())
+            logger.info(f"✅ Created basic profile for new user: {user_id}")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to create user profile: {e}")
+        
+        return {
+            "success": True,
+            "username_required": True,
+            "user_profile": basic_profile,
+            "message": "Please set your username to continue",
+            "user_id": user_id,
+            "wallet_address": wallet_address
+        }
+    
+    # Convert ObjectId to string for JSON serialization
+    if '_id' in user_profile:
+        user_profile['_id'] = str(user_profile['_id'])
+    
+    # Check if username is set
+    if not user_profile.get('display_name') or not user_profile.get('username_set', False):
+        return {
+            "success": True,
+            "username_required": True,
+            "user_profile": user_profile,
+            "message": "Please set your username to continue",
+            "user_id": user_id,
+            "wallet_address": wallet_address
+        }
+    
+    # ✅ SINGLE POINT READ (done by the caller): the per-user rollup, refreshed by the caller when its sources moved
+    has_stats_document = user_stats is not None
+    counts = rollup_counts(user_stats)
+    
+    logger.info(f"📊 REAL MongoDB rollup found: {counts}")
+    
+    # ✅ IF NO REAL DATA EXISTS, RETURN EMPTY STATE (NO FAKE DATA)
+    if not has_stats_document and not any(counts.values()):
+        logger.info(f"📊 No real learning data found for wallet {user_id}")
+        return {
+            "success": True,
+            "data": get_empty_stats(wallet_address),
+            "user_profile": user_profile,
+            "timestamp": datetime.now().isoformat(),
+            "user_id": user_id,
+            "wallet_address": wallet_address,
+            "data_source": "empty_real_data",
+            "message": "No learning data found. Start learning to see your real progress!"
+        }
+    
+    # ✅ CALCULATE STATISTICS FROM THE ROLLUP (no per-activity reads)
+    current_time = datetime.now()
+    today = local_today(resolve_timezone(user_stats.get('timezone')))
+    blockchain_data = db.user_blockchain.find_one({"user_id": user_id}, BLOCKCHAIN_SUMMARY_PROJECTION)
+    comprehensive_stats = stats_from_rollup(
+        user_stats,
+        wallet_address,
+        current_time,
+        global_rank=calculate_real_global_rank(user_stats, user_id),
+        blockchain_data=blockchain_data,
+        activity=activity_buckets.summary(user_id, today),
+        today=today
+    )
+    
+    logger.info(f"✅ REAL statistics calculated for wallet {user_id}")
+    
+    return {
+        "success": True,
+        "data": comprehensive_stats,
+        "user_profile": user_profile,
+        "username_required": False,
+        "timestamp": current_time.isoformat(),
+        "user_id": user_id,
+        "wallet_address": wallet_address,
+        "data_source": "pure_mongodb_data",  # Indicates real data only
+        "collections_count": counts
+    }
+
 @bp.route('/recent-activity', methods=['GET', 'OPTIONS'])
+@response_cache.cached('recent-activity', verify_wallet_authentication, user_stats_rollup.cache_fingerprint)
 def get_recent_activity():
     """Get ONLY REAL recent activity from MongoDB"""
     if request.method == "OPTIONS":
@@ -271,128 +228,272 @@ def get_recent_activity():
         
         logger.info(f"📋 Fetching REAL activity for wallet: {user_id}")
         
-        activities = []
-        
-        # ✅ ONLY REAL ACTIVITY SOURCES
-        activity_sources = [
-            (db.user_courses, "course", "Course Activity", "completed_at"),
-            (db.user_quizzes, "quiz", "Quiz Activity", "completed_at"),
-            (db.user_submissions, "coding", "Coding Challenge", "submitted_at"),
-            (db.user_achievements, "achievement", "Achievement", "earned_at"),
-        ]
-        
-        for collection, activity_type, default_title, date_field in activity_sources:
-            try:
-                # Get ONLY real MongoDB data
-                recent_items = list(collection.find(
-                    {"user_id": user_id}
-                ).sort(date_field, -1).limit(20))
-                
-                for item in recent_items:
-                    completed_at = item.get(date_field, datetime.now())
-                    
-                    if isinstance(completed_at, str):
-                        try:
-                            completed_at = datetime.fromisoformat(completed_at)
-                        except:
-                            completed_at = datetime.now()
-                    elif not isinstance(completed_at, datetime):
-                        completed_at = datetime.now()
-                    
-                    activities.append({
-                        "id": str(item.get('_id', uuid.uuid4())),
-                        "type": activity_type,
-                        "title": item.get('title', item.get('name', default_title)),
-                        "description": format_real_activity_description(item, activity_type),
-                        "completed_at": completed_at.isoformat(),
-                        "points_earned": item.get('points', item.get('points_earned', 0)),
-                        "success_rate": item.get('score', item.get('completion_percentage', 0)),
-                        "difficulty": item.get('difficulty', ''),
-                        "blockchain_verified": item.get('blockchain_verified', False)
-                    })
-            except Exception as e:
-                logger.warning(f"⚠️ Failed to fetch {activity_type} activities: {e}")
-                continue
-        
-        # Sort by completion date
-        activities.sort(key=lambda x: x['completed_at'], reverse=True)
-        
-        logger.info(f"✅ Found {len(activities)} REAL activities for wallet {user_id}")
+        # Page size bounded by MAX_ACTIVITY_RECORDS
+        limit = min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+                    current_app.config.get('MAX_ACTIVITY_RECORDS', 1000))
+        cursor = request.args.get('cursor')
+        types = [t for t in request.args.get('type', '').split(',') if t]
+        unknown_types = [t for t in types if t not in ACTIVITY_SOURCES]
+        if unknown_types:
+            return jsonify({
+                "success": False,
+                "error": f"Unknown activity type(s): {', '.join(unknown_types)}",
+                "valid_types": list(ACTIVITY_SOURCES)
+            }), 400
+        
+        # New source documents reach the feed through the sync behind the cache fingerprint
+        response_cache.fingerprint_state(lambda: user_stats_rollup.synced(user_id))
+        
+        try:
+            return jsonify(recent_activity_payload(user_id, limit, cursor, types))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+    except Exception as e:
+        logger.error(f"❌ Error fetching real activity: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def recent_activity_payload(user_id, limit, cursor=None, types=None):
+    """recent-activity body (the caller refreshes the feed first); ValueError for a malformed cursor"""
+    # ✅ SINGLE INDEXED FEED READ (user_id, ts desc) instead of four collections
+    result = activity_feed.page(user_id, limit, cursor, types)
+    activities = [serialize_item(item) for item in result["items"]]
+    
+    logger.info(f"✅ Found {len(activities)} REAL activities for wallet {user_id}")
+    return {
+        "success": True,
+        "data": activities,
+        "total_count": len(activities),
+        "next_cursor": result["next_cursor"],
+        "has_more": result["has_more"],
+        "data_source": "pure_mongodb_data"
+    }
+
+@bp.route('/activity-heatmap', methods=['GET', 'OPTIONS'])
+def get_activity_heatmap():
+    """Daily activity counts for the week, month or year, in the user's timezone"""
+    if request.method == "OPTIONS":
+        return jsonify({'status': 'ok'})
+    
+    try:
+        user_id, wallet_address = verify_wallet_authentication()
+        if not user_id:
+            return jsonify({
+                "success": False,
+                "error": "Authentication required",
+                "auth_required": True
+            }), 401
+        
+        user_stats = user_stats_rollup.synced(user_id) or {}
+        
+        tz = resolve_timezone(user_stats.get('timezone'))
+        today = local_today(tz)
+        view = request.args.get('range', 'year')
+        year = request.args.get('year', type=int)
+        if 'year' in request.args and not (year and MINYEAR <= year <= MAXYEAR):
+            return jsonify({
+                "success": False,
+                "error": f"year must be an integer between {MINYEAR} and {MAXYEAR}"
+            }), 400
+        
+        if year:
+            start, end = today.replace(year=year, month=1, day=1), today.replace(year=year, month=12, day=31)
+            view = 'calendar_year'
+        elif view == 'week':
+            start, end = today - timedelta(days=6), today
+        elif view == 'month':
+            start, end = today.replace(day=1), today
+        elif view == 'year':
+            start, end = today - timedelta(days=364), today
+        else:
+            return jsonify({
+                "success": False,
+                "error": "range must be one of: week, month, year"
+            }), 400
+        
+        days = activity_buckets.heatmap(user_id, start, end)
+        
         return jsonify({
             "success": True,
-            "data": activities,
-            "total_count": len(activities),
-            "data_source": "pure_mongodb_data"
+            "range": view,
+            "timezone": tz.key,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "days": days,
+            "total": sum(day["total"] for day in days),
+            "active_days": len([day for day in days if day["total"] > 0])
         })
         
     except Exception as e:
-        logger.error(f"❌ Error fetching real activity: {str(e)}")
+        logger.error(f"❌ Error fetching activity heatmap: {str(e)}")
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
 @bp.route('/global-leaderboard', methods=['GET', 'OPTIONS'])
+@read_router.secondary_ok
 def get_global_leaderboard():
     """Get ONLY REAL global leaderboard from MongoDB - NO AUTH REQUIRED"""
     if request.method == "OPTIONS":
         return jsonify({'status': 'ok'})
     
     try:
-        logger.info("🏆 Fetching REAL global leaderboard from MongoDB")
+        page = max(1, request.args.get('page', 1, type=int))
+        page_size = min(100, max(1, request.args.get('page_size', 100, type=int)))
         
-        # ✅ GET ONLY REAL USER STATS - NO AUTH REQUIRED FOR LEADERBOARD
-        user_stats_cursor = db.user_stats.find({}).sort("total_xp", -1).limit(100)
-        user_stats_list = list(user_stats_cursor)
+        response = global_leaderboard_payload(page, page_size)
         
-        logger.info(f"📊 Found {len(user_stats_list)} REAL users in MongoDB")
+        # ✅ Optional "my position" sidecar for signed-in users
+        if response["data"] and (request.headers.get('Authorization') or request.headers.get('X-Wallet-Address')):
+            user_id, _ = verify_wallet_authentication()
+            if user_id:
+                response["my_position"] = get_my_leaderboard_position(user_id, page_size)
         
-        if not user_stats_list:
-            logger.info("📊 No real users found in MongoDB")
-            return jsonify({
-                "success": True,
-                "data": [],
-                "message": "No users found. Be the first to start learning!"
-            })
-        
-        leaderboard = []
-        for rank, user_stat in enumerate(user_stats_list, 1):
-            # Get real user profile
-            user_profile = db.user_profiles.find_one({"user_id": user_stat["user_id"]})
-            
-            # Real user data only
-            username = "Anonymous User"
-            avatar = f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_stat['user_id']}"
-            display_name = None
-            badges = []
-            
-            if user_profile:
-                display_name = user_profile.get("display_name")
-                username = display_name or f"User_{user_stat['user_id'][-6:]}"
-                avatar = user_profile.get("avatar_url", avatar)
-                badges = user_profile.get("badges", [])
-            
-            leaderboard.append({
-                "rank": rank,
-                "user_id": user_stat["user_id"],
-                "username": username,
-                "display_name": display_name,
-                "total_xp": user_stat.get("total_xp", 0),
-                "streak": user_stat.get("current_streak", 0),
-                "avatar": avatar,
-                "badges": badges,
-                "wallet_address": user_profile.get("wallet_address") if user_profile else None
-            })
-        
-        logger.info(f"✅ REAL leaderboard generated with {len(leaderboard)} users")
+        return jsonify(response)
+        
+    except Exception as e:
+        logger.error(f"❌ Error fetching real leaderboard: {str(e)}")
         return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def global_leaderboard_payload(page, page_size):
+    """global-leaderboard body (without the caller's position)"""
+    # ✅ Served from the materialized snapshot (one $lookup aggregation per rebuild, not per request)
+    result = leaderboard_snapshot.page(page, page_size)
+    
+    if not result["pagination"]["total"]:
+        logger.info("📊 No real users found in MongoDB")
+        return {
             "success": True,
-            "data": leaderboard,
-            "data_source": "pure_mongodb_data"
+            "data": [],
+            "pagination": result["pagination"],
+            "message": "No users found. Be the first to start learning!"
+        }
+    
+    return {
+        "success": True,
+        "data": result["data"],
+        "pagination": result["pagination"],
+        "snapshot_built_at": result["snapshot_built_at"],
+        "data_source": "pure_mongodb_data"
+    }
+
+def get_my_leaderboard_position(user_id, page_size, user_stats=None):
+    """The caller's rank and XP, whether or not they made the snapshot"""
+    entry = leaderboard_snapshot.position_of(user_id)
+    if entry:
+        return {
+            "rank": entry["rank"],
+            "total_xp": entry["total_xp"],
+            "page": entry.pop("index") // page_size + 1,
+            "in_snapshot": True
+        }
+    
+    if user_stats is None:
+        user_stats = db.user_stats.find_one({"user_id": user_id}, {"_id": 0, "total_xp": 1})
+    if not user_stats:
+        return None
+    return {
+        "rank": xp_rank_index.rank_of(user_id, user_stats.get('total_xp', 0)),
+        "total_xp": user_stats.get('total_xp', 0),
+        "page": None,
+        "in_snapshot": False
+    }
+
+@bp.route('/bootstrap', methods=['GET', 'OPTIONS'])
+def get_dashboard_bootstrap():
+    """comprehensive-stats, recent-activity and global-leaderboard in one response, from one set of reads"""
+    if request.method == "OPTIONS":
+        return jsonify({'status': 'ok'})
+    
+    try:
+        started = time.monotonic()
+        user_id, wallet_address = verify_wallet_authentication()
+        if not user_id:
+            return jsonify({
+                "success": False,
+                "error": "MetaMask wallet authentication required",
+                "auth_required": True
+            }), 401
+        
+        if not mongo_registry.is_available():
+            logger.error(f"❌ Database connection failed: {mongo_registry.status().get('last_error')}")
+            raise Exception("Database connection failed")
+        
+        limit = min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+                    current_app.config.get('MAX_ACTIVITY_RECORDS', 1000))
+        page_size = min(100, max(1, request.args.get('page_size', 100, type=int)))
+        deadline = started + current_app.config.get('DASHBOARD_BOOTSTRAP_TIMEOUT', 2.0)
+        
+        # ✅ Shared reads, concurrently - the sections below reuse these documents instead of re-querying
+        outcomes = request_fanout.run({
+            "user_profile": lambda: db.user_profiles.find_one({"user_id": user_id}),
+            "user_stats": lambda: db.user_stats.find_one({"user_id": user_id}),
+            "global_leaderboard": lambda: global_leaderboard_payload(1, page_size),
+        }, deadline - time.monotonic())
+        
+        user_profile, user_stats = outcomes["user_profile"], outcomes["user_stats"]
+        if user_profile["ok"] and user_stats["ok"] and user_profile["result"]:
+            # Once, before the sections that share the stats document
+            user_stats["result"] = user_stats_rollup.synced(user_id, user_stats["result"])
+        if user_profile["ok"] and user_stats["ok"]:
+            outcomes.update(request_fanout.run({
+                "comprehensive_stats": lambda: comprehensive_stats_payload(
+                    user_id, wallet_address, user_profile["result"], user_stats["result"]
+                ),
+                "recent_activity": lambda: recent_activity_payload(user_id, limit),
+            }, deadline - time.monotonic()))
+        else:
+            failed = user_profile if not user_profile["ok"] else user_stats
+            for name in ("comprehensive_stats", "recent_activity"):
+                outcomes[name] = {"ok": False, "timed_out": failed["timed_out"], "error": failed["error"],
+                                  "elapsed_ms": 0.0}
+        
+        sections = {
+            name: outcomes[name]["result"] if outcomes[name]["ok"] else {
+                "success": False,
+                "error": outcomes[name]["error"],
+                "timed_out": outcomes[name]["timed_out"]
+            }
+            for name in ("comprehensive_stats", "recent_activity", "global_leaderboard")
+        }
+        
+        # ✅ "My position" from the stats document already in hand
+        leaderboard = sections["global_leaderboard"]
+        if leaderboard.get("data") and user_stats["ok"]:
+            leaderboard["my_position"] = get_my_leaderboard_position(user_id, page_size, user_stats["result"] or {})
+        
+        timings = {name: outcome["elapsed_ms"] for name, outcome in outcomes.items()}
+        timings["total"] = round((time.monotonic() - started) * 1000, 1)
+        partial = not all(outcomes[name]["ok"] for name in sections)
+        if partial:
+            logger.warning(f"⚠️ Partial dashboard bootstrap for {user_id}: {timings}")
+        
+        response = jsonify({
+            "success": True,
+            "partial": partial,
+            **sections,
+            "timings_ms": timings,
+            "timestamp": datetime.now().isoformat(),
+            "user_id": user_id,
+            "wallet_address": wallet_address
         })
+        response.headers['Server-Timing'] = ", ".join(
+            f"{name.replace('_', '-')};dur={elapsed}" for name, elapsed in timings.items()
+        )
+        return response
         
     except Exception as e:
-        logger.error(f"❌ Error fetching real leaderboard: {str(e)}")
+        logger.error(f"❌ Error building dashboard bootstrap: {str(e)}")
         return jsonify({
             "success": False,
             "error": str(e)
@@ -449,6 +550,8 @@ def set_username():
             {"$set": profile_data, "$setOnInsert": {"created_at": datetime.now()}},
             upsert=True
         )
+        response_cache.invalidate_user(user_id)
+        leaderboard_snapshot.note_profile_change(user_id)
         
         # Get updated profile
         updated_profile = db.user_profiles.find_one({"user_id": user_id})
@@ -487,6 +590,7 @@ def update_profile():
         
         data = request.get_json()
         display_name = data.get('display_name', '').strip()
+        timezone_name = data.get('timezone')
         
         if not display_name:
             return jsonify({
@@ -494,6 +598,12 @@ def update_profile():
                 "error": "Display name is required"
             }), 400
         
+        if timezone_name is not None and not is_valid_timezone(timezone_name):
+            return jsonify({
+                "success": False,
+                "error": f"Unknown timezone: {timezone_name}"
+            }), 400
+        
         # Update profile
         profile_data = {
             "user_id": user_id,
@@ -509,6 +619,17 @@ def update_profile():
             upsert=True
         )
         
+        # Activity buckets and streaks are keyed by local day - recompute them when the timezone changes
+        if timezone_name is not None:
+            previous = db.user_stats.find_one_and_update(
+                {"user_id": user_id}, {"$set": {"timezone": timezone_name}}, {"_id": 0, "timezone": 1}, upsert=True
+            )
+            if (previous or {}).get('timezone') != timezone_name:
+                activity_buckets.rebuild_user(user_id, timezone_name)
+                user_stats_rollup.rebuild_streak(user_id, timezone_name)
+        response_cache.invalidate_user(user_id)
+        leaderboard_snapshot.note_profile_change(user_id)
+        
         # Get updated profile
         updated_profile = db.user_profiles.find_one({"user_id": user_id})
         if updated_profile and '_id' in updated_profile:
@@ -569,7 +690,8 @@ def get_empty_stats(wallet_address=None):
         "recent_achievements": []
     }
 
-def calculate_real_total_xp(courses, quizzes, submissions, achievements):
+def calculate_real_total_xp(courses: List[CourseProgressRead], quizzes: List[QuizResultRead],
+                            submissions: List[SubmissionRead], achievements: List[AchievementRead]):
     """Calculate total XP from ONLY real MongoDB data"""
     course_xp = sum([c.get('points', 0) for c in courses if c.get('completed', False)])
     quiz_xp = sum([q.get('points', 0) for q in quizzes])
@@ -580,42 +702,8 @@ def calculate_real_total_xp(courses, quizzes, submissions, achievements):
     logger.info(f"📊 Real XP calculation: courses={course_xp}, quizzes={quiz_xp}, coding={coding_xp}, achievements={achievement_xp}, total={total}")
     return total
 
-def calculate_real_coding_streak(submissions):
-    """Calculate coding streak from ONLY real submissions"""
-    if not submissions:
-        return 0
-    
-    sorted_submissions = sorted(submissions, key=lambda x: x.get('submitted_at', datetime.min), reverse=True)
-    current_date = datetime.now().date()
-    streak = 0
-    checked_dates = set()
-    
-    for submission in sorted_submissions:
-        submission_date = submission.get('submitted_at')
-        if isinstance(submission_date, str):
-            try:
-                submission_date = datetime.fromisoformat(submission_date).date()
-            except:
-                continue
-        elif isinstance(submission_date, datetime):
-            submission_date = submission_date.date()
-        else:
-            continue
-        
-        if submission_date in checked_dates:
-            continue
-        checked_dates.add(submission_date)
-        
-        expected_date = current_date - timedelta(days=streak)
-        if submission_date == expected_date:
-            streak += 1
-        else:
-            break
-    
-    logger.info(f"📊 Real coding streak calculated: {streak} days from {len(submissions)} submissions")
-    return streak
-
-def calculate_real_weekly_activity(courses, quizzes, submissions):
+def calculate_real_weekly_activity(courses: List[CourseProgressRead], quizzes: List[QuizResultRead],
+                                   submissions: List[SubmissionRead]):
     """Calculate weekly activity from ONLY real MongoDB data"""
     current_date = datetime.now()
     weekly_activity = []
@@ -648,7 +736,7 @@ def calculate_real_weekly_activity(courses, quizzes, submissions):
     logger.info(f"📊 Real weekly activity: {weekly_activity}")
     return weekly_activity
 
-def calculate_real_quiz_accuracy(quizzes):
+def calculate_real_quiz_accuracy(quizzes: List[QuizResultRead]):
     """Calculate quiz accuracy from ONLY real quiz data"""
     if not quizzes:
         return 0
@@ -658,7 +746,7 @@ def calculate_real_quiz_accuracy(quizzes):
     logger.info(f"📊 Real quiz accuracy: {accuracy}% from {len(quizzes)} quizzes")
     return accuracy
 
-def calculate_real_global_rank(user_stats, user_id):
+def calculate_real_global_rank(user_stats: UserStatsRead, user_id):
     """Calculate global rank from ONLY real MongoDB data"""
     if not user_stats:
         return 0
@@ -666,15 +754,16 @@ def calculate_real_global_rank(user_stats, user_id):
     user_xp = user_stats.get('total_xp', 0)
     
     try:
-        higher_ranked = db.user_stats.count_documents({"total_xp": {"$gt": user_xp}})
-        rank = higher_ranked + 1
+        # In-memory order-statistic index (falls back to a count while it builds)
+        rank = xp_rank_index.rank_of(user_id, user_xp)
         logger.info(f"📊 Real global rank: {rank} (XP: {user_xp})")
         return rank
     except Exception as e:
         logger.error(f"Error calculating real global rank: {e}")
         return 0
 
-def calculate_real_monthly_completed(courses, quizzes, submissions, current_time):
+def calculate_real_monthly_completed(courses: List[CourseProgressRead], quizzes: List[QuizResultRead],
+                                     submissions: List[SubmissionRead], current_time):
     """Calculate monthly completions from ONLY real data"""
     current_month = current_time.month
     current_year = current_time.year
@@ -701,40 +790,26 @@ def calculate_real_monthly_completed(courses, quizzes, submissions, current_time
     logger.info(f"📊 Real monthly completed: {completed} this month")
     return completed
 
-def calculate_real_skill_levels(courses, quizzes, submissions):
+def calculate_real_skill_levels(courses: List[CourseProgressRead], quizzes: List[QuizResultRead],
+                                submissions: List[SubmissionRead]):
     """Calculate skill levels from ONLY real MongoDB data"""
-    skills = {'Frontend': 0, 'Backend': 0, 'Blockchain': 0, 'AI/ML': 0, 'DevOps': 0}
+    taxonomy = skill_taxonomy.current()
+    skills = {skill: 0 for skill in taxonomy.skills}
     
     # Calculate from ONLY real course data
     for course in courses:
         if not course.get('completed', False):
             continue
             
-        topic = course.get('topic', '').lower()
-        points = course.get('points', 0)
-        
-        if any(keyword in topic for keyword in ['react', 'frontend', 'css', 'html', 'javascript']):
-            skills['Frontend'] += points * 0.1
-        elif any(keyword in topic for keyword in ['backend', 'api', 'server', 'node', 'python']):
-            skills['Backend'] += points * 0.1
-        elif any(keyword in topic for keyword in ['blockchain', 'web3', 'smart', 'solidity']):
-            skills['Blockchain'] += points * 0.1
-        elif any(keyword in topic for keyword in ['ai', 'ml', 'machine', 'learning']):
-            skills['AI/ML'] += points * 0.1
-        elif any(keyword in topic for keyword in ['devops', 'docker', 'deploy']):
-            skills['DevOps'] += points * 0.1
+        skill = taxonomy.classify_topic(course.get('topic', ''))
+        if skill:
+            skills[skill] += course.get('points', 0) * taxonomy.course_weight
     
     # Calculate from ONLY real coding submissions
     for submission in submissions:
-        language = submission.get('language', '').lower()
-        points = submission.get('points_earned', 0)
-        
-        if language in ['javascript', 'typescript']:
-            skills['Frontend'] += points * 0.05
-        elif language in ['python', 'java']:
-            skills['Backend'] += points * 0.05
-        elif language in ['solidity']:
-            skills['Blockchain'] += points * 0.05
+        skill = taxonomy.classify_language(submission.get('language', ''))
+        if skill:
+            skills[skill] += submission.get('points_earned', 0) * taxonomy.coding_weight
     
     # Normalize to 0-100 scale
     max_skill = max(skills.values()) if any(skills.values()) else 1
@@ -744,14 +819,15 @@ def calculate_real_skill_levels(courses, quizzes, submissions):
     logger.info(f"📊 Real skill levels: {skills}")
     return skills
 
-def calculate_real_time_spent(courses, quizzes, submissions):
+def calculate_real_time_spent(courses: List[CourseProgressRead], quizzes: List[QuizResultRead],
+                              submissions: List[SubmissionRead]):
     """Calculate time spent from ONLY real data"""
     completed_courses = [c for c in courses if c.get('completed', False)]
     total_time = len(completed_courses) * 2 + len(quizzes) * 0.5 + len(submissions) * 1
     logger.info(f"📊 Real time spent: {int(total_time)} hours")
     return int(total_time)
 
-def calculate_real_completion_rate(courses, quizzes):
+def calculate_real_completion_rate(courses: List[CourseProgressRead], quizzes: List[QuizResultRead]):
     """Calculate completion rate from ONLY real data"""
     total_started = len(courses)
     if total_started == 0:
@@ -762,7 +838,7 @@ def calculate_real_completion_rate(courses, quizzes):
     logger.info(f"📊 Real completion rate: {rate}% ({completed_courses}/{total_started})")
     return rate
 
-def calculate_real_favorite_topics(courses, quizzes):
+def calculate_real_favorite_topics(courses: List[CourseProgressRead], quizzes: List[QuizResultRead]):
     """Calculate favorite topics from ONLY real data"""
     topics = {}
     
@@ -782,21 +858,6 @@ def calculate_real_favorite_topics(courses, quizzes):
     logger.info(f"📊 Real favorite topics: {favorite_topics}")
     return favorite_topics
 
-def format_real_activity_description(item, activity_type):
-    """Format activity description from real data"""
-    if activity_type == "course":
-        return f"Completed: {item.get('description', 'Course module')}"
-    elif activity_type == "quiz":
-        score = item.get('score', 0)
-        return f"Quiz score: {score}%"
-    elif activity_type == "coding":
-        language = item.get('language', 'Unknown')
-        return f"Solved in {language}"
-    elif activity_type == "achievement":
-        return item.get('description', 'Achievement unlocked')
-    else:
-        return "Activity completed"
-
 # ✅ Root route
 @bp.route('/', methods=['GET'])
 def dashboard_root():
@@ -820,6 +881,7 @@ def dashboard_root():
             "/api/dashboard/comprehensive-stats",
             "/api/dashboard/recent-activity",
             "/api/dashboard/global-leaderboard",
+            "/api/dashboard/bootstrap",
             "/api/dashboard/set-username",
             "/api/dashboard/update-profile"
         ],
@@ -1,17 +1,21 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify, session
+import os
 import uuid
 import random
 import string
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-import os
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from services.mongo_registry import mongo_registry
+from services.read_routing import read_router
+from services.grading_cache import grading_cache
+from services.grading_queue import grading_queue, GradingQueueFull
+from services.exam_events import exam_events, ExamStreamLimit
 
 bp = Blueprint('exam', __name__)
 
-# MongoDB connection
-mongo_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
-client = MongoClient(mongo_uri)
-db = client.openlearnx
+# MongoDB connection (shared per-process pool, resolved lazily after fork)
+db = mongo_registry.lazy_db()
 
 def get_db():
     """Get database connection"""
@@ -21,9 +25,51 @@ def generate_exam_code():
     """Generate a unique 6-character exam code"""
     while True:
         code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        if not db.exams.find_one({"exam_code": code}):
+        if not db.exams.find_one({"exam_code": code}, {"_id": 1}):
             return code
 
+# Participants live in their own collection (one document per exam_code + name);
+# list reads never need the submitted code or per-test output
+PARTICIPANT_LIST_PROJECTION = {"_id": 0, "username": 1, "score": 1, "completed": 1, "joined_at": 1,
+                               "submission_time": 1, "language": 1, "total_score": 1, "problems_solved": 1}
+
+def list_participants(exam_code):
+    """Participants of an exam in join order, with the display name as 'name'"""
+    participants = []
+    for participant in db.participants.find({"exam_code": exam_code}, PARTICIPANT_LIST_PROJECTION).sort("joined_at", 1):
+        participant["name"] = participant.pop("username")
+        participants.append(participant)
+    return participants
+
+def rank_leaderboard(participants):
+    """Split participants into the ranked leaderboard (best score, then earliest submission) and those still working"""
+    leaderboard = sorted(
+        (p for p in participants if p.get('completed', False)),
+        key=lambda x: (-x.get('score', 0), x.get('submission_time') or datetime.now())
+    )
+    for i, participant in enumerate(leaderboard):
+        participant['rank'] = i + 1
+    waiting = [p for p in participants if not p.get('completed', False)]
+    return leaderboard, waiting
+
+def leaderboard_rank(exam_code, name_lower, score, submission_time):
+    """Rank a (score, submission time) holds against the other finishers, counted on the index"""
+    return db.participants.count_documents({
+        "exam_code": exam_code, "completed": True, "name_lower": {"$ne": name_lower},
+        "$or": [{"score": {"$gt": score}}, {"score": score, "submission_time": {"$lt": submission_time}}]
+    }) + 1
+
+def exam_snapshot(exam_code):
+    """Full leaderboard state that opens a live exam stream (or replaces events it can no longer replay)"""
+    exam = db.exams.find_one(
+        {"exam_code": exam_code},
+        {"_id": 0, "title": 1, "status": 1, "duration_minutes": 1, "start_time": 1, "end_time": 1,
+         "participant_count": 1, "max_participants": 1}
+    )
+    participants = list_participants(exam_code)
+    leaderboard, waiting_participants = rank_leaderboard(participants)
+    return {"exam_info": exam, "leaderboard": leaderboard, "waiting_participants": waiting_participants}
+
 @bp.route("/create-exam", methods=["POST", "OPTIONS"])
 def create_exam():
     """Create a new coding exam"""
@@ -128,7 +174,7 @@ def create_exam():
                     }
                 ])
             },
-            "participants": [],
+            "participant_count": 0,
             "leaderboard": [],
             "start_time": None,
             "end_time": None
@@ -199,7 +245,11 @@ def join_exam():
             return jsonify({"error": "Student name is required"}), 400
         
         # Check if exam exists
-        exam = db.exams.find_one({"exam_code": exam_code})
+        exam = db.exams.find_one(
+            {"exam_code": exam_code},
+            {"title": 1, "status": 1, "duration_minutes": 1, "max_participants": 1,
+             "problem.languages": 1, "problem.title": 1}
+        )
         if not exam:
             print(f"❌ Exam not found: {exam_code}")
             return jsonify({"error": "Invalid exam code"}), 404
@@ -211,23 +261,24 @@ def join_exam():
             print("❌ Exam already completed")
             return jsonify({"error": "This exam has already ended"}), 400
         
-        # Check capacity
-        current_participants = exam.get('participants', [])
+        # Claim a seat atomically: the count only moves while it is below capacity
         max_participants = exam.get('max_participants', 50)
-        
-        if len(current_participants) >= max_participants:
-            print(f"❌ Exam full: {len(current_participants)}/{max_participants}")
+        seat = db.exams.find_one_and_update(
+            {"exam_code": exam_code, "status": {"$ne": "completed"},
+             "$expr": {"$lt": [{"$ifNull": ["$participant_count", 0]}, {"$ifNull": ["$max_participants", 50]}]}},
+            {"$inc": {"participant_count": 1}},
+            projection={"participant_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if seat is None:
+            print(f"❌ Exam full: {max_participants} participants")
             return jsonify({"error": "Exam is full"}), 400
         
-        # Check if name is already taken
-        existing_names = [p['name'].lower() for p in current_participants]
-        if student_name.lower() in existing_names:
-            print(f"❌ Name already taken: {student_name}")
-            return jsonify({"error": "Name already taken. Please choose a different name."}), 400
-        
-        # Create new participant
+        # Create new participant (the unique exam_code + name_lower index rejects taken names)
         participant = {
-            "name": student_name,
+            "exam_code": exam_code,
+            "username": student_name,
+            "name_lower": student_name.lower(),
             "joined_at": datetime.now(),
             "session_id": str(uuid.uuid4()),
             "score": 0,
@@ -239,15 +290,18 @@ def join_exam():
             "test_results": []
         }
         
-        # Add participant to exam
-        result = db.exams.update_one(
-            {"exam_code": exam_code},
-            {"$push": {"participants": participant}}
-        )
+        try:
+            db.participants.insert_one(participant)
+        except DuplicateKeyError:
+            # Give the seat back
+            db.exams.update_one({"exam_code": exam_code}, {"$inc": {"participant_count": -1}})
+            print(f"❌ Name already taken: {student_name}")
+            return jsonify({"error": "Name already taken. Please choose a different name."}), 400
         
-        if result.modified_count == 0:
-            print("❌ Failed to add participant to database")
-            return jsonify({"error": "Failed to join exam"}), 500
+        exam_events.publish(exam_code, "joined", {
+            "name": student_name, "joined_at": participant['joined_at'],
+            "participants_count": seat['participant_count']
+        })
         
         # Set session data
         session['exam_code'] = exam_code
@@ -263,7 +317,7 @@ def join_exam():
                 "title": exam['title'],
                 "duration_minutes": exam['duration_minutes'],
                 "status": exam['status'],
-                "participants_count": len(current_participants) + 1,
+                "participants_count": seat['participant_count'],
                 "max_participants": max_participants,
                 "languages": exam.get('problem', {}).get('languages', ['python']),
                 "problem_title": exam.get('problem', {}).get('title', '')
@@ -292,7 +346,8 @@ def start_exam():
         
         print(f"📝 Start exam request - Code: {exam_code}")
         
-        exam = db.exams.find_one({"exam_code": exam_code})
+        exam = db.exams.find_one({"exam_code": exam_code},
+                                 {"status": 1, "duration_minutes": 1, "participant_count": 1})
         if not exam:
             return jsonify({"error": "Exam not found"}), 404
         
@@ -314,18 +369,58 @@ def start_exam():
         )
         
         print(f"✅ Exam {exam_code} started successfully")
+        exam_events.publish(exam_code, "exam_started", {"start_time": start_time, "end_time": end_time})
         
         return jsonify({
             "success": True,
             "message": "Exam started successfully!",
             "start_time": start_time.isoformat(),
             "end_time": end_time.isoformat(),
-            "participants_count": len(exam.get('participants', []))
+            "participants_count": exam.get('participant_count', 0)
         })
     except Exception as e:
         print(f"❌ Error starting exam: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def record_submission(submission, participant_fields, leaderboard_entry, solved):
+    """Persist a graded submission with one write per collection.
+
+    The participant row is a single upsert built from $set/$inc/$push/
+    $setOnInsert, so concurrent double-submits can't lose each other's
+    points. When EXAM_SUBMIT_TRANSACTIONS is enabled (replica set required)
+    both writes commit together. Returns the participant's standing before
+    this submission (None if they had no row yet).
+    """
+    exam_code = submission["exam_code"]
+    username = submission["username"]
+    now = submission["submitted_at"]
+
+    def write(session=None):
+        db.submissions.insert_one(submission, session=session)
+
+        participant_update = {
+            "$inc": {"total_score": leaderboard_entry["points"], "problems_solved": 1 if solved else 0},
+            "$set": {**participant_fields, "last_submission": now},
+            "$push": {"submissions": leaderboard_entry},
+            "$setOnInsert": {"username": username, "joined_at": now}
+        }
+        participant_filter = {"exam_code": exam_code, "name_lower": username.lower()}
+        standing = {"_id": 0, "username": 1, "score": 1, "completed": 1, "submission_time": 1}
+        try:
+            return db.participants.find_one_and_update(
+                participant_filter, participant_update, projection=standing, upsert=True, session=session
+            )
+        except DuplicateKeyError:
+            # Two first submissions raced on the upsert; the loser now updates the winner's row
+            return db.participants.find_one_and_update(
+                participant_filter, participant_update, projection=standing, upsert=True, session=session
+            )
+
+    if os.getenv('EXAM_SUBMIT_TRANSACTIONS', 'false').lower() == 'true':
+        with db.client.start_session() as session:
+            return session.with_transaction(write)
+    return write()
+
 # ✅ CRITICAL: The submit-solution route with enhanced debugging
 @bp.route('/submit-solution', methods=['POST', 'OPTIONS'])
 def submit_solution():
@@ -416,158 +511,44 @@ def submit_solution():
 
         print(f"📝 Solution submission: {username} -> {exam_code} (Problem: {problem_id})")
 
-        # Find the exam
-        exam = db.exams.find_one({"exam_code": exam_code.upper()})
+        # Check the exam and problem now so bad submissions fail fast; grading is queued
+        exam, problem = find_exam_problem(exam_code.upper(), problem_id)
         if not exam:
             print(f"❌ Exam not found: {exam_code}")
             return jsonify({"success": False, "error": "Exam not found"}), 404
-
-        print(f"✅ Found exam: {exam['title']}")
-
-        # Find the specific problem (support both old and new format)
-        problem = None
-        if exam.get('problems'):
-            problem = next((p for p in exam.get('problems', []) if p.get('id') == problem_id), None)
-        if not problem and exam.get('problem'):
-            problem = exam['problem']
-            problem['id'] = 'problem_1'
-
         if not problem:
             print(f"❌ Problem not found: {problem_id}")
             return jsonify({"success": False, "error": "Problem not found"}), 404
 
-        print(f"✅ Found problem: {problem.get('title', 'Untitled')}")
+        print(f"✅ Found problem: {problem.get('title', 'Untitled')} in exam {exam['title']}")
 
-        # Use the enhanced dynamic scoring system from main.py
         try:
-            from main import calculate_dynamic_score
-            print(f"🧮 Running dynamic scoring system...")
-            result = calculate_dynamic_score(code, language, problem)
-            print(f"🏆 Scoring result: {result['score']}% ({result['passed_tests']}/{result['total_tests']} tests)")
-        except ImportError as e:
-            print(f"⚠️ Could not import scoring system from main.py: {e}")
-            # Fallback basic scoring if main function not available
-            result = {
-                'score': 75,  # Default score
-                'passed_tests': 1,
-                'total_tests': 1,
-                'test_results': [{'passed': True, 'description': 'Basic execution test', 'points_earned': 75}],
-                'execution_time': 0.1,
-                'details': {'points_earned': 75, 'total_points': 100}
-            }
-            print(f"🔄 Using fallback scoring: {result['score']}%")
-
-        # Create submission record
-        submission = {
-            "submission_id": str(uuid.uuid4()),
-            "exam_code": exam_code.upper(),
-            "username": username,
-            "problem_id": problem_id,
-            "code": code,
-            "language": language,
-            "score": result['score'],
-            "passed_tests": result['passed_tests'],
-            "total_tests": result['total_tests'],
-            "test_results": result['test_results'],
-            "execution_time": result['execution_time'],
-            "submitted_at": datetime.now(),
-            "points_earned": result['details']['points_earned'],
-            "total_points": result['details']['total_points']
-        }
-
-        # Save submission to submissions collection
-        db.submissions.insert_one(submission)
-        print(f"💾 Submission saved to database")
-
-        # Update participant in exam
-        participant_update = {
-            "name": username,
-            "score": result['score'],
-            "completed": True,
-            "submission_time": datetime.now(),
-            "language": language,
-            "submission": code,
-            "test_results": result['test_results'],
-            "joined_at": datetime.now(),
-            "session_id": str(uuid.uuid4())
-        }
-
-        exam_update_result = db.exams.update_one(
-            {"exam_code": exam_code.upper(), "participants.name": username},
-            {"$set": {f"participants.$": participant_update}}
-        )
-
-        if exam_update_result.modified_count > 0:
-            print(f"✅ Updated participant {username} in exam")
-        else:
-            print(f"⚠️ Could not update participant {username} in exam - may not exist")
-
-        # Update participant leaderboard in separate collection
-        participant_filter = {"exam_code": exam_code.upper(), "username": username}
-        participant = db.participants.find_one(participant_filter)
-
-        if participant:
-            # Update existing participant
-            total_score = participant.get('total_score', 0) + result['details']['points_earned']
-            problems_solved = participant.get('problems_solved', 0)
-            if result['score'] == 100:  # Perfect score
-                problems_solved += 1
-
-            db.participants.update_one(
-                participant_filter,
-                {
-                    "$set": {
-                        "total_score": total_score,
-                        "problems_solved": problems_solved,
-                        "last_submission": datetime.now()
-                    },
-                    "$push": {
-                        "submissions": {
-                            "problem_id": problem_id,
-                            "score": result['score'],
-                            "points": result['details']['points_earned'],
-                            "submitted_at": datetime.now()
-                        }
-                    }
-                }
-            )
-            print(f"✅ Updated existing participant record")
-        else:
-            # Create new participant
-            new_participant = {
-                "exam_code": exam_code.upper(),
+            job = grading_queue.enqueue(exam_code.upper(), {
                 "username": username,
-                "total_score": result['details']['points_earned'],
-                "problems_solved": 1 if result['score'] == 100 else 0,
-                "joined_at": datetime.now(),
-                "last_submission": datetime.now(),
-                "submissions": [{
-                    "problem_id": problem_id,
-                    "score": result['score'],
-                    "points": result['details']['points_earned'],
-                    "submitted_at": datetime.now()
-                }]
-            }
-            db.participants.insert_one(new_participant)
-            print(f"✅ Created new participant record")
+                "problem_id": problem_id,
+                "code": code,
+                "language": language,
+                "submitted_at": datetime.now()
+            })
+        except GradingQueueFull as e:
+            print(f"⚠️ Grading queue full ({e.depth} waiting), retry after {e.retry_after}s")
+            response = jsonify({
+                "success": False,
+                "error": "Too many submissions are waiting to be graded. Please retry shortly.",
+                "retry_after": e.retry_after
+            })
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response, 429
 
-        print(f"✅ Solution submitted successfully: {result['score']}% ({result['passed_tests']}/{result['total_tests']} tests)")
+        print(f"📥 Submission {job['_id']} queued for grading (round {job['round']})")
 
         return jsonify({
             "success": True,
-            "message": f"Solution submitted successfully! Score: {result['score']}%",
-            "result": {
-                "score": result['score'],
-                "passed_tests": result['passed_tests'],
-                "total_tests": result['total_tests'],
-                "test_results": result['test_results'],
-                "execution_time": result['execution_time'],
-                "points_earned": result['details']['points_earned'],
-                "total_points": result['details']['total_points'],
-                "language": language,
-                "problem_id": problem_id
-            }
-        })
+            "message": "Solution submitted! Grading in progress...",
+            "submission_id": job["_id"],
+            "status": job["status"],
+            "status_url": f"/api/exam/submission/{job['_id']}"
+        }), 202
 
     except Exception as e:
         print(f"❌ Submission error: {str(e)}")
@@ -579,7 +560,247 @@ def submit_solution():
             "error_type": type(e).__name__
         }), 500
 
+def find_exam_problem(exam_code, problem_id):
+    """Exam (problem definitions only) and the requested problem, supporting the old single-problem format"""
+    exam = db.exams.find_one({"exam_code": exam_code}, {"title": 1, "problem": 1, "problems": 1})
+    if not exam:
+        return None, None
+    problem = None
+    if exam.get('problems'):
+        problem = next((p for p in exam.get('problems', []) if p.get('id') == problem_id), None)
+    if not problem and exam.get('problem'):
+        problem = exam['problem']
+        problem['id'] = 'problem_1'
+    return exam, problem
+
+def submission_result(submission):
+    """Result payload of a graded submission (stored on the job, served by the status endpoint)"""
+    return {
+        "score": submission['score'],
+        "passed_tests": submission['passed_tests'],
+        "total_tests": submission['total_tests'],
+        "test_results": submission['test_results'],
+        "execution_time": submission['execution_time'],
+        "points_earned": submission['points_earned'],
+        "total_points": submission['total_points'],
+        "language": submission['language'],
+        "problem_id": submission['problem_id'],
+        "compile_error": submission.get('compile_error'),
+        "cached": submission.get('cached', False)
+    }
+
+def publish_submission_events(exam_code, username, previous, result, submitted_at, problem_id, language):
+    """Push a graded submission to live exam streams as deltas (submitted, score_changed, rank_changed)"""
+    name = (previous or {}).get('username', username)
+    was_ranked = bool(previous and previous.get('completed'))
+    previous_score = previous.get('score', 0) if was_ranked else None
+
+    exam_events.publish(exam_code, "submitted", {
+        "name": name, "problem_id": problem_id, "language": language, "score": result['score'],
+        "passed_tests": result['passed_tests'], "total_tests": result['total_tests'],
+        "submitted_at": submitted_at
+    })
+    if previous_score != result['score']:
+        exam_events.publish(exam_code, "score_changed", {
+            "name": name, "score": result['score'], "previous_score": previous_score
+        })
+
+    # Only the submitter moves; everyone between the two ranks shifts by one
+    rank = leaderboard_rank(exam_code, username.lower(), result['score'], submitted_at)
+    previous_rank = leaderboard_rank(exam_code, username.lower(), previous_score,
+                                     previous.get('submission_time')) if was_ranked else None
+    if rank != previous_rank:
+        exam_events.publish(exam_code, "rank_changed", {
+            "name": name, "rank": rank, "previous_rank": previous_rank
+        })
+
+def grade_submission_job(job):
+    """Grade one queued submission and record it (runs on the grading queue's grader threads)"""
+    exam_code = job['exam_code']
+    username = job['username']
+    problem_id = job['problem_id']
+    language = job['language']
+    code = job['code']
+
+    _, problem = find_exam_problem(exam_code, problem_id)
+    if not problem:
+        raise ValueError(f"Problem {problem_id} no longer exists in exam {exam_code}")
+
+    # Run the problem's test cases in the sandboxed grading engine (unless this exact code was already graded)
+    print(f"🧮 Grading {job['_id']} against {len(problem.get('test_cases') or [])} test cases...")
+    result = grading_cache.grade(exam_code, code, language, problem)
+    if result['cached']:
+        print(f"♻️ Identical submission already graded - reusing the cached result")
+    if result.get('error'):
+        print(f"⚠️ Grading error: {result['error'][:200]}")
+    print(f"🏆 Scoring result: {result['score']}% ({result['passed_tests']}/{result['total_tests']} tests) "
+          f"in {result['execution_time']}s")
+
+    # Create submission record (submission_id is the job id, so a regraded job can't record twice)
+    now = job['submitted_at']
+    submission = {
+        "submission_id": job['_id'],
+        "exam_code": exam_code,
+        "username": username,
+        "problem_id": problem_id,
+        "code": code,
+        "language": language,
+        "score": result['score'],
+        "passed_tests": result['passed_tests'],
+        "total_tests": result['total_tests'],
+        "test_results": result['test_results'],
+        "execution_time": result['execution_time'],
+        "compile_error": result.get('error'),
+        "cached": result['cached'],
+        "submitted_at": now,
+        "graded_at": datetime.now(),
+        "points_earned": result['details']['points_earned'],
+        "total_points": result['details']['total_points']
+    }
+
+    # Latest-submission fields on the participant (joined_at / session_id are kept)
+    participant_fields = {
+        "score": result['score'],
+        "completed": True,
+        "submission_time": now,
+        "language": language,
+        "submission": code,
+        "test_results": result['test_results']
+    }
+
+    leaderboard_entry = {
+        "problem_id": problem_id,
+        "score": result['score'],
+        "points": result['details']['points_earned'],
+        "submitted_at": now
+    }
+
+    try:
+        previous = record_submission(
+            submission, participant_fields, leaderboard_entry, solved=result['score'] == 100
+        )
+    except DuplicateKeyError:
+        # A previous attempt of this job already recorded it (its lease expired mid-write)
+        print(f"⚠️ Submission {job['_id']} was already recorded")
+        return submission_result(db.submissions.find_one({"submission_id": job['_id']}))
+    print(f"💾 Submission saved to database")
+
+    if previous is None:
+        print(f"⚠️ {username} had not joined exam {exam_code} - created a participant record")
+    else:
+        print(f"✅ Updated participant {username}")
+    try:
+        publish_submission_events(exam_code, username, previous, result, now, problem_id, language)
+    except Exception as e:
+        print(f"⚠️ Could not publish live events for {job['_id']}: {e}")
+
+    print(f"✅ Solution graded: {result['score']}% ({result['passed_tests']}/{result['total_tests']} tests)")
+    return submission_result(submission)
+
+grading_queue.register_handler(grade_submission_job)
+
+@bp.route("/submission/<submission_id>", methods=["GET", "OPTIONS"])
+def get_submission_status(submission_id):
+    """Grading status of a submission; includes the result once graded"""
+    if request.method == "OPTIONS":
+        response = jsonify({'status': 'ok'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        response.headers.add("Access-Control-Allow-Headers", "Content-Type,Authorization")
+        response.headers.add("Access-Control-Allow-Methods", "GET,OPTIONS")
+        return response
+
+    try:
+        job = grading_queue.get(submission_id)
+        if job is None:
+            # Finished jobs expire; the submission record keeps the result
+            submission = db.submissions.find_one({"submission_id": submission_id}, {"code": 0})
+            if not submission:
+                return jsonify({"success": False, "error": "Submission not found"}), 404
+            return jsonify({
+                "success": True,
+                "submission_id": submission_id,
+                "status": "done",
+                "result": submission_result(submission)
+            })
+
+        payload = {
+            "success": True,
+            "submission_id": submission_id,
+            "exam_code": job['exam_code'],
+            "username": job['username'],
+            "status": job['status'],
+            "attempts": job.get('attempts', 0),
+            "submitted_at": job['submitted_at'].isoformat(),
+            "started_at": job['started_at'].isoformat() if job.get('started_at') else None,
+            "finished_at": job['finished_at'].isoformat() if job.get('finished_at') else None
+        }
+        if job['status'] == 'queued':
+            payload["position"] = job['position']
+        elif job['status'] == 'done':
+            payload["result"] = job['result']
+        elif job['status'] == 'failed':
+            payload["error"] = job.get('error', 'Grading failed')
+
+        response = jsonify(payload)
+        if job['status'] in ('queued', 'running'):
+            # Polling hint for clients
+            response.headers["Retry-After"] = "1"
+        return response
+
+    except Exception as e:
+        print(f"❌ Submission status error: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+EXAM_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def open_exam_stream(exam_code, last_event_id=None, loop=None):
+    """Subscribe to an exam's live events: (stream, None, 200) or (None, error, status)"""
+    if not db.exams.find_one({"exam_code": exam_code}, {"_id": 1}):
+        return None, {"error": "Exam not found"}, 404
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    try:
+        return exam_events.open(exam_code, last_event_id, loop), None, 200
+    except ExamStreamLimit as e:
+        print(f"⚠️ {e}")
+        return None, {"error": "Too many live viewers for this exam, retrying shortly", "retry_after": 30}, 429
+
+@bp.route("/stream/<exam_code>", methods=["GET", "OPTIONS"])
+def stream_exam_events(exam_code):
+    """Live leaderboard / host dashboard events for an exam (Server-Sent Events).
+
+    Opens with a snapshot event (or the events missed since Last-Event-ID),
+    then sends joined, left, submitted, score_changed, rank_changed,
+    exam_started and exam_ended deltas. Under asgi:app the same stream is
+    served natively on the event loop instead of this route.
+    """
+    if request.method == "OPTIONS":
+        response = jsonify({'status': 'ok'})
+        response.headers.add("Access-Control-Allow-Origin", "*")
+        response.headers.add("Access-Control-Allow-Headers", "Content-Type,Authorization,Last-Event-ID")
+        response.headers.add("Access-Control-Allow-Methods", "GET,OPTIONS")
+        return response
+    
+    try:
+        exam_code = exam_code.upper()
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        stream, error, status = open_exam_stream(exam_code, last_event_id)
+        if stream is None:
+            response = jsonify(error)
+            if status == 429:
+                response.headers['Retry-After'] = str(error['retry_after'])
+            return response, status
+        
+        return Response(exam_events.frames(stream, lambda: exam_snapshot(exam_code)),
+                        mimetype='text/event-stream', headers=EXAM_STREAM_HEADERS)
+    except Exception as e:
+        print(f"❌ Error opening exam stream: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @bp.route("/leaderboard/<exam_code>", methods=["GET", "OPTIONS"])
+@read_router.secondary_ok
 def get_leaderboard(exam_code):
     """Get real-time leaderboard visible to all participants"""
     if request.method == "OPTIONS":
@@ -592,24 +813,18 @@ def get_leaderboard(exam_code):
     try:
         print(f"📝 Leaderboard request - Code: {exam_code}")
         
-        exam = db.exams.find_one({"exam_code": exam_code.upper()})
+        exam = db.exams.find_one(
+            {"exam_code": exam_code.upper()},
+            {"title": 1, "status": 1, "duration_minutes": 1, "start_time": 1, "end_time": 1, "problem.title": 1}
+        )
         if not exam:
             return jsonify({"error": "Exam not found"}), 404
         
-        participants = exam.get('participants', [])
-        
-        # Sort by score and submission time
-        completed_participants = [p for p in participants if p.get('completed', False)]
-        leaderboard = sorted(
-            completed_participants,
-            key=lambda x: (-x.get('score', 0), x.get('submission_time', datetime.now()))
-        )
-        
-        # Add rank to each participant
-        for i, participant in enumerate(leaderboard):
-            participant['rank'] = i + 1
+        participants = list_participants(exam_code.upper())
         
-        waiting_participants = [p for p in participants if not p.get('completed', False)]
+        # Sort by score and submission time, with ranks
+        leaderboard, waiting_participants = rank_leaderboard(participants)
+        completed_participants = leaderboard
         
         # Calculate statistics
         total_score = sum(p.get('score', 0) for p in completed_participants)
@@ -650,7 +865,8 @@ def get_exam_problem(exam_code):
         return response
     
     try:
-        exam = db.exams.find_one({"exam_code": exam_code.upper()})
+        exam = db.exams.find_one({"exam_code": exam_code.upper()},
+                                 {"problem": 1, "title": 1, "status": 1, "duration_minutes": 1})
         if not exam:
             return jsonify({"error": "Exam not found"}), 404
         
@@ -677,25 +893,19 @@ def get_host_dashboard(exam_code):
         return response
     
     try:
-        exam = db.exams.find_one({"exam_code": exam_code.upper()})
+        exam = db.exams.find_one(
+            {"exam_code": exam_code.upper()},
+            {"exam_code": 1, "title": 1, "status": 1, "duration_minutes": 1, "max_participants": 1,
+             "created_at": 1, "start_time": 1, "end_time": 1, "problem": 1}
+        )
         if not exam:
             return jsonify({"error": "Exam not found"}), 404
         
-        participants = exam.get('participants', [])
-        
-        # Separate participants by status
-        completed_participants = [p for p in participants if p.get('completed', False)]
-        waiting_participants = [p for p in participants if not p.get('completed', False)]
-        
-        # Sort leaderboard
-        leaderboard = sorted(
-            completed_participants,
-            key=lambda x: (-x.get('score', 0), x.get('submission_time', datetime.now()))
-        )
+        participants = list_participants(exam['exam_code'])
         
-        # Add ranks
-        for i, participant in enumerate(leaderboard):
-            participant['rank'] = i + 1
+        # Separate participants by status and rank the finishers
+        leaderboard, waiting_participants = rank_leaderboard(participants)
+        completed_participants = leaderboard
         
         # Calculate time statistics
         current_time = datetime.now()
@@ -757,7 +967,11 @@ def get_exam_info(exam_code):
     try:
         print(f"📊 Host panel requesting info for exam: {exam_code}")
         
-        exam = db.exams.find_one({"exam_code": exam_code.upper()})
+        exam = db.exams.find_one(
+            {"exam_code": exam_code.upper()},
+            {"title": 1, "status": 1, "duration_minutes": 1, "participant_count": 1, "max_participants": 1,
+             "problem.title": 1, "problem.languages": 1, "created_at": 1, "host_name": 1}
+        )
         if not exam:
             print(f"❌ Exam not found: {exam_code}")
             return jsonify({"success": False, "error": "Exam not found"}), 404
@@ -771,7 +985,7 @@ def get_exam_info(exam_code):
             "title": exam["title"],
             "status": exam["status"],
             "duration_minutes": exam["duration_minutes"],
-            "participants_count": len(exam.get("participants", [])),
+            "participants_count": exam.get("participant_count", 0),
             "max_participants": exam.get("max_participants", 50),
             "problem_title": exam.get("problem", {}).get("title", exam["title"]),
             "languages": exam.get("problem", {}).get("languages", ["python"]),
@@ -799,11 +1013,10 @@ def get_participants(exam_code):
         return response
     
     try:
-        exam = db.exams.find_one({"exam_code": exam_code.upper()})
-        if not exam:
+        if not db.exams.find_one({"exam_code": exam_code.upper()}, {"_id": 1}):
             return jsonify({"success": False, "error": "Exam not found"}), 404
         
-        participants = exam.get("participants", [])
+        participants = list_participants(exam_code.upper())
         
         # Format participant data for host panel
         formatted_participants = []
@@ -813,7 +1026,7 @@ def get_participants(exam_code):
                 "score": participant.get("score", 0),
                 "completed": participant.get("completed", False),
                 "joined_at": participant.get("joined_at", ""),
-                "submitted_at": participant.get("submitted_at", None)
+                "submitted_at": participant.get("submission_time", None)
             }
             formatted_participants.append(participant_data)
         
@@ -841,13 +1054,24 @@ def remove_participant():
         if not exam_code or not participant_name:
             return jsonify({"success": False, "error": "Missing exam_code or participant_name"}), 400
         
-        # Remove participant from exam
-        result = db.exams.update_one(
-            {"exam_code": exam_code},
-            {"$pull": {"participants": {"name": participant_name}}}
+        # Remove participant from exam and free their seat
+        removed = db.participants.find_one_and_delete(
+            {"exam_code": exam_code, "name_lower": participant_name.lower()},
+            projection={"username": 1, "session_id": 1}
         )
         
-        if result.modified_count > 0:
+        if removed is not None:
+            if 'session_id' in removed:
+                seats = db.exams.find_one_and_update(
+                    {"exam_code": exam_code}, {"$inc": {"participant_count": -1}},
+                    projection={"participant_count": 1}, return_document=ReturnDocument.AFTER
+                )
+            else:
+                # Submission-only rows never took a seat
+                seats = db.exams.find_one({"exam_code": exam_code}, {"participant_count": 1})
+            exam_events.publish(exam_code, "left", {
+                "name": removed['username'], "participants_count": (seats or {}).get('participant_count', 0)
+            })
             print(f"🗑️ Host removed participant {participant_name} from exam {exam_code}")
             return jsonify({"success": True, "message": f"Participant {participant_name} removed successfully"})
         else:
@@ -875,17 +1099,19 @@ def stop_exam():
             return jsonify({"success": False, "error": "Missing exam_code"}), 400
         
         # Update exam status to completed
+        ended_at = datetime.now().isoformat()
         result = db.exams.update_one(
             {"exam_code": exam_code},
             {"$set": {
                 "status": "completed", 
-                "ended_at": datetime.now().isoformat(),
+                "ended_at": ended_at,
                 "ended_by": "host"
             }}
         )
         
         if result.modified_count > 0:
             print(f"🛑 Exam {exam_code} stopped early by host")
+            exam_events.publish(exam_code, "exam_ended", {"ended_at": ended_at, "ended_by": "host"})
             return jsonify({"success": True, "message": "Exam stopped successfully"})
         else:
             return jsonify({"success": False, "error": "Exam not found"}), 404
@@ -921,7 +1147,7 @@ def upload_question():
                 return jsonify({"success": False, "error": f"Missing required field: {field}"}), 400
         
         # Find the exam
-        exam = db.exams.find_one({"exam_code": exam_code})
+        exam = db.exams.find_one({"exam_code": exam_code}, {"status": 1, "host_name": 1, "problems.id": 1})
         if not exam:
             return jsonify({"success": False, "error": "Exam not found"}), 404
         
@@ -947,24 +1173,25 @@ def upload_question():
             "constraints": question_data.get('constraints', []),
             "time_limit": question_data.get('time_limit', 1000),
             "memory_limit": question_data.get('memory_limit', '128MB'),
+            "fail_fast": bool(question_data.get('fail_fast', False)),  # stop hidden cases at the first failure
             "created_at": datetime.now(),
             "uploaded_by": exam.get('host_name', 'Unknown'),
             "languages": question_data.get('languages', ['python']),
             "total_points": question_data.get('total_points', 100)
         }
         
-        # Update the exam with the new question
-        result = db.exams.update_one(
-            {"exam_code": exam_code},
-            {
-                "$set": {
-                    "problem": question,
-                    "updated_at": datetime.now()
-                }
-            }
-        )
+        # Update the exam with the new question, where grading reads it (find_exam_problem):
+        # multi-problem exams get it appended to problems[], old single-problem exams replace problem
+        if exam.get('problems'):
+            update = {"$push": {"problems": question}, "$set": {"updated_at": datetime.now()}}
+        else:
+            update = {"$set": {"problem": question, "updated_at": datetime.now()}}
+        result = db.exams.update_one({"exam_code": exam_code}, update)
         
         if result.modified_count > 0:
+            if not exam.get('problems'):
+                # The replaced problem's version hash no longer matches; free this worker's entries now
+                grading_cache.invalidate_scope(exam_code)
             print(f"✅ Question '{question['title']}' uploaded to exam {exam_code}")
             return jsonify({
                 "success": True,
@@ -1002,7 +1229,7 @@ def update_duration():
             return jsonify({"success": False, "error": "Invalid exam_code or duration_minutes"}), 400
         
         # Find the exam
-        exam = db.exams.find_one({"exam_code": exam_code})
+        exam = db.exams.find_one({"exam_code": exam_code}, {"status": 1})
         if not exam:
             return jsonify({"success": False, "error": "Exam not found"}), 404
         
@@ -1069,6 +1296,7 @@ def test_exam_route():
             "/api/exam/start-exam",
             "/api/exam/submit-solution",  # ✅ Now included!
             "/api/exam/leaderboard/<exam_code>",
+            "/api/exam/stream/<exam_code>",
             "/api/exam/get-problem/<exam_code>",
             "/api/exam/host-dashboard/<exam_code>",
             "/api/exam/info/<exam_code>",
@@ -1092,6 +1320,7 @@ def exam_root():
             "/api/exam/start-exam",
             "/api/exam/submit-solution",  # ✅ Now included!
             "/api/exam/leaderboard/<exam_code>",
+            "/api/exam/stream/<exam_code>",
             "/api/exam/get-problem/<exam_code>",
             "/api/exam/host-dashboard/<exam_code>",
             "/api/exam/info/<exam_code>",
@@ -3,6 +3,7 @@ from datetime import datetime
 import uuid
 import random
 import string
+from services.read_routing import read_router
 
 bp = Blueprint('quizzes', __name__)
 
@@ -50,6 +51,7 @@ def apply_difficulty_progression(current_difficulty, consecutive_correct, is_cor
 # ===================================================================
 
 @bp.route('/public-rooms', methods=['GET', 'OPTIONS'])
+@read_router.secondary_ok
 def get_public_rooms():
     """Get all public quiz rooms"""
     if request.method == "OPTIONS":
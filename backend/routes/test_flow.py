@@ -4,105 +4,152 @@ from datetime import datetime
 
 bp = Blueprint('test', __name__)
 
-def get_user_from_token(token):
+TOTAL_QUESTIONS = 10
+START_DIFFICULTY = 2
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+
+def get_user_from_token(token, secret_key=None):
     """Extract user from JWT token"""
     try:
         payload = jwt.decode(
-            token, 
-            current_app.config['SECRET_KEY'], 
+            token,
+            secret_key or current_app.config['SECRET_KEY'],
             algorithms=['HS256']
         )
         return payload['user_id']
     except:
         return None
 
-@bp.route('/start', methods=['POST'])
-async def start_test():
-    """Start a new test session"""
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = get_user_from_token(token)
-    
-    if not user_id:
-        return jsonify({"error": "Authentication required"}), 401
-    
-    data = request.get_json()
-    subject = data.get('subject', 'General')
-    
-    mongo_service = current_app.config['MONGO_SERVICE']
-    
-    # Create test session
-    session = await mongo_service.create_test_session(user_id, subject)
-    
+def serialize_question(question):
+    """Question fields sent to the client (never the answer or explanation)"""
+    return {
+        "id": str(question['_id']),
+        "question": question['question'],
+        "options": question['options'],
+        "subject": question.get('subject'),
+        "difficulty": question.get('difficulty')
+    }
+
+async def pick_question(mongo_service, difficulty, subject=None, exclude_ids=None):
+    """Next unasked question at a difficulty, preferring the test's subject"""
+    if subject and subject != 'General':
+        questions = await mongo_service.get_questions_by_difficulty(difficulty, 1, subject, exclude_ids)
+        if questions:
+            return questions[0]
+    questions = await mongo_service.get_questions_by_difficulty(difficulty, 1, exclude_ids=exclude_ids)
+    return questions[0] if questions else None
+
+# ===================================================================
+# ✅ Shared async handlers - used by the Flask views below and served
+# natively on the event loop by asgi.py
+# ===================================================================
+
+async def start_test_flow(mongo_service, user_id, data):
+    """Start a new test session; returns (payload, status)"""
+    subject = (data or {}).get('subject', 'General')
+
     # Get first question
-    questions = await mongo_service.get_questions_by_difficulty(2, 1)
-    
-    if not questions:
-        return jsonify({"error": "No questions available"}), 404
-    
-    question = questions[0]
-    session['questions'].append(str(question['_id']))
-    await mongo_service.update_test_session(str(session['_id']), {
-        'questions': session['questions'],
-        'current_question': 0
+    question = await pick_question(mongo_service, START_DIFFICULTY, subject)
+
+    if not question:
+        return {"error": "No questions available"}, 404
+
+    # Create test session with the first question already assigned
+    session = await mongo_service.create_test_session(user_id, subject, {
+        'questions': [str(question['_id'])],
+        'difficulty': START_DIFFICULTY
     })
-    
-    return jsonify({
+
+    return {
         "session_id": str(session['_id']),
-        "question": {
-            "id": str(question['_id']),
-            "question": question['question'],
-            "options": question['options'],
-            "subject": question['subject'],
-            "difficulty": question['difficulty']
-        },
+        "question": serialize_question(question),
         "question_number": 1,
-        "total_questions": 10
-    })
+        "total_questions": TOTAL_QUESTIONS
+    }, 200
 
-@bp.route('/answer', methods=['POST'])
-async def submit_answer():
-    """Submit answer and get feedback"""
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = get_user_from_token(token)
-    
-    if not user_id:
-        return jsonify({"error": "Authentication required"}), 401
-    
-    data = request.get_json()
+async def submit_answer_flow(mongo_service, user_id, data):
+    """Grade an answer and pick the next question; returns (payload, status)"""
+    data = data or {}
     session_id = data.get('session_id')
     question_id = data.get('question_id')
     answer = data.get('answer')
-    
-    mongo_service = current_app.config['MONGO_SERVICE']
-    
+
     # Get session and question
     session = await mongo_service.get_test_session(session_id)
-    question = await mongo_service.questions.find_one({"_id": question_id})
-    
-    if not session or not question:
-        return jsonify({"error": "Invalid session or question"}), 404
-    
+    question = await mongo_service.get_question(question_id)
+
+    if not session or not question or session.get('user_id') != user_id:
+        return {"error": "Invalid session or question"}, 404
+    if session.get('status') == 'completed':
+        return {"error": "Test already completed"}, 400
+
     # Check answer
     is_correct = answer == question['correct_answer']
-    
+    answers = session.get('answers', []) + [{"correct": is_correct}]
+    current_score = round(sum(1 for a in answers if a.get('correct')) / len(answers) * 100, 1)
+    test_completed = len(answers) >= TOTAL_QUESTIONS
+
+    # Adapt difficulty to the answer
+    difficulty = session.get('difficulty', START_DIFFICULTY)
+    difficulty = min(MAX_DIFFICULTY, difficulty + 1) if is_correct else max(MIN_DIFFICULTY, difficulty - 1)
+
+    next_question = None
+    if not test_completed:
+        next_question = await pick_question(
+            mongo_service, difficulty, session.get('subject'), session.get('questions', [])
+        )
+        test_completed = next_question is None
+
+    await mongo_service.record_test_answer(
+        session_id,
+        {
+            "question_id": str(question['_id']),
+            "answer": answer,
+            "correct": is_correct,
+            "answered_at": datetime.utcnow()
+        },
+        next_question_id=str(next_question['_id']) if next_question else None,
+        completed=test_completed,
+        updates={"difficulty": difficulty}
+    )
+
     # Provide feedback
     feedback = {
         "correct": is_correct,
         "confidence_score": 0.85 if is_correct else 0.25,
-        "explanation": question['explanation'],
+        "explanation": question.get('explanation', ''),
         "correct_answer": question['options'][question['correct_answer']],
-        "current_score": 75.0,
-        "total_answered": len(session.get('answers', [])) + 1
+        "current_score": current_score,
+        "total_answered": len(answers)
     }
-    
-    return jsonify({
+
+    return {
         "feedback": feedback,
-        "test_completed": False,
-        "next_question": {
-            "id": str(question['_id']),
-            "question": "Sample next question?",
-            "options": ["A", "B", "C", "D"],
-            "subject": subject,
-            "difficulty": 2
-        }
-    })
+        "test_completed": test_completed,
+        "next_question": serialize_question(next_question) if next_question else None
+    }, 200
+
+@bp.route('/start', methods=['POST'])
+async def start_test():
+    """Start a new test session"""
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    user_id = get_user_from_token(token)
+
+    if not user_id:
+        return jsonify({"error": "Authentication required"}), 401
+
+    payload, status = await start_test_flow(current_app.config['MONGO_SERVICE'], user_id, request.get_json())
+    return jsonify(payload), status
+
+@bp.route('/answer', methods=['POST'])
+async def submit_answer():
+    """Submit answer and get feedback"""
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    user_id = get_user_from_token(token)
+
+    if not user_id:
+        return jsonify({"error": "Authentication required"}), 401
+
+    payload, status = await submit_answer_flow(current_app.config['MONGO_SERVICE'], user_id, request.get_json())
+    return jsonify(payload), status
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Backfill the unified activity feed (activity_feed) from the per-type collections
+
+Usage:
+    python scripts/backfill_activity_feed.py [--user WALLET] [--batch-size 1000]
+
+Copies every user_courses, user_quizzes, user_submissions and user_achievements
+document into activity_feed. Feed ids are derived from the source document, so
+the backfill is idempotent and safe to re-run while the app is writing. Deploy
+the feed writers before running it; afterwards every user_stats document is
+marked so the dashboard skips its lazy per-user copy.
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(BASE_DIR / ".env")
+
+from services.mongo_registry import MongoClientRegistry
+from services.index_manager import apply_indexes, INDEX_SPECS
+from services.activity_feed import ActivityFeed, ACTIVITY_SOURCES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default=os.getenv('MONGODB_DB_NAME', 'openlearnx'))
+    parser.add_argument('--user', help='only this user id / wallet')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    registry = MongoClientRegistry(uri=args.uri, db_name=args.db)
+    db = registry.get_db()
+    feed = ActivityFeed(db)
+    try:
+        apply_indexes(db, {"activity_feed": INDEX_SPECS["activity_feed"]})
+
+        if args.user:
+            written = feed.backfill_user(args.user)
+            print(f"✅ Backfilled {written:,} feed entries for {args.user}")
+            return 0
+
+        total = 0
+        for activity_type, (collection, _, _) in ACTIVITY_SOURCES.items():
+            written = feed.backfill_collection(activity_type, args.batch_size)
+            total += written
+            print(f"🔁 {collection}: {written:,} feed entries")
+        marked = feed.mark_backfilled()
+        print(f"✅ Backfilled {total:,} feed entries; marked {marked:,} users")
+        return 0
+    finally:
+        registry.close()
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"❌ Activity feed backfill failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark certificate lookups: per-request MongoClient vs the pooled registry handle
+
+Usage: python scripts/bench_certificate_lookup.py [--iterations 200] [--uri mongodb://...]
+Runs against a scratch database (openlearnx_bench by default) so real data is untouched.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(BASE_DIR / ".env")
+
+from services.mongo_registry import MongoClientRegistry
+
+SHARE_CODE = "bench001"
+
+
+def lookup(db):
+    """The verify-page query: find by share code / id, then bump the view count"""
+    certificate = db.certificates.find_one({
+        "$or": [{"share_code": SHARE_CODE}, {"certificate_id": SHARE_CODE}]
+    })
+    db.certificates.update_one({"_id": certificate["_id"]}, {"$inc": {"view_count": 1}})
+
+
+def per_request_client(uri, db_name):
+    """Old behaviour: build a client and ping it for every request"""
+    client = MongoClient(
+        uri,
+        serverSelectionTimeoutMS=5000,
+        socketTimeoutMS=5000,
+        connectTimeoutMS=5000,
+        maxPoolSize=5,
+        minPoolSize=1,
+        connect=True,
+        retryWrites=False,
+        retryReads=False
+    )
+    db = client[db_name]
+    db.command('ping')
+    lookup(db)
+    client.close()
+
+
+def time_calls(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(name, samples):
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:<22} mean={statistics.mean(samples):8.2f}ms  "
+          f"p50={statistics.median(samples):8.2f}ms  p95={p95:8.2f}ms")
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default='openlearnx_bench')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    registry = MongoClientRegistry(uri=args.uri, db_name=args.db)
+    pooled_db = registry.get_db()
+    pooled_db.certificates.delete_many({"share_code": SHARE_CODE})
+    pooled_db.certificates.insert_one({
+        "certificate_id": "BENCH0000001",
+        "share_code": SHARE_CODE,
+        "student_name": "Bench Student",
+        "course_title": "Benchmarking 101",
+        "view_count": 0
+    })
+    pooled_db.certificates.create_index("share_code")
+    pooled_db.certificates.create_index("certificate_id")
+
+    print(f"📊 {args.iterations} certificate lookups against {args.uri} ({args.db})")
+    old = summarize("per-request client", time_calls(lambda: per_request_client(args.uri, args.db), args.iterations))
+    new = summarize("pooled registry", time_calls(lambda: lookup(pooled_db), args.iterations))
+    print(f"✅ Speed-up: {old / new:.1f}x lower mean latency per request")
+
+    pooled_db.certificates.delete_many({"share_code": SHARE_CODE})
+    registry.close()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Benchmark failed: {e}")
+        sys.exit(1)
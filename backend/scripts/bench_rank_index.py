@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark the in-memory rank index against counting higher-ranked users
+
+Usage: python scripts/bench_rank_index.py [--users 1000000] [--queries 2000] [--mongo [--uri mongodb://...]]
+Without --mongo everything runs in memory: the baseline is a linear count over
+all scores (what count_documents({"total_xp": {"$gt": xp}}) does when it has to
+visit every higher-ranked entry). With --mongo the baseline is the real
+count_documents against a scratch database (openlearnx_bench by default).
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(BASE_DIR / ".env")
+
+from services.rank_index import RankIndex
+
+MAX_XP = 50_000
+BATCH_SIZE = 10_000
+
+
+def time_calls(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(name, samples):
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:<26} mean={statistics.mean(samples):9.4f}ms  "
+          f"p50={statistics.median(samples):9.4f}ms  p95={p95:9.4f}ms")
+    return statistics.mean(samples)
+
+
+def mongo_baseline(args, scores, sample_users):
+    from services.mongo_registry import MongoClientRegistry
+    registry = MongoClientRegistry(uri=args.uri, db_name=args.db)
+    collection = registry.get_db().user_stats
+    collection.drop()
+    batch = []
+    for user_id, xp in scores.items():
+        batch.append({"user_id": user_id, "total_xp": xp})
+        if len(batch) >= BATCH_SIZE:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    collection.create_index([("total_xp", -1)])
+    print(f"🌱 Seeded {len(scores):,} user_stats documents")
+    mean = summarize("count_documents rank", time_calls(
+        lambda xp: collection.count_documents({"total_xp": {"$gt": xp}}),
+        [(scores[user_id],) for user_id in sample_users]
+    ))
+    collection.drop()
+    registry.close()
+    return mean
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=2_000)
+    parser.add_argument('--bucket-width', type=int, default=int(os.getenv('RANK_BUCKET_WIDTH', 10)))
+    parser.add_argument('--mongo', action='store_true', help='use count_documents on MongoDB as the baseline')
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default='openlearnx_bench')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    # Skewed like real XP: most users low, a long tail of high scorers
+    scores = {f"0x{i:040x}": min(MAX_XP, int(rng.expovariate(1 / 2_000))) for i in range(args.users)}
+    user_ids = list(scores)
+    sample_users = [rng.choice(user_ids) for _ in range(args.queries)]
+
+    index = RankIndex('total_xp', 'rollup.updated_at', bucket_width=args.bucket_width)
+    start = time.perf_counter()
+    index.load(scores.items())
+    # Benchmark the structure itself; no MongoDB sync
+    index._built_at = index._last_sync = float('inf')
+    print(f"📊 Built rank index for {args.users:,} users in {time.perf_counter() - start:.2f}s "
+          f"({index.stats()['buckets']:,} buckets of width {args.bucket_width})")
+
+    fast = summarize("rank index rank_of", time_calls(index.rank_of, [(user_id,) for user_id in sample_users]))
+    summarize("rank index top(100)", time_calls(index.top, [(100,)] * min(args.queries, 500)))
+    summarize("rank index around(5)", time_calls(index.around, [(user_id, 5) for user_id in sample_users]))
+    summarize("rank index set_score", time_calls(
+        index.set_score, [(user_id, rng.randint(0, MAX_XP)) for user_id in sample_users]
+    ))
+
+    if args.mongo:
+        slow = mongo_baseline(args, scores, sample_users[:200])
+    else:
+        values = list(scores.values())
+        slow = summarize("linear count rank", time_calls(
+            lambda xp: sum(1 for value in values if value > xp) + 1,
+            [(scores[user_id],) for user_id in sample_users[:50]]
+        ))
+    print(f"✅ Speed-up: {slow / fast:,.0f}x lower mean latency per rank lookup")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Benchmark failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Build or verify the per-user daily activity buckets (user_activity_daily)
+
+Usage:
+    python scripts/build_activity_buckets.py rebuild [--user WALLET]
+    python scripts/build_activity_buckets.py check [--user WALLET] [--sample 500] [--fix]
+
+`rebuild` recomputes every bucket from user_courses, user_quizzes and
+user_submissions in each user's timezone (user_stats.timezone, falling back to
+ACTIVITY_DEFAULT_TIMEZONE) - use it for the initial migration. `check`
+compares the stored buckets with freshly computed ones and exits with status 1
+on any mismatch.
+"""
+import os
+import sys
+import random
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(BASE_DIR / ".env")
+
+from services.mongo_registry import MongoClientRegistry
+from services.user_stats_rollup import UserStatsRollup
+from services.activity_buckets import ActivityBuckets
+
+
+def user_timezones(db, user_ids):
+    """user_id -> stored timezone name (None when unset)"""
+    timezones = {}
+    cursor = db.user_stats.find({"user_id": {"$in": user_ids}, "timezone": {"$exists": True}},
+                                {"_id": 0, "user_id": 1, "timezone": 1})
+    for user_stats in cursor:
+        timezones[user_stats["user_id"]] = user_stats["timezone"]
+    return timezones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default=os.getenv('MONGODB_DB_NAME', 'openlearnx'))
+    parser.add_argument('--user', help='only this user id / wallet')
+    parser.add_argument('--sample', type=int, default=0, help='check a random sample of N users')
+    parser.add_argument('--fix', action='store_true', help='rebuild buckets that fail the check')
+    args = parser.parse_args()
+
+    registry = MongoClientRegistry(uri=args.uri, db_name=args.db)
+    db = registry.get_db()
+    buckets = ActivityBuckets(db)
+    try:
+        user_ids = [args.user] if args.user else UserStatsRollup(db).active_user_ids()
+        if args.sample and len(user_ids) > args.sample:
+            user_ids = random.sample(user_ids, args.sample)
+
+        if args.command == 'rebuild':
+            days = 0
+            for start in range(0, len(user_ids), 1000):
+                batch = user_ids[start:start + 1000]
+                timezones = user_timezones(db, batch)
+                for user_id in batch:
+                    days += buckets.rebuild_user(user_id, timezones.get(user_id))
+                print(f"🔁 Rebuilt buckets for {start + len(batch):,}/{len(user_ids):,} users")
+            print(f"✅ Rebuilt {days:,} daily buckets for {len(user_ids):,} users")
+            return 0
+
+        mismatched = 0
+        timezones = user_timezones(db, user_ids)
+        for user_id in user_ids:
+            expected = buckets.compute_buckets(user_id, timezones.get(user_id))
+            stored = buckets.stored_buckets(user_id)
+            if expected == stored:
+                continue
+            wrong_days = sorted(day for day in set(expected) | set(stored) if expected.get(day) != stored.get(day))
+            print(f"❌ {user_id}: {len(wrong_days)} day(s) differ, e.g. {', '.join(wrong_days[:3])}")
+            mismatched += 1
+            if args.fix:
+                buckets.rebuild_user(user_id, timezones.get(user_id))
+                print("   🔁 rebuilt")
+
+        print(f"\n📊 Checked {len(user_ids):,} users: {mismatched:,} mismatched")
+        return 1 if mismatched and not args.fix else 0
+    finally:
+        registry.close()
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"❌ Activity bucket command failed: {e}")
+        sys.exit(1)
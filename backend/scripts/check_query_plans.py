@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression check: fail when a blueprint query shape scans a collection
+
+Usage: python scripts/check_query_plans.py [--uri mongodb://...] [--scale 1.0] [--skip-seed]
+
+Seeds a scratch database (openlearnx_queryplans by default) with synthetic data at
+production-like scale (100k users, 5k exams, 1M coding submissions at --scale 1.0),
+applies the index spec from services/index_manager.py, then runs explain() in
+executionStats mode for every query shape the blueprints issue. A shape fails when its
+winning plan contains a COLLSCAN or it examines more than --max-ratio documents per
+document returned. Exit status is 1 on any failure so CI can gate on it.
+
+New routes must add their query shapes to query_shapes() below.
+"""
+import os
+import sys
+import random
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(BASE_DIR / ".env")
+
+from services.mongo_registry import MongoClientRegistry
+from services.index_manager import apply_indexes
+from services.streaks import decay_filter
+
+# Documents per collection at --scale 1.0
+SEED_COUNTS = {
+    "users": 100_000,
+    "user_courses": 300_000,
+    "user_quizzes": 300_000,
+    "user_submissions": 1_000_000,
+    "user_achievements": 200_000,
+    "user_blockchain": 20_000,
+    "user_activity_daily": 500_000,
+    "activity_feed": 1_000_000,
+    "exams": 5_000,
+    "participants": 100_000,
+    "quiz_rooms": 5_000,
+    "quizzes": 200,
+    "certificates": 50_000,
+    "courses": 200,
+    "modules": 1_000,
+    "lessons": 5_000,
+}
+
+BATCH_SIZE = 10_000
+NOW = datetime(2024, 1, 1)
+
+
+def user_id(i):
+    return f"0x{i:040x}"
+
+
+def exam_code(i):
+    return f"E{i:05d}"
+
+
+def room_code(i):
+    return f"R{i:05d}"
+
+
+# ===================================================================
+# Synthetic data
+# ===================================================================
+
+def seed_documents(name, count, counts):
+    """Yield synthetic documents shaped like the ones the blueprints write"""
+    rng = random.Random(name)
+    users = max(counts["users"], 1)
+    exams = max(counts["exams"], 1)
+    courses = max(counts["courses"], 1)
+    modules = max(counts["modules"], 1)
+
+    for i in range(count):
+        ts = NOW - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        uid = user_id(rng.randrange(users))
+
+        if name == "users":
+            yield {"wallet_address": user_id(i), "status": rng.choice(["active", "active", "inactive"]),
+                   "created_at": ts}
+        elif name == "user_profiles":
+            yield {"user_id": user_id(i), "display_name": f"learner{i}", "created_at": ts}
+        elif name == "user_stats":
+            yield {"user_id": user_id(i), "total_xp": rng.randint(0, 50_000),
+                   "total_points": rng.randint(0, 50_000), "current_streak": rng.randint(0, 30),
+                   "longest_streak": rng.randint(0, 90),
+                   "last_active_day": (NOW - timedelta(days=rng.randint(0, 30))).date().isoformat()}
+        elif name == "user_courses":
+            yield {"user_id": uid, "course_id": f"course-{rng.randrange(courses)}",
+                   "completed": rng.random() < 0.6, "completed_at": ts, "points": rng.randint(10, 200),
+                   "topic": rng.choice(["python", "javascript", "data structures", "blockchain"])}
+        elif name == "user_quizzes":
+            yield {"user_id": uid, "score": rng.randint(0, 100), "completed_at": ts,
+                   "points": rng.randint(0, 100), "topic": rng.choice(["python", "algorithms", "web"])}
+        elif name == "user_submissions":
+            yield {"user_id": uid, "submitted_at": ts, "points_earned": rng.randint(0, 100),
+                   "language": rng.choice(["python", "javascript", "java", "cpp"])}
+        elif name == "user_achievements":
+            yield {"user_id": uid, "earned_at": ts, "points": rng.randint(10, 500),
+                   "type": rng.choice(["streak", "course", "quiz"]), "blockchain_verified": rng.random() < 0.2}
+        elif name == "user_activity_daily":
+            # Unique (user_id, day): walk users first, then days back from today
+            yield {"user_id": user_id(i % users), "day": (NOW - timedelta(days=i // users)).date().isoformat(),
+                   "counts": {"submissions": rng.randint(1, 5)}, "total": rng.randint(1, 5)}
+        elif name == "activity_feed":
+            kind = rng.choice(["course", "quiz", "coding", "achievement"])
+            yield {"_id": f"{kind}:{i}", "user_id": uid, "ts": ts, "type": kind, "source_id": str(i),
+                   "title": "Activity", "points_earned": rng.randint(0, 100)}
+        elif name == "user_blockchain":
+            yield {"user_id": user_id(i), "tokens_earned": rng.randint(0, 1000)}
+        elif name == "exams":
+            yield {"exam_code": exam_code(i), "title": f"Exam {i}", "is_active": rng.random() < 0.1,
+                   "created_at": ts, "max_participants": 50, "participant_count": rng.randint(0, 50)}
+        elif name == "participants":
+            yield {"exam_code": exam_code(i % exams), "username": f"Student{i // exams}",
+                   "name_lower": f"student{i // exams}", "joined_at": ts, "score": rng.randint(0, 100),
+                   "completed": rng.random() < 0.5, "submission": "def solve(s):\n    return s",
+                   "total_score": rng.randint(0, 300), "problems_solved": rng.randint(0, 3)}
+        elif name == "quiz_rooms":
+            yield {"room_code": room_code(i), "is_private": rng.random() < 0.5,
+                   "status": rng.choice(["waiting", "active", "completed", "completed", "completed"]),
+                   "created_at": ts, "participants": [
+                       {"session_id": f"{room_code(i)}-s{j}", "name": f"player{j}", "score": 0}
+                       for j in range(rng.randint(0, 10))
+                   ]}
+        elif name == "quizzes":
+            yield {"id": f"quiz-{i}", "title": f"Quiz {i}", "questions": []}
+        elif name == "certificates":
+            yield {"certificate_id": f"CERT{i:08d}", "share_code": f"s{i:07d}", "token_id": f"tok{i}",
+                   "user_id": uid, "created_at": ts, "view_count": 0, "is_revoked": False}
+        elif name == "courses":
+            yield {"id": f"course-{i}", "title": f"Course {i}",
+                   "subject": rng.choice(["Programming", "Blockchain", "Data Science"]),
+                   "difficulty": rng.choice(["Beginner", "Intermediate", "Advanced"])}
+        elif name == "modules":
+            yield {"course_id": f"course-{i % courses}", "title": f"Module {i}", "order": i // courses}
+        elif name == "lessons":
+            yield {"id": f"lesson-{i}", "course_id": f"course-{i % courses}",
+                   "module_id": f"module-{i % modules}", "order": i // modules}
+
+
+def seed(db, scale):
+    """Drop and refill every collection the query shapes touch"""
+    counts = {name: max(1, int(count * scale)) for name, count in SEED_COUNTS.items()}
+    # One profile and one stats document per user
+    counts["user_profiles"] = counts["users"]
+    counts["user_stats"] = counts["users"]
+
+    for name, count in counts.items():
+        db[name].drop()
+        batch = []
+        for document in seed_documents(name, count, counts):
+            batch.append(document)
+            if len(batch) >= BATCH_SIZE:
+                db[name].insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            db[name].insert_many(batch, ordered=False)
+        print(f"🌱 Seeded {name}: {count:,} documents")
+    return counts
+
+
+# ===================================================================
+# Query shapes issued by the blueprints
+# ===================================================================
+
+def query_shapes(sample):
+    """One entry per distinct query shape; values come from the seeded data.
+
+    allow_collscan is only for whole-collection reads of small catalogue
+    collections; check_ratio is off for counts, which return one document.
+    """
+    uid = sample["user_id"]
+    code = sample["exam_code"]
+    return [
+        # --- dashboard ---
+        {"route": "dashboard profile", "collection": "user_profiles", "op": "find",
+         "filter": {"user_id": uid}, "limit": 1},
+        {"route": "dashboard username check", "collection": "user_profiles", "op": "find",
+         "filter": {"display_name": "learner42", "user_id": {"$ne": uid}}, "limit": 1},
+        {"route": "dashboard profile update", "collection": "user_profiles", "op": "update",
+         "filter": {"user_id": uid}, "update": {"$set": {"updated_at": NOW}}},
+        {"route": "dashboard stats", "collection": "user_stats", "op": "find",
+         "filter": {"user_id": uid}, "limit": 1},
+        {"route": "dashboard courses", "collection": "user_courses", "op": "find",
+         "filter": {"user_id": uid}},
+        {"route": "dashboard quizzes", "collection": "user_quizzes", "op": "find",
+         "filter": {"user_id": uid}},
+        {"route": "dashboard submissions", "collection": "user_submissions", "op": "find",
+         "filter": {"user_id": uid}},
+        {"route": "dashboard activity buckets", "collection": "user_activity_daily", "op": "find",
+         "filter": {"user_id": uid, "day": {"$gte": (NOW - timedelta(days=364)).date().isoformat(),
+                                            "$lte": NOW.date().isoformat()}}},
+        {"route": "dashboard activity feed", "collection": "activity_feed", "op": "find",
+         "filter": {"user_id": uid}, "sort": {"ts": -1, "_id": -1}, "limit": 51},
+        {"route": "dashboard activity feed by type", "collection": "activity_feed", "op": "find",
+         "filter": {"user_id": uid, "type": {"$in": ["quiz", "coding"]},
+                    "$or": [{"ts": {"$lt": NOW}}, {"ts": NOW, "_id": {"$lt": "quiz:0"}}]},
+         "sort": {"ts": -1, "_id": -1}, "limit": 51},
+        {"route": "dashboard blockchain", "collection": "user_blockchain", "op": "find",
+         "filter": {"user_id": uid}, "limit": 1},
+        {"route": "dashboard achievements", "collection": "user_achievements", "op": "find",
+         "filter": {"user_id": uid}},
+        {"route": "dashboard leaderboard snapshot", "collection": "user_stats", "op": "find",
+         "filter": {}, "sort": {"total_xp": -1, "user_id": 1}, "limit": 1000},
+        {"route": "dashboard global rank", "collection": "user_stats", "op": "count",
+         "filter": {"total_xp": {"$gt": 40_000}}, "check_ratio": False},
+        {"route": "nightly streak advance", "collection": "user_submissions", "op": "find",
+         "filter": {"submitted_at": {"$gte": NOW - timedelta(hours=48)}}, "check_ratio": False},
+        {"route": "nightly streak decay", "collection": "user_stats", "op": "count",
+         "filter": decay_filter(), "check_ratio": False},
+
+        # --- exam ---
+        {"route": "exam lookup", "collection": "exams", "op": "find",
+         "filter": {"exam_code": code}, "limit": 1},
+        {"route": "exam join seat", "collection": "exams", "op": "update",
+         "filter": {"exam_code": code, "status": {"$ne": "completed"},
+                    "$expr": {"$lt": [{"$ifNull": ["$participant_count", 0]},
+                                      {"$ifNull": ["$max_participants", 50]}]}},
+         "update": {"$inc": {"participant_count": 1}}},
+        {"route": "exam participants list", "collection": "participants", "op": "find",
+         "filter": {"exam_code": code}, "sort": {"joined_at": 1},
+         "projection": {"_id": 0, "username": 1, "score": 1, "completed": 1, "joined_at": 1}},
+        {"route": "exam participant submission", "collection": "participants", "op": "update",
+         "filter": {"exam_code": code, "name_lower": "student1"},
+         "update": {"$set": {"score": 10, "completed": True}, "$inc": {"total_score": 10}}},
+        {"route": "exam participant by name", "collection": "participants", "op": "find",
+         "filter": {"exam_code": code, "name_lower": "student1"}, "limit": 1},
+        {"route": "exam live rank", "collection": "participants", "op": "count",
+         "filter": {"exam_code": code, "completed": True, "name_lower": {"$ne": "student1"},
+                    "$or": [{"score": {"$gt": 50}}, {"score": 50, "submission_time": {"$lt": NOW}}]},
+         "check_ratio": False},
+
+        # --- quizzes ---
+        {"route": "quiz public rooms", "collection": "quiz_rooms", "op": "find",
+         "filter": {"is_private": False, "status": {"$in": ["waiting", "active"]}},
+         "sort": {"created_at": -1}},
+        {"route": "quiz room lookup", "collection": "quiz_rooms", "op": "find",
+         "filter": {"room_code": sample["room_code"]}, "limit": 1},
+        {"route": "quiz session lookup", "collection": "quiz_rooms", "op": "find",
+         "filter": {"participants.session_id": sample["session_id"]}, "limit": 1},
+        {"route": "quiz session update", "collection": "quiz_rooms", "op": "update",
+         "filter": {"room_code": sample["room_code"], "participants.session_id": sample["session_id"]},
+         "update": {"$inc": {"participants.$.score": 1}}},
+        {"route": "quiz by id", "collection": "quizzes", "op": "find",
+         "filter": {"id": "quiz-7"}, "limit": 1},
+        {"route": "quiz list", "collection": "quizzes", "op": "find", "filter": {},
+         "allow_collscan": True},
+
+        # --- certificate ---
+        {"route": "certificate verify", "collection": "certificates", "op": "find",
+         "filter": {"$or": [{"share_code": sample["share_code"]}, {"certificate_id": sample["share_code"]}]},
+         "limit": 1},
+        {"route": "certificate by id", "collection": "certificates", "op": "find",
+         "filter": {"certificate_id": sample["certificate_id"]}, "limit": 1},
+        {"route": "certificate view count", "collection": "certificates", "op": "update",
+         "filter": {"certificate_id": sample["certificate_id"]}, "update": {"$inc": {"view_count": 1}}},
+        {"route": "certificates by user", "collection": "certificates", "op": "find",
+         "filter": {"user_id": uid}, "sort": {"created_at": -1},
+         "projection": {"_id": 0, "encrypted_wallet_id": 0}},
+        {"route": "certificates admin list", "collection": "certificates", "op": "find",
+         "filter": {}, "sort": {"created_at": -1}, "projection": {"_id": 0}},
+
+        # --- admin / courses ---
+        {"route": "admin active students", "collection": "users", "op": "count",
+         "filter": {"status": "active"}, "check_ratio": False},
+        {"route": "admin course catalogue", "collection": "courses", "op": "find", "filter": {},
+         "projection": {"_id": 0}, "allow_collscan": True},
+        {"route": "course by id", "collection": "courses", "op": "find",
+         "filter": {"id": "course-3"}, "limit": 1},
+        {"route": "course modules", "collection": "modules", "op": "find",
+         "filter": {"course_id": "course-3"}, "sort": {"order": 1}},
+        {"route": "module lessons", "collection": "lessons", "op": "find",
+         "filter": {"module_id": "module-3"}, "sort": {"order": 1}},
+        {"route": "course lesson", "collection": "lessons", "op": "find",
+         "filter": {"id": "lesson-3", "course_id": "course-3"}, "limit": 1},
+
+        # --- auth ---
+        {"route": "auth wallet login", "collection": "users", "op": "find",
+         "filter": {"wallet_address": uid}, "limit": 1},
+        {"route": "auth last login", "collection": "users", "op": "update",
+         "filter": {"wallet_address": uid}, "update": {"$set": {"last_login": NOW}}},
+    ]
+
+
+def explain_command(shape):
+    """Build the explain payload for one shape, mirroring what the driver sends"""
+    collection, filter_ = shape["collection"], shape["filter"]
+    if shape["op"] == "find":
+        command = {"find": collection, "filter": filter_}
+        for key in ("sort", "limit", "projection"):
+            if key in shape:
+                command[key] = shape[key]
+        return command
+    if shape["op"] == "count":
+        # count_documents() is an aggregate with $match + $group
+        return {"aggregate": collection, "cursor": {},
+                "pipeline": [{"$match": filter_}, {"$group": {"_id": 1, "n": {"$sum": 1}}}]}
+    if shape["op"] == "update":
+        return {"update": collection, "updates": [{"q": filter_, "u": shape["update"]}]}
+    raise ValueError(f"Unknown op {shape['op']}")
+
+
+def _walk(node, skip=("rejectedPlans", "allPlansExecution")):
+    """Yield every dict nested in an explain document, ignoring rejected plans"""
+    if isinstance(node, dict):
+        yield node
+        for key, value in node.items():
+            if key not in skip:
+                yield from _walk(value, skip)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _walk(item, skip)
+
+
+def analyze(explain):
+    """Return (stages, docs_examined, n_returned) for the winning plan"""
+    stages = []
+    for node in _walk(explain):
+        if "winningPlan" in node:
+            for plan_node in _walk(node["winningPlan"]):
+                if "stage" in plan_node:
+                    index = plan_node.get("indexName")
+                    stages.append(f"{plan_node['stage']}({index})" if index else plan_node["stage"])
+
+    docs_examined, n_returned = 0, 0
+    for node in _walk(explain):
+        stats = node.get("executionStats")
+        if isinstance(stats, dict) and "totalDocsExamined" in stats:
+            docs_examined += stats.get("totalDocsExamined", 0)
+            n_returned += stats.get("nReturned", 0)
+    return stages, docs_examined, n_returned
+
+
+def pick_sample(db):
+    """Pick real values from the seeded data so every lookup hits"""
+    room = db.quiz_rooms.find_one({"participants.0": {"$exists": True}}) or db.quiz_rooms.find_one()
+    certificate = db.certificates.find_one()
+    return {
+        "user_id": user_id(42),
+        "exam_code": exam_code(42 % max(db.exams.estimated_document_count(), 1)),
+        "room_code": room["room_code"],
+        "session_id": (room.get("participants") or [{"session_id": "missing"}])[0]["session_id"],
+        "certificate_id": certificate["certificate_id"],
+        "share_code": certificate["share_code"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default='openlearnx_queryplans')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier for SEED_COUNTS')
+    parser.add_argument('--skip-seed', action='store_true', help='reuse data from a previous run')
+    parser.add_argument('--max-ratio', type=float, default=10.0,
+                        help='max documents examined per document returned')
+    args = parser.parse_args()
+
+    registry = MongoClientRegistry(uri=args.uri, db_name=args.db)
+    db = registry.get_db()
+    try:
+        if not args.skip_seed:
+            seed(db, args.scale)
+        summary = apply_indexes(db)
+        if summary["failed"]:
+            print(f"❌ {len(summary['failed'])} spec indexes could not be built")
+            return 1
+
+        failures = 0
+        sample = pick_sample(db)
+        print(f"\n📊 Explaining {len(query_shapes(sample))} query shapes against {args.db}\n")
+        for shape in query_shapes(sample):
+            explain = db.command("explain", explain_command(shape), verbosity="executionStats")
+            stages, docs_examined, n_returned = analyze(explain)
+
+            problems = []
+            if any(stage.startswith("COLLSCAN") for stage in stages) and not shape.get("allow_collscan"):
+                problems.append("COLLSCAN")
+            if shape.get("check_ratio", True) and docs_examined > args.max_ratio * max(n_returned, 1):
+                problems.append(f"examined {docs_examined:,} for {n_returned:,} returned")
+
+            status = "❌" if problems else "✅"
+            print(f"{status} {shape['route']:<28} {shape['collection']:<18} "
+                  f"{' > '.join(reversed(stages)):<60} docs={docs_examined:,}/{n_returned:,}"
+                  + (f"  <- {', '.join(problems)}" if problems else ""))
+            failures += bool(problems)
+
+        if failures:
+            print(f"\n❌ {failures} query shape(s) regressed")
+            return 1
+        print("\n✅ All query shapes use an index")
+        return 0
+    finally:
+        registry.close()
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"❌ Query plan check failed: {e}")
+        sys.exit(1)
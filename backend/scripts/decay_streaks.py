@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Reset coding streaks that broke because a user was inactive
+
+Usage: python scripts/decay_streaks.py [--dry-run] [--since-hours 48]
+Run nightly (e.g. from cron shortly after midnight UTC). Submissions stored in
+the last --since-hours first advance their users' streaks (submissions are
+written straight into user_submissions, not through the rollup writers), then
+a single update_many sets current_streak to 0 for every user whose
+last_active_day is before yesterday in their own timezone. Reads already treat
+such streaks as 0, so a late or skipped run never shows a stale streak on the
+dashboard - it only keeps the stored value (and the leaderboard) honest.
+"""
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(BASE_DIR / ".env")
+
+from services.mongo_registry import MongoClientRegistry
+from services.streaks import decay_filter, decay_streaks, advance_streaks
+from services.leaderboard_snapshot import SNAPSHOT_ID
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default=os.getenv('MONGODB_DB_NAME', 'openlearnx'))
+    parser.add_argument('--dry-run', action='store_true', help='only count the streaks that would be reset')
+    parser.add_argument('--since-hours', type=int, default=48,
+                        help='advance streaks from submissions stored in this window (covers every timezone)')
+    args = parser.parse_args()
+
+    registry = MongoClientRegistry(uri=args.uri, db_name=args.db)
+    db = registry.get_db()
+    try:
+        if args.dry_run:
+            count = db.user_stats.count_documents(decay_filter())
+            print(f"📊 {count:,} streaks would be reset")
+            return 0
+        advanced = advance_streaks(db, datetime.utcnow() - timedelta(hours=args.since_hours))
+        decayed = decay_streaks(db)
+        if advanced or decayed:
+            # The snapshot shows streaks; let the next read rebuild it
+            db.leaderboard_snapshots.update_one({"_id": SNAPSHOT_ID}, {"$set": {"stale": True}})
+        print(f"🔥 Advanced streaks for {advanced:,} recently active users")
+        print(f"✅ Reset {decayed:,} broken streaks")
+        return 0
+    finally:
+        registry.close()
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"❌ Streak decay failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Docker API proxy that only lets the grader run its own sandbox containers
+
+Usage: python scripts/docker_socket_proxy.py [--listen 0.0.0.0:2375] [--socket /var/run/docker.sock]
+Run it next to the Docker socket and point the grading worker at it
+(DOCKER_HOST=tcp://docker-proxy:2375) so nothing that grades submissions
+holds the daemon socket itself. Allowed: ping/version, creating a container
+from GRADER_IMAGE with the sandbox settings services/grading_engine.py uses
+(no network, read-only root, no host mounts or devices, ALL capabilities
+dropped except the harness's), and inspect/archive/start/wait/kill/logs/remove
+on containers created through this proxy. Everything else gets a 403.
+"""
+import os
+import re
+import sys
+import json
+import socket
+import argparse
+import threading
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from services.grading_engine import HARNESS_CAPABILITIES
+
+API_PATH = re.compile(r'^(?:/v[\d.]+)?(/[^?]*)')
+CONTAINER_PATH = re.compile(r'^/containers/([0-9a-f]{64})(?:/(json|archive|start|wait|kill|logs))?$')
+CONTAINER_ACTIONS = {("GET", "json"), ("PUT", "archive"), ("POST", "start"), ("POST", "wait"),
+                     ("POST", "kill"), ("GET", "logs"), ("DELETE", None)}
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "upgrade"}
+
+
+class UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__('localhost', timeout=None)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.unix_path)
+
+
+def create_refusal(config, image):
+    """Why a container create request is refused, or None when it is a grading sandbox"""
+    host = config.get("HostConfig") or {}
+    if config.get("Image") != image:
+        return f"only {image} may be run"
+    if host.get("NetworkMode") != "none":
+        return "sandboxes have no network"
+    if host.get("Privileged") or host.get("Binds") or host.get("Devices") or host.get("VolumesFrom") \
+            or host.get("DeviceRequests") or host.get("DeviceCgroupRules"):
+        return "no privileges, host paths or devices"
+    if any(mount.get("Type") != "volume" or mount.get("Source") for mount in host.get("Mounts") or []):
+        return "only anonymous volumes may be mounted"
+    if any(host.get(key) for key in ("PidMode", "IpcMode", "UTSMode", "UsernsMode", "CgroupParent")):
+        return "sandboxes keep their own namespaces"
+    if "ALL" not in (host.get("CapDrop") or []) or \
+            not set(host.get("CapAdd") or []) <= set(HARNESS_CAPABILITIES):
+        return f"capabilities beyond {', '.join(HARNESS_CAPABILITIES)}"
+    security = host.get("SecurityOpt") or []
+    if any("unconfined" in option for option in security):
+        return "seccomp and AppArmor profiles stay on"
+    if "no-new-privileges" not in security or not host.get("ReadonlyRootfs"):
+        return "sandboxes need no-new-privileges and a read-only root"
+    if not host.get("Memory") or not host.get("PidsLimit"):
+        return "sandboxes need memory and pids limits"
+    return None
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    socket_path = '/var/run/docker.sock'
+    image = 'openlearnx-grader:latest'
+    owned = set()
+    owned_lock = threading.Lock()
+
+    def do_GET(self):
+        self._handle()
+
+    do_HEAD = do_POST = do_PUT = do_DELETE = do_GET
+
+    def _handle(self):
+        if self.headers.get('Transfer-Encoding'):
+            return self._refuse(411, "send a Content-Length")
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        path = API_PATH.match(self.path).group(1)
+
+        container = CONTAINER_PATH.match(path)
+        if path in ("/_ping", "/version") and self.command in ("GET", "HEAD"):
+            pass
+        elif path == "/containers/create" and self.command == "POST":
+            try:
+                refusal = create_refusal(json.loads(body or b'{}'), self.image)
+            except ValueError:
+                refusal = "invalid JSON"
+            if refusal:
+                return self._refuse(403, refusal)
+        elif container and (self.command, container.group(2)) in CONTAINER_ACTIONS:
+            with self.owned_lock:
+                if container.group(1) not in self.owned:
+                    return self._refuse(403, "not a grading sandbox")
+        else:
+            return self._refuse(403, f"{self.command} {path} is not allowed")
+
+        status, headers, payload = self._forward(body)
+        if path == "/containers/create" and status == 201:
+            with self.owned_lock:
+                self.owned.add(json.loads(payload)["Id"])
+        elif container and self.command == "DELETE" and status in (204, 404):
+            with self.owned_lock:
+                self.owned.discard(container.group(1))
+        self._reply(status, headers, payload)
+
+    def _forward(self, body):
+        upstream = UnixConnection(self.socket_path)
+        try:
+            headers = {name: value for name, value in self.headers.items() if name.lower() not in HOP_HEADERS}
+            upstream.request(self.command, self.path, body=body or None, headers=headers)
+            response = upstream.getresponse()
+            # Non-follow logs and wait end on their own, so whole responses are fine here
+            payload = b'' if self.command == "HEAD" else response.read()
+            return response.status, response.getheaders(), payload
+        finally:
+            upstream.close()
+
+    def _refuse(self, status, message):
+        self.log_message("refused %s %s: %s", self.command, self.path, message)
+        self._reply(status, [("Content-Type", "application/json")], json.dumps({"message": message}).encode())
+
+    def _reply(self, status, headers, payload):
+        self.send_response(status)
+        for name, value in headers:
+            if name.lower() not in HOP_HEADERS:
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--listen', default=os.getenv('DOCKER_PROXY_LISTEN', '0.0.0.0:2375'))
+    parser.add_argument('--socket', default=os.getenv('DOCKER_SOCKET', '/var/run/docker.sock'))
+    parser.add_argument('--image', default=os.getenv('GRADER_IMAGE', 'openlearnx-grader:latest'))
+    args = parser.parse_args()
+
+    ProxyHandler.socket_path = args.socket
+    ProxyHandler.image = args.image
+    host, port = args.listen.rsplit(':', 1)
+    server = ThreadingHTTPServer((host, int(port)), ProxyHandler)
+    server.daemon_threads = True
+    print(f"🐳 Docker proxy on {args.listen} for {args.image} sandboxes")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"❌ Docker proxy failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Run exam submission graders outside the API processes
+
+Usage: python scripts/grading_worker.py [--workers 4]
+Claims queued submissions from grading_jobs in per-exam fair order and grades
+them until stopped (Ctrl+C / SIGTERM). Run one or more of these on dedicated
+machines and set GRADING_QUEUE_WORKERS=0 on the API so test runs never compete
+with request handling. Jobs a stopped worker was grading are requeued when
+their lease (GRADING_JOB_LEASE) expires.
+"""
+import os
+import sys
+import signal
+import argparse
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(BASE_DIR / ".env")
+
+from services.mongo_registry import mongo_registry
+from services.grading_queue import grading_queue
+import routes.exam  # noqa: F401 - registers the submission grading handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default=os.getenv('MONGODB_DB_NAME', 'openlearnx'))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('GRADING_WORKER_THREADS', 4)),
+                        help='grader threads (each grades one submission at a time)')
+    args = parser.parse_args()
+
+    # The grading handler reads and writes through the shared registry
+    mongo_registry.configure(uri=args.uri, db_name=args.db)
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    try:
+        grading_queue.workers = args.workers
+        grading_queue.ensure_started()
+        depth = grading_queue.depth()
+        print(f"🧮 {args.workers} graders running ({depth['queued']} queued, {depth['running']} running)")
+        while not stopped.wait(60):
+            print(f"📊 {grading_queue.stats()}")
+        return 0
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        print("👋 Stopping graders...")
+        grading_queue.stop()
+        mongo_registry.close()
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"❌ Grading worker failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Apply or audit the declarative MongoDB index spec (services/index_manager.py)
+
+Usage:
+    python scripts/manage_indexes.py apply [--rebuild-conflicts]
+    python scripts/manage_indexes.py report [--json]
+
+`report` lists spec indexes missing from the server, live indexes not in the
+spec, and indexes with zero recorded accesses since the server last restarted.
+Exits with status 1 when anything is missing so it can gate deployments.
+"""
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(BASE_DIR / ".env")
+
+from services.mongo_registry import MongoClientRegistry
+from services.index_manager import apply_indexes, index_report
+
+
+def print_section(title, rows):
+    print(f"\n{title} ({len(rows)})")
+    for row in rows:
+        extra = f"  since {row['since']}" if row.get("since") else ""
+        print(f"  - {row['collection']}.{row['index']}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=['apply', 'report'])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default=os.getenv('MONGODB_DB_NAME', 'openlearnx'))
+    parser.add_argument('--rebuild-conflicts', action='store_true',
+                        help='drop and recreate indexes whose options differ from the spec')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    registry = MongoClientRegistry(uri=args.uri, db_name=args.db)
+    db = registry.get_db()
+    try:
+        if args.command == 'apply':
+            summary = apply_indexes(db, rebuild_conflicts=args.rebuild_conflicts)
+            print(f"✅ {summary['created_or_present']} indexes created or already present")
+            for row in summary["rebuilt"]:
+                print(f"🔁 Rebuilt {row['collection']}.{row['index']}")
+            for row in summary["failed"]:
+                print(f"❌ {row['collection']}.{row['index']}: {row['error']}")
+            return 1 if summary["failed"] else 0
+
+        report = index_report(db)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print(f"📊 Index report for {args.db} ({report['generated_at']})")
+            print_section("Missing from server", report["missing"])
+            print_section("Not in spec", report["unexpected"])
+            print_section("Unused (0 ops)", report["unused"])
+        return 1 if report["missing"] else 0
+    finally:
+        registry.close()
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"❌ Index command failed: {e}")
+        sys.exit(1)
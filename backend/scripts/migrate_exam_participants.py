@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Move exam participants out of the embedded exams.participants arrays
+
+Usage: python scripts/migrate_exam_participants.py
+Run once after deploying the participants-collection release. Every embedded
+participant becomes (or is merged into) its row in the participants
+collection, keyed by exam code and lower-cased name; each exam then gets its
+participant_count seat counter and loses the array. Leaderboard rows written
+before the release get their name_lower. Idempotent and safe to re-run.
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(BASE_DIR / ".env")
+
+from services.mongo_registry import MongoClientRegistry
+from services.index_manager import apply_indexes, INDEX_SPECS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default=os.getenv('MONGODB_DB_NAME', 'openlearnx'))
+    args = parser.parse_args()
+
+    registry = MongoClientRegistry(uri=args.uri, db_name=args.db)
+    db = registry.get_db()
+    try:
+        apply_indexes(db, {"participants": INDEX_SPECS["participants"]})
+
+        # Leaderboard rows from before the release are keyed by exact username only
+        named, collisions = 0, 0
+        for row in db.participants.find({"name_lower": {"$exists": False}}, {"exam_code": 1, "username": 1}):
+            try:
+                db.participants.update_one({"_id": row["_id"]},
+                                           {"$set": {"name_lower": str(row["username"]).lower()}})
+                named += 1
+            except DuplicateKeyError:
+                collisions += 1
+                print(f"   ⚠️ {row['exam_code']}: '{row['username']}' differs from another participant "
+                      f"only by case; left unmerged")
+        print(f"🔤 {named:,} leaderboard rows keyed by lower-cased name")
+
+        moved, exams = 0, 0
+        for exam in db.exams.find({"participants": {"$exists": True}}, {"exam_code": 1, "participants": 1}):
+            exam_code = exam["exam_code"]
+            skipped = 0
+            for participant in exam.get("participants") or []:
+                name = participant.get("name")
+                if not name:
+                    continue
+                fields = {field: value for field, value in participant.items() if field not in ("name", "rank")}
+                try:
+                    db.participants.update_one(
+                        {"exam_code": exam_code, "name_lower": name.lower()},
+                        {"$set": fields, "$setOnInsert": {"username": name}},
+                        upsert=True
+                    )
+                    moved += 1
+                except DuplicateKeyError:
+                    skipped += 1
+                    collisions += 1
+                    print(f"   ⚠️ {exam_code}: '{name}' clashes with an unmerged leaderboard row; skipped")
+
+            # Seats are the participants who joined (submission-only rows never took one)
+            seats = db.participants.count_documents({"exam_code": exam_code, "session_id": {"$exists": True}})
+            update = {"$set": {"participant_count": seats}}
+            if skipped:
+                # Keep the array until every participant has a row; re-run after the manual merge
+                print(f"   ⚠️ {exam_code}: kept the embedded participants ({skipped:,} not migrated)")
+            else:
+                update["$unset"] = {"participants": ""}
+                exams += 1
+            db.exams.update_one({"_id": exam["_id"]}, update)
+        db.exams.update_many({"participant_count": {"$exists": False}}, {"$set": {"participant_count": 0}})
+        print(f"👥 Moved {moved:,} participants out of {exams:,} exams")
+
+        if collisions:
+            print(f"⚠️ {collisions:,} case-insensitive name collisions need a manual merge")
+            return 1
+        print("✅ Exam participants migrated")
+        return 0
+    finally:
+        registry.close()
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"❌ Participant migration failed: {e}")
+        sys.exit(1)
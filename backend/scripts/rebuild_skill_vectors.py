@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Rescore every user's skill points (user_stats.rollup.skills_raw) with the current taxonomy
+
+Usage: python scripts/rebuild_skill_vectors.py [--check] [--batch-size 1000]
+Run after changing the taxonomy (PUT /api/admin/skill-taxonomy). Completed
+courses and coding submissions are streamed once and scored for all users at
+once as a NumPy matrix, instead of one full rollup rebuild per user. `--check`
+only reports users whose stored skill points differ and exits with status 1
+if any do.
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(BASE_DIR / ".env")
+
+import numpy as np
+from pymongo import UpdateOne
+
+from services.mongo_registry import mongo_registry
+from services.skill_taxonomy import skill_taxonomy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default=os.getenv('MONGODB_DB_NAME', 'openlearnx'))
+    parser.add_argument('--check', action='store_true', help='compare only, do not write')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    # The taxonomy service reads through the shared registry
+    mongo_registry.configure(uri=args.uri, db_name=args.db)
+    db = mongo_registry.get_db()
+    try:
+        skill_taxonomy.reload(force=True)
+        taxonomy = skill_taxonomy.current()
+        print(f"📚 Taxonomy v{taxonomy.version}: {', '.join(taxonomy.skills)}")
+
+        user_ids, computed = taxonomy.skill_matrix(
+            db.user_courses.find({"completed": True, "user_id": {"$exists": True}},
+                                 {"_id": 0, "user_id": 1, "topic": 1, "points": 1, "completed": 1}),
+            db.user_submissions.find({"user_id": {"$exists": True}},
+                                     {"_id": 0, "user_id": 1, "language": 1, "points_earned": 1})
+        )
+        print(f"📊 Scored {len(user_ids):,} users")
+
+        stored_ids, stored = taxonomy.matrix_from_rollups(db.user_stats.find(
+            {"rollup": {"$exists": True}}, {"_id": 0, "user_id": 1, "rollup.skills_raw": 1}
+        ))
+        position = {user_id: row for row, user_id in enumerate(stored_ids)}
+        changed = [
+            row for row, user_id in enumerate(user_ids)
+            if user_id not in position or not np.allclose(computed[row], stored[position[user_id]], atol=1e-6)
+        ]
+        print(f"🔍 {len(changed):,} users have outdated skill points")
+        if args.check:
+            return 1 if changed else 0
+
+        batch = []
+        for row in changed:
+            skills_raw = {skill: float(computed[row, index]) for index, skill in enumerate(taxonomy.skills)}
+            batch.append(UpdateOne({"user_id": user_ids[row], "rollup": {"$exists": True}},
+                                   {"$set": {"rollup.skills_raw": skills_raw}}))
+            if len(batch) >= args.batch_size:
+                db.user_stats.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            db.user_stats.bulk_write(batch, ordered=False)
+        print(f"✅ Rescored {len(changed):,} users")
+        return 0
+    finally:
+        mongo_registry.close()
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"❌ Skill vector rebuild failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Recount the materialized admin dashboard counters (admin_counters)
+
+Usage: python scripts/reconcile_admin_counters.py
+Run periodically (e.g. hourly from cron). The admin endpoints keep the
+counters up to date with $inc on every create/update/delete; this recounts
+courses, modules, lessons and the subject / difficulty breakdowns from the
+collections and corrects any drift - writes made outside the admin API (seed
+scripts, manual fixes) or increments that failed. Active students are counted
+live on every read, so they never drift.
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+load_dotenv(BASE_DIR / ".env")
+
+from services.mongo_registry import MongoClientRegistry
+from services.admin_counters import AdminCounters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default=os.getenv('MONGODB_DB_NAME', 'openlearnx'))
+    args = parser.parse_args()
+
+    registry = MongoClientRegistry(uri=args.uri, db_name=args.db)
+    try:
+        result = AdminCounters(registry.get_db()).reconcile()
+        counters = result["counters"]
+        print(f"📊 courses={counters['courses']:,} modules={counters['modules']:,} "
+              f"lessons={counters['lessons']:,} active_students={counters['active_students']:,}")
+        if result["drift"]:
+            for name, amount in result["drift"].items():
+                print(f"   🔧 {name}: {amount}")
+            print("✅ Counters reconciled, drift corrected")
+        else:
+            print("✅ Counters were already accurate")
+        return 0
+    finally:
+        registry.close()
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"❌ Counter reconciliation failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,241 @@
+import os
+import logging
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Any, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from services.mongo_registry import mongo_registry
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_BUCKETS_VERSION = 1
+MAX_RANGE_DAYS = 366
+
+# Activity type -> (source collection, timestamp field). Only real datetimes
+# count, matching the original weekly/monthly calculations.
+ACTIVITY_SOURCES = {
+    "courses": ("user_courses", "completed_at"),
+    "quizzes": ("user_quizzes", "completed_at"),
+    "submissions": ("user_submissions", "submitted_at"),
+}
+
+BUCKET_PROJECTION = {"_id": 0, "day": 1, "counts": 1, "total": 1}
+
+
+def default_timezone() -> str:
+    return os.getenv('ACTIVITY_DEFAULT_TIMEZONE', 'UTC')
+
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return False
+
+
+def resolve_timezone(name: Optional[str] = None) -> ZoneInfo:
+    """User's IANA timezone, falling back to the default (and then UTC)"""
+    for candidate in (name, default_timezone()):
+        if candidate and is_valid_timezone(candidate):
+            return ZoneInfo(candidate)
+    return ZoneInfo('UTC')
+
+
+def local_day(when, tz: ZoneInfo) -> Optional[str]:
+    """Calendar day (YYYY-MM-DD) of an activity timestamp in the user's timezone"""
+    if not isinstance(when, datetime):
+        return None
+    if when.tzinfo is None:
+        # Stored timestamps are naive UTC (the servers run on UTC)
+        when = when.replace(tzinfo=timezone.utc)
+    return when.astimezone(tz).date().isoformat()
+
+
+def local_today(tz: ZoneInfo, now: Optional[datetime] = None) -> date:
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    return now.astimezone(tz).date()
+
+
+def _count_days(activities: Iterable[Tuple[str, Any]], tz: ZoneInfo) -> Dict[str, Dict[str, int]]:
+    """(activity type, timestamp) pairs counted into local-day buckets"""
+    buckets: Dict[str, Dict[str, int]] = {}
+    for activity_type, when in activities:
+        day = local_day(when, tz)
+        if day:
+            counts = buckets.setdefault(day, {})
+            counts[activity_type] = counts.get(activity_type, 0) + 1
+    return buckets
+
+
+def _day_range(start: date, end: date) -> List[str]:
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+
+
+class ActivityBuckets:
+    """Per-user daily activity counters (user_activity_daily).
+
+    One small document per user per local calendar day holds a count per
+    activity type, bumped with $inc as activity is written, so weekly,
+    monthly and year-long views read at most MAX_RANGE_DAYS documents
+    through the (user_id, day) index instead of every activity document.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else mongo_registry.get_db()
+
+    @property
+    def collection(self):
+        return self.db.user_activity_daily
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def record(self, user_id: str, activity_type: str, when, tz_name: Optional[str] = None,
+               amount: int = 1) -> Optional[str]:
+        """Count one activity in the bucket for its local day; returns the day"""
+        day = local_day(when, resolve_timezone(tz_name))
+        if day is None or not amount:
+            return None
+        update = {
+            "$inc": {f"counts.{activity_type}": amount, "total": amount},
+            "$set": {"updated_at": datetime.now()}
+        }
+        try:
+            self.collection.update_one({"user_id": user_id, "day": day}, update, upsert=True)
+        except DuplicateKeyError:
+            # Two first writes for the same day raced on the upsert; the bucket exists now
+            self.collection.update_one({"user_id": user_id, "day": day}, update)
+        return day
+
+    def record_many(self, user_id: str, activities: Iterable[Tuple[str, Any]],
+                    tz_name: Optional[str] = None) -> int:
+        """Count several (activity type, timestamp) pairs with one upsert per local day"""
+        buckets = _count_days(activities, resolve_timezone(tz_name))
+        if not buckets:
+            return 0
+        now = datetime.now()
+        updates = [
+            ({"user_id": user_id, "day": day},
+             {"$inc": {**{f"counts.{activity_type}": count for activity_type, count in counts.items()},
+                       "total": sum(counts.values())},
+              "$set": {"updated_at": now}})
+            for day, counts in buckets.items()
+        ]
+        try:
+            self.collection.bulk_write([UpdateOne(filter_, update, upsert=True) for filter_, update in updates],
+                                       ordered=False)
+        except BulkWriteError as e:
+            # Unordered: only the reported upserts failed; a duplicate key means
+            # another writer created that day's bucket first
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") != 11000:
+                    raise
+                self.collection.update_one(*updates[error["index"]])
+        return len(buckets)
+
+    def move(self, user_id: str, activity_type: str, previous_when, when, tz_name: Optional[str] = None):
+        """Re-bucket an activity whose timestamp changed (e.g. a course being completed)"""
+        tz = resolve_timezone(tz_name)
+        if local_day(previous_when, tz) == local_day(when, tz):
+            return
+        self.record(user_id, activity_type, previous_when, tz_name, amount=-1)
+        self.record(user_id, activity_type, when, tz_name)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def daily_counts(self, user_id: str, start: date, end: date) -> Dict[str, Dict[str, Any]]:
+        """Buckets between two local days (inclusive), keyed by day"""
+        if (end - start).days >= MAX_RANGE_DAYS:
+            raise ValueError(f"Activity range is limited to {MAX_RANGE_DAYS} days")
+        cursor = self.collection.find(
+            {"user_id": user_id, "day": {"$gte": start.isoformat(), "$lte": end.isoformat()}},
+            BUCKET_PROJECTION
+        )
+        return {bucket["day"]: bucket for bucket in cursor}
+
+    def summary(self, user_id: str, today: date) -> Dict[str, Any]:
+        """Weekly activity and this month's total from one range read"""
+        week_start = today - timedelta(days=6)
+        month_start = today.replace(day=1)
+        buckets = self.daily_counts(user_id, min(week_start, month_start), today)
+        return {
+            "weekly_activity": [buckets.get(day, {}).get("total", 0) for day in _day_range(week_start, today)],
+            "monthly_completed": sum(buckets.get(day, {}).get("total", 0) for day in _day_range(month_start, today))
+        }
+
+    def heatmap(self, user_id: str, start: date, end: date) -> List[Dict[str, Any]]:
+        """One entry per day in the range, zero-filled"""
+        buckets = self.daily_counts(user_id, start, end)
+        days = []
+        for day in _day_range(start, end):
+            bucket = buckets.get(day, {})
+            counts = bucket.get("counts", {})
+            days.append({
+                "date": day,
+                "total": bucket.get("total", 0),
+                "counts": {activity_type: counts.get(activity_type, 0) for activity_type in ACTIVITY_SOURCES}
+            })
+        return days
+
+    # ------------------------------------------------------------------
+    # Rebuild (migration and timezone changes)
+    # ------------------------------------------------------------------
+
+    def compute_buckets(self, user_id: str, tz_name: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Count every source document for a user into local-day buckets"""
+        return _count_days(
+            ((activity_type, document.get(field))
+             for activity_type, (collection, field) in ACTIVITY_SOURCES.items()
+             for document in self.db[collection].find({"user_id": user_id}, {"_id": 0, field: 1})),
+            resolve_timezone(tz_name)
+        )
+
+    def rebuild_user(self, user_id: str, tz_name: Optional[str] = None) -> int:
+        """Replace a user's buckets with ones recomputed from the source collections.
+
+        Activity written while the rebuild runs can be counted twice or
+        lost; run the migration before switching writers over, or re-run it.
+        """
+        buckets = self.compute_buckets(user_id, tz_name)
+        now = datetime.now()
+        self.collection.delete_many({"user_id": user_id, "day": {"$nin": list(buckets)}})
+        if buckets:
+            self.collection.bulk_write([
+                ReplaceOne(
+                    {"user_id": user_id, "day": day},
+                    {"user_id": user_id, "day": day, "counts": counts,
+                     "total": sum(counts.values()), "updated_at": now},
+                    upsert=True
+                )
+                for day, counts in buckets.items()
+            ], ordered=False)
+        self.db.user_stats.update_one(
+            {"user_id": user_id},
+            {"$set": {"activity_buckets_version": ACTIVITY_BUCKETS_VERSION}}
+        )
+        return len(buckets)
+
+    def stored_buckets(self, user_id: str) -> Dict[str, Dict[str, int]]:
+        """Every stored bucket for a user (used by the migration check)"""
+        return {
+            bucket["day"]: {key: value for key, value in bucket.get("counts", {}).items() if value}
+            for bucket in self.collection.find({"user_id": user_id}, BUCKET_PROJECTION)
+            if bucket.get("total")
+        }
+
+
+# Create global instance
+activity_buckets = ActivityBuckets()
@@ -0,0 +1,213 @@
+import os
+import json
+import base64
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+from services.mongo_registry import mongo_registry
+from models.dashboard_models import ACTIVITY_FEED_PROJECTION
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_FEED_VERSION = 1
+DEFAULT_PAGE_SIZE = 50
+
+# Feed type -> (source collection, default title, timestamp field)
+ACTIVITY_SOURCES = {
+    "course": ("user_courses", "Course Activity", "completed_at"),
+    "quiz": ("user_quizzes", "Quiz Activity", "completed_at"),
+    "coding": ("user_submissions", "Coding Challenge", "submitted_at"),
+    "achievement": ("user_achievements", "Achievement", "earned_at"),
+}
+
+SOURCE_PROJECTION = {**ACTIVITY_FEED_PROJECTION, "user_id": 1}
+
+FEED_PROJECTION = {"user_id": 0}
+
+
+def max_activity_records() -> int:
+    return int(os.getenv('MAX_ACTIVITY_RECORDS', 1000))
+
+
+def describe_activity(item: Dict[str, Any], activity_type: str) -> str:
+    """Format activity description from real data"""
+    if activity_type == "course":
+        return f"Completed: {item.get('description', 'Course module')}"
+    elif activity_type == "quiz":
+        score = item.get('score', 0)
+        return f"Quiz score: {score}%"
+    elif activity_type == "coding":
+        language = item.get('language', 'Unknown')
+        return f"Solved in {language}"
+    elif activity_type == "achievement":
+        return item.get('description', 'Achievement unlocked')
+    else:
+        return "Activity completed"
+
+
+def _timestamp(item: Dict[str, Any], field: str) -> datetime:
+    """Activity time: the source timestamp, else when the source document was created"""
+    value = item.get(field)
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None) if value.tzinfo else value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).replace(tzinfo=None)
+        except ValueError:
+            pass
+    if isinstance(item.get('_id'), ObjectId):
+        return item['_id'].generation_time.replace(tzinfo=None)
+    return datetime.utcnow()
+
+
+def feed_item(activity_type: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """Feed document for one source document (deterministic _id, so re-appends are idempotent)"""
+    _, default_title, date_field = ACTIVITY_SOURCES[activity_type]
+    source_id = str(item['_id'])
+    return {
+        "_id": f"{activity_type}:{source_id}",
+        "user_id": item['user_id'],
+        "ts": _timestamp(item, date_field),
+        "type": activity_type,
+        "source_id": source_id,
+        "title": item.get('title', item.get('name', default_title)),
+        "description": describe_activity(item, activity_type),
+        "points_earned": item.get('points', item.get('points_earned', 0)),
+        "success_rate": item.get('score', item.get('completion_percentage', 0)),
+        "difficulty": item.get('difficulty', ''),
+        "blockchain_verified": item.get('blockchain_verified', False)
+    }
+
+
+def serialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """API shape (unchanged from the per-collection recent-activity response)"""
+    return {
+        "id": item["source_id"],
+        "type": item["type"],
+        "title": item["title"],
+        "description": item["description"],
+        "completed_at": item["ts"].isoformat(),
+        "points_earned": item["points_earned"],
+        "success_rate": item["success_rate"],
+        "difficulty": item["difficulty"],
+        "blockchain_verified": item["blockchain_verified"]
+    }
+
+
+def encode_cursor(item: Dict[str, Any]) -> str:
+    raw = json.dumps({"t": item["ts"].isoformat(), "i": item["_id"]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """(ts, _id) of the last item on the previous page; ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        position = json.loads(raw)
+        return {"ts": datetime.fromisoformat(position["t"]), "_id": str(position["i"])}
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+class ActivityFeed:
+    """Append-only per-user activity feed (activity_feed), newest first.
+
+    One document per learning event, written alongside the source document
+    and read through the (user_id, ts, _id) index, so a page costs one
+    bounded index scan however many activity sources there are.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else mongo_registry.get_db()
+
+    @property
+    def collection(self):
+        return self.db.activity_feed
+
+    def append(self, activity_type: str, item: Dict[str, Any]):
+        """Add (or refresh) the feed entry for a source document"""
+        entry = feed_item(activity_type, item)
+        self.collection.replace_one({"_id": entry["_id"]}, entry, upsert=True)
+        return entry
+
+    def append_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Add (or refresh) the entries for several (activity type, source document) pairs in one bulk write"""
+        return self._write(feed_item(activity_type, item) for activity_type, item in items)
+
+    def page(self, user_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+             types: Optional[List[str]] = None) -> Dict[str, Any]:
+        """One page of the feed plus the cursor for the next one (None at the end)"""
+        limit = max(1, min(limit, max_activity_records()))
+        query: Dict[str, Any] = {"user_id": user_id}
+        if types:
+            query["type"] = {"$in": types}
+        if cursor:
+            position = decode_cursor(cursor)
+            query["$or"] = [
+                {"ts": {"$lt": position["ts"]}},
+                {"ts": position["ts"], "_id": {"$lt": position["_id"]}}
+            ]
+        items = list(self.collection.find(query, FEED_PROJECTION).sort([("ts", -1), ("_id", -1)]).limit(limit + 1))
+        has_more = len(items) > limit
+        items = items[:limit]
+        return {
+            "items": items,
+            "next_cursor": encode_cursor(items[-1]) if has_more else None,
+            "has_more": has_more
+        }
+
+    # ------------------------------------------------------------------
+    # Backfill
+    # ------------------------------------------------------------------
+
+    def _write(self, entries: Iterable[Dict[str, Any]], batch_size: int = 1000) -> int:
+        written, batch = 0, []
+        for entry in entries:
+            batch.append(ReplaceOne({"_id": entry["_id"]}, entry, upsert=True))
+            if len(batch) >= batch_size:
+                self.collection.bulk_write(batch, ordered=False)
+                written += len(batch)
+                batch = []
+        if batch:
+            self.collection.bulk_write(batch, ordered=False)
+            written += len(batch)
+        return written
+
+    def backfill_user(self, user_id: str) -> int:
+        """Copy one user's existing activity into the feed and mark them backfilled"""
+        written = 0
+        for activity_type, (collection, _, _) in ACTIVITY_SOURCES.items():
+            documents = self.db[collection].find({"user_id": user_id}, SOURCE_PROJECTION)
+            written += self._write(feed_item(activity_type, document) for document in documents)
+        self.db.user_stats.update_one(
+            {"user_id": user_id},
+            {"$set": {"activity_feed_version": ACTIVITY_FEED_VERSION}},
+            upsert=True
+        )
+        return written
+
+    def backfill_collection(self, activity_type: str, batch_size: int = 1000) -> int:
+        """Copy a whole source collection into the feed (migration)"""
+        collection = ACTIVITY_SOURCES[activity_type][0]
+        documents = self.db[collection].find({"user_id": {"$exists": True}}, SOURCE_PROJECTION)
+        return self._write((feed_item(activity_type, document) for document in documents), batch_size)
+
+    def mark_backfilled(self) -> int:
+        """Record the backfill on every stats document so reads skip the lazy per-user copy"""
+        result = self.db.user_stats.update_many(
+            {"activity_feed_version": {"$ne": ACTIVITY_FEED_VERSION}},
+            {"$set": {"activity_feed_version": ACTIVITY_FEED_VERSION}}
+        )
+        return result.modified_count
+
+
+# Create global instance
+activity_feed = ActivityFeed()
@@ -0,0 +1,180 @@
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+from pymongo.errors import DuplicateKeyError
+
+from services.mongo_registry import mongo_registry
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_ID = "catalog"
+NONE_KEY = "＄null"
+BREAKDOWNS = {"subjects": "subject", "difficulties": "difficulty"}
+SCALARS = ("courses", "modules", "lessons")
+RECONCILE_ATTEMPTS = 5
+
+
+def _bucket_key(value) -> str:
+    """Field name for a breakdown value (field names can't contain '.' or start with '$')"""
+    if value is None:
+        return NONE_KEY
+    return str(value).replace('.', '．').replace('$', '＄')
+
+
+def _bucket_value(key: str):
+    if key == NONE_KEY:
+        return None
+    return key.replace('．', '.').replace('＄', '$')
+
+
+def breakdown_list(buckets: Dict[str, int]) -> List[Dict[str, Any]]:
+    """Stored breakdown in the $group result shape the admin UI reads ([{_id, count}])"""
+    return [{"_id": _bucket_value(key), "count": count}
+            for key, count in sorted(buckets.items(), key=lambda item: -item[1]) if count > 0]
+
+
+class AdminCounters:
+    """Materialized catalogue statistics for the admin dashboard (admin_counters).
+
+    The admin create/update/delete endpoints adjust one counters document
+    with a single $inc, so the dashboard and stats endpoints read it in
+    constant time instead of counting and grouping whole collections.
+    reconcile() recounts from the collections to correct any drift (writes
+    made outside the admin API, failed increments); run it periodically with
+    scripts/reconcile_admin_counters.py. Active students change with every
+    sign-up and status change outside the admin API, so they are counted
+    live off the users.status index rather than stored.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else mongo_registry.get_db()
+
+    @property
+    def collection(self):
+        return self.db.admin_counters
+
+    # ------------------------------------------------------------------
+    # Increments (called by the write paths)
+    # ------------------------------------------------------------------
+
+    def apply(self, courses: int = 0, modules: int = 0, lessons: int = 0,
+              breakdowns: Optional[Dict[str, int]] = None):
+        """Adjust the counters; never fails the write that triggered it"""
+        inc = {name: amount for name, amount in
+               (("courses", courses), ("modules", modules), ("lessons", lessons)) if amount}
+        inc.update({path: amount for path, amount in (breakdowns or {}).items() if amount})
+        if not inc:
+            return
+        try:
+            # revision lets reconcile() detect increments that land while it recounts
+            self.collection.update_one(
+                {"_id": COUNTERS_ID},
+                {"$inc": {**inc, "revision": 1}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Admin counter update failed (reconciliation will correct it): {e}")
+
+    def _course_breakdowns(self, course: Dict[str, Any], amount: int) -> Dict[str, int]:
+        return {f"{name}.{_bucket_key(course.get(field))}": amount for name, field in BREAKDOWNS.items()}
+
+    def courses_created(self, courses: List[Dict[str, Any]]):
+        breakdowns: Dict[str, int] = {}
+        for course in courses:
+            for path, amount in self._course_breakdowns(course, 1).items():
+                breakdowns[path] = breakdowns.get(path, 0) + amount
+        self.apply(courses=len(courses), breakdowns=breakdowns)
+
+    def course_updated(self, before: Dict[str, Any], after: Dict[str, Any]):
+        """Move the course between subject/difficulty buckets if either changed"""
+        breakdowns = {}
+        for name, field in BREAKDOWNS.items():
+            if before.get(field) != after.get(field):
+                breakdowns[f"{name}.{_bucket_key(before.get(field))}"] = -1
+                breakdowns[f"{name}.{_bucket_key(after.get(field))}"] = 1
+        self.apply(breakdowns=breakdowns)
+
+    def course_deleted(self, course: Optional[Dict[str, Any]], modules: int = 0, lessons: int = 0):
+        """A course delete (course may be None if only its modules/lessons existed)"""
+        if course is None:
+            self.apply(modules=-modules, lessons=-lessons)
+        else:
+            self.apply(courses=-1, modules=-modules, lessons=-lessons,
+                       breakdowns=self._course_breakdowns(course, -1))
+
+    # ------------------------------------------------------------------
+    # Reads and reconciliation
+    # ------------------------------------------------------------------
+
+    def active_students(self) -> int:
+        return self.db.users.count_documents({"status": "active"})
+
+    def read(self) -> Dict[str, Any]:
+        """The counters document (counted from the collections the first time) plus the live active_students"""
+        counters = self.collection.find_one({"_id": COUNTERS_ID})
+        if counters is None or "reconciled_at" not in counters:
+            return self.reconcile()["counters"]
+        return {**counters, "active_students": self.active_students()}
+
+    def compute(self) -> Dict[str, Any]:
+        """Catalogue counters recounted from the source collections"""
+        counters = {name: self.db[name].count_documents({}) for name in SCALARS}
+        for name, field in BREAKDOWNS.items():
+            rows = self.db.courses.aggregate([{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}])
+            counters[name] = {_bucket_key(row["_id"]): row["count"] for row in rows}
+        return counters
+
+    def reconcile(self) -> Dict[str, Any]:
+        """Recount and store the counters; returns them with the drift that was corrected.
+
+        The recount is only written if no increment landed since the stored
+        document was read (its revision is unchanged); otherwise it starts
+        over, so a concurrent $inc is never overwritten.
+        """
+        for _ in range(RECONCILE_ATTEMPTS):
+            stored = self.collection.find_one({"_id": COUNTERS_ID})
+            counters = self.compute()
+            now = datetime.utcnow()
+            counters.update({"reconciled_at": now, "updated_at": now})
+            if stored is None:
+                try:
+                    self.collection.insert_one({"_id": COUNTERS_ID, "revision": 0, **counters})
+                except DuplicateKeyError:
+                    continue
+            else:
+                result = self.collection.update_one(
+                    {"_id": COUNTERS_ID, "revision": stored.get("revision")},
+                    {"$set": counters, "$unset": {"active_students": ""}}
+                )
+                if not result.matched_count:
+                    continue
+            drift = _drift(stored or {}, counters)
+            if drift:
+                logger.info(f"🔧 Admin counters reconciled, drift corrected: {drift}")
+            counters.update({"_id": COUNTERS_ID, "active_students": self.active_students()})
+            return {"counters": counters, "drift": drift}
+        raise RuntimeError(f"Admin counters changed during {RECONCILE_ATTEMPTS} recounts; try again")
+
+
+def _drift(stored: Dict[str, Any], counters: Dict[str, Any]) -> Dict[str, Any]:
+    drift = {}
+    for name in SCALARS:
+        if stored.get(name, 0) != counters[name]:
+            drift[name] = counters[name] - stored.get(name, 0)
+    for name in BREAKDOWNS:
+        before, after = stored.get(name, {}), counters[name]
+        changed = {key: after.get(key, 0) - before.get(key, 0) for key in set(before) | set(after)
+                   if after.get(key, 0) != before.get(key, 0)}
+        if changed:
+            drift[name] = {"null" if key == NONE_KEY else _bucket_value(key): amount
+                           for key, amount in changed.items()}
+    return drift
+
+
+# Create global instance
+admin_counters = AdminCounters()
@@ -0,0 +1,171 @@
+import os
+import atexit
+import threading
+import logging
+from typing import Dict, Optional, Any, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from services.mongo_registry import mongo_registry
+
+logger = logging.getLogger(__name__)
+
+
+def _freeze(filter_: Dict[str, Any]) -> Tuple:
+    """Hashable form of a simple equality filter"""
+    return tuple(sorted(filter_.items()))
+
+
+class CounterBuffer:
+    """Write-behind aggregator for hot counters (views, shares, logins).
+
+    Increments for the same document are merged in memory and written with
+    one unordered bulk_write per collection, either every flush interval or
+    as soon as the number of pending documents reaches the size threshold.
+    Pending counts are flushed when the worker shuts down.
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None, max_pending: Optional[int] = None):
+        self.flush_interval = flush_interval or float(os.getenv('COUNTER_FLUSH_INTERVAL', 5))
+        self.max_pending = max_pending or int(os.getenv('COUNTER_FLUSH_MAX_KEYS', 500))
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, Tuple], Dict[str, Dict[str, Any]]] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stats = {"recorded": 0, "flushed_docs": 0, "flushes": 0, "failed_flushes": 0}
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def record(self, collection: str, filter_: Dict[str, Any],
+               inc: Optional[Dict[str, int]] = None, max_fields: Optional[Dict[str, Any]] = None):
+        """Queue $inc / $max updates for the document matching an equality filter"""
+        key = (collection, _freeze(filter_))
+        with self._lock:
+            entry = self._pending.setdefault(key, {"$inc": {}, "$max": {}})
+            for field, amount in (inc or {}).items():
+                entry["$inc"][field] = entry["$inc"].get(field, 0) + amount
+            for field, value in (max_fields or {}).items():
+                current = entry["$max"].get(field)
+                entry["$max"][field] = value if current is None or value > current else current
+            self._stats["recorded"] += 1
+            pending = len(self._pending)
+
+        self._ensure_started()
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def increment(self, collection: str, filter_: Dict[str, Any], field: str, amount: int = 1):
+        """Queue a single counter increment"""
+        self.record(collection, filter_, inc={field: amount})
+
+    def flush(self) -> int:
+        """Write every pending update now; returns the number of documents updated"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        by_collection: Dict[str, list] = {}
+        for (collection, frozen_filter), entry in pending.items():
+            update = {op: fields for op, fields in entry.items() if fields}
+            by_collection.setdefault(collection, []).append(
+                ((collection, frozen_filter), entry, UpdateOne(dict(frozen_filter), update))
+            )
+
+        db = mongo_registry.get_db()
+        written = 0
+        for collection, items in by_collection.items():
+            try:
+                db[collection].bulk_write([op for _, _, op in items], ordered=False)
+                written += len(items)
+            except BulkWriteError as e:
+                # Unordered: everything except the reported indexes was applied
+                failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                written += len(items) - len(failed)
+                for index in failed:
+                    key, entry, _ = items[index]
+                    self._requeue(key, entry)
+                logger.error(f"❌ Counter flush for {collection}: {len(failed)} writes failed")
+                self._stats["failed_flushes"] += 1
+            except Exception as e:
+                for key, entry, _ in items:
+                    self._requeue(key, entry)
+                logger.error(f"❌ Counter flush for {collection} failed, will retry: {e}")
+                self._stats["failed_flushes"] += 1
+
+        self._stats["flushes"] += 1
+        self._stats["flushed_docs"] += written
+        return written
+
+    def _requeue(self, key, entry):
+        with self._lock:
+            current = self._pending.setdefault(key, {"$inc": {}, "$max": {}})
+            for field, amount in entry["$inc"].items():
+                current["$inc"][field] = current["$inc"].get(field, 0) + amount
+            for field, value in entry["$max"].items():
+                existing = current["$max"].get(field)
+                current["$max"][field] = value if existing is None or value > existing else existing
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for health endpoints"""
+        with self._lock:
+            pending = len(self._pending)
+        return {**self._stats, "pending_docs": pending, "flush_interval": self.flush_interval,
+                "max_pending": self.max_pending}
+
+    # ------------------------------------------------------------------
+    # Background flusher
+    # ------------------------------------------------------------------
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='counter-buffer-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        stop_event = self._stop
+        while not stop_event.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Counter flush error: {e}")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the flusher and write whatever is still pending"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+        try:
+            flushed = self.flush()
+            if flushed:
+                logger.info(f"✅ Flushed {flushed} pending counter updates on shutdown")
+        except Exception as e:
+            logger.error(f"❌ Final counter flush failed: {e}")
+
+    def _reset_after_fork(self):
+        # Pending counts belong to the parent; the child starts empty with its own thread
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+
+# Create global instance
+counter_buffer = CounterBuffer()
+atexit.register(counter_buffer.stop)
@@ -2,24 +2,21 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import logging
 
+from pymongo import ReturnDocument
+
+from services.rank_index import points_rank_index
+
 logger = logging.getLogger(__name__)
 
 class DashboardService:
     def __init__(self, db):
         self.db = db
     
-    async def calculate_user_rank(self, user_id: str) -> int:
+    async def calculate_user_rank(self, user_id: str, user_points: Optional[int] = None) -> int:
         """Calculate user's global rank based on total points"""
         try:
-            user_stats = self.db.user_stats.find_one({"user_id": user_id})
-            user_points = user_stats.get("total_points", 0) if user_stats else 0
-            
-            # Count users with higher points
-            higher_ranked = self.db.user_stats.count_documents({
-                "total_points": {"$gt": user_points}
-            })
-            
-            return higher_ranked + 1
+            # Order-statistic index lookup instead of counting every higher-ranked user
+            return points_rank_index.rank_of(user_id, user_points)
             
         except Exception as e:
             logger.error(f"Error calculating user rank: {e}")
@@ -28,22 +25,18 @@ class DashboardService:
     async def update_user_points(self, user_id: str, points_to_add: int, activity_type: str):
         """Add points to user's total and update rank"""
         try:
-            # Update user stats
-            self.db.user_stats.update_one(
+            # Update user stats (rank is derived on read from the rank index, not stored)
+            user_stats = self.db.user_stats.find_one_and_update(
                 {"user_id": user_id},
                 {
                     "$inc": {"total_points": points_to_add},
                     "$set": {"last_updated": datetime.now()}
                 },
-                upsert=True
-            )
-            
-            # Recalculate rank
-            new_rank = await self.calculate_user_rank(user_id)
-            self.db.user_stats.update_one(
-                {"user_id": user_id},
-                {"$set": {"rank": new_rank}}
+                {"_id": 0, "total_points": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
             )
+            points_rank_index.set_score(user_id, user_stats.get("total_points", 0))
             
             logger.info(f"Added {points_to_add} points to user {user_id} for {activity_type}")
             
@@ -53,10 +46,10 @@ class DashboardService:
     def get_leaderboard(self, limit: int = 100) -> List[Dict]:
         """Get global leaderboard"""
         try:
-            return list(self.db.user_stats.find(
-                {},
-                {"user_id": 1, "total_points": 1, "rank": 1}
-            ).sort("total_points", -1).limit(limit))
+            return [
+                {"user_id": entry["user_id"], "total_points": entry["score"], "rank": entry["rank"]}
+                for entry in points_rank_index.top(limit)
+            ]
             
         except Exception as e:
             logger.error(f"Error fetching leaderboard: {e}")
@@ -0,0 +1,411 @@
+import os
+import json
+import asyncio
+import threading
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Any, Set
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+from services.mongo_registry import mongo_registry
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ("memory", "change_stream")
+
+# "$changeStream is only supported on replica sets"
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+
+def _worker_count() -> int:
+    """Configured web workers (gunicorn.conf.py exports GUNICORN_WORKERS; uvicorn honours WEB_CONCURRENCY)"""
+    for name in ('GUNICORN_WORKERS', 'WEB_CONCURRENCY'):
+        try:
+            return int(os.environ[name])
+        except (KeyError, ValueError):
+            continue
+    return 1
+
+
+HEARTBEAT_FRAME = ": heartbeat\n\n"
+
+
+class ExamStreamLimit(Exception):
+    """An exam already has EXAM_STREAM_MAX_PER_EXAM open streams in this process"""
+
+    def __init__(self, exam_code: str, limit: int):
+        super().__init__(f"Too many live streams for exam {exam_code} (limit {limit})")
+        self.exam_code = exam_code
+        self.limit = limit
+
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def format_event(event: Dict[str, Any]) -> str:
+    """One Server-Sent Events frame"""
+    data = json.dumps(event["data"], default=_json_default, separators=(',', ':'))
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+class ExamStream:
+    """One client's subscription to an exam's events.
+
+    Publishers hand events over from any thread; the stream is drained by
+    the thread (or, with a loop, the asyncio task) serving the response. A
+    client that falls EXAM_STREAM_QUEUE events behind is cut off and
+    resumes from its Last-Event-ID on reconnect.
+    """
+
+    def __init__(self, bus: "ExamEventBus", exam_code: str, last_event_id: Optional[int] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.bus = bus
+        self.exam_code = exam_code
+        self.last_event_id = last_event_id
+        self.closed = False
+        self.overflowed = False
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._floor = 0
+        self._loop = loop
+        self._ready = asyncio.Event() if loop is not None else threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.closed or self.overflowed
+
+    def deliver(self, event: Dict[str, Any]):
+        if len(self._events) >= self.bus.queue_size:
+            self.overflowed = True
+        else:
+            self._events.append(event)
+        self.wake()
+
+    def wake(self):
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                # The serving loop is gone; the stream is already finished
+                self.closed = True
+        else:
+            self._ready.set()
+
+    def opening(self, snapshot: Callable[[], Dict[str, Any]]) -> List[str]:
+        """First frames: the missed events after Last-Event-ID, or a snapshot when they can't be replayed"""
+        frames = [f"retry: {self.bus.retry_ms}\n\n"]
+        missed = None if self.last_event_id is None else self.bus.replay(self.exam_code, self.last_event_id)
+        if missed is None:
+            current = self.bus.current_id(self.exam_code)
+            frames.append(format_event({"id": current, "type": "snapshot", "data": snapshot()}))
+            self._floor = current
+        else:
+            frames.extend(format_event(event) for event in missed)
+            self._floor = missed[-1]["id"] if missed else self.last_event_id
+        return frames
+
+    def frames(self) -> List[str]:
+        """Frames for the events delivered since the last call"""
+        self._ready.clear()
+        frames = []
+        while self._events:
+            event = self._events.popleft()
+            # Already sent in the opening replay / covered by the snapshot
+            if event["id"] > self._floor:
+                frames.append(format_event(event))
+        return frames
+
+    def wait(self, timeout: float) -> bool:
+        return self._ready.wait(timeout)
+
+    async def wait_async(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def close(self):
+        self.closed = True
+        self.bus.unsubscribe(self)
+
+
+class ExamEventBus:
+    """Live exam events (joined, submitted, score/rank changed, exam ended) for SSE streams.
+
+    Every event gets a per-exam sequence number that doubles as its SSE id,
+    so a reconnecting client resumes after its Last-Event-ID instead of
+    reloading the whole leaderboard; if the gap can't be replayed it gets a
+    fresh snapshot.
+
+    EXAM_EVENTS_SOURCE picks where events come from:
+    - memory: published and fanned out inside this process, with the last
+      EXAM_EVENT_BUFFER events per exam kept for resume. Only clients
+      connected to the publishing process see an event, so it is the
+      default only with a single worker.
+    - change_stream: events are inserted into exam_events (sequence numbers
+      from exam_event_counters) and every process tails the collection with
+      a change stream (replica set required), so any worker can serve any
+      client. Resume reads the collection. The default with more than one
+      worker. On a standalone mongod the bus logs an error and falls back
+      to memory (check_source() at start-up, or the first failed watch).
+
+    Each process serves at most EXAM_STREAM_MAX_PER_EXAM streams per exam.
+    """
+
+    def __init__(self, source: Optional[str] = None):
+        workers = _worker_count()
+        default = "change_stream" if workers > 1 else "memory"
+        self.source = source or os.getenv('EXAM_EVENTS_SOURCE', default).lower()
+        if self.source not in SOURCES:
+            logger.warning(f"⚠️ Unknown EXAM_EVENTS_SOURCE '{self.source}', using {default}")
+            self.source = default
+        if self.source == "memory" and workers > 1:
+            logger.warning(f"⚠️ EXAM_EVENTS_SOURCE=memory with {workers} workers: live exam streams "
+                           f"only see events published by their own worker")
+        self.buffer_size = int(os.getenv('EXAM_EVENT_BUFFER', 500))
+        self.max_exams = int(os.getenv('EXAM_EVENT_MAX_EXAMS', 1000))
+        self.max_streams_per_exam = int(os.getenv('EXAM_STREAM_MAX_PER_EXAM', 200))
+        self.queue_size = int(os.getenv('EXAM_STREAM_QUEUE', 256))
+        self.heartbeat_seconds = float(os.getenv('EXAM_STREAM_HEARTBEAT', 15))
+        self.retry_ms = int(os.getenv('EXAM_STREAM_RETRY_MS', 3000))
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[ExamStream]] = {}
+        self._buffers: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+        self._sequences: Dict[str, int] = {}
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_pid: Optional[int] = None
+        self._stop = threading.Event()
+        self._stats = {"published": 0, "delivered": 0, "rejected": 0, "overflowed": 0, "publish_errors": 0}
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # Streams and the watcher belong to the parent
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._watcher = None
+        self._watcher_pid = None
+        self._stop = threading.Event()
+
+    @property
+    def db(self):
+        return mongo_registry.get_db()
+
+    # ------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------
+
+    def publish(self, exam_code: str, event_type: str, data: Dict[str, Any]) -> Optional[int]:
+        """Emit an event to every stream of an exam; never fails the write that triggered it"""
+        try:
+            if self.source == "change_stream":
+                return self._publish_to_collection(exam_code, event_type, data)
+            with self._lock:
+                event_id = self._sequences.get(exam_code, 0) + 1
+                self._sequences[exam_code] = event_id
+                event = {"id": event_id, "type": event_type, "data": data}
+                buffer = self._buffers.get(exam_code)
+                if buffer is None:
+                    buffer = self._buffers[exam_code] = deque(maxlen=self.buffer_size)
+                    if len(self._buffers) > self.max_exams:
+                        evicted, _ = self._buffers.popitem(last=False)
+                        self._sequences.pop(evicted, None)
+                self._buffers.move_to_end(exam_code)
+                buffer.append(event)
+                self._dispatch(exam_code, event)
+                self._stats["published"] += 1
+            return event_id
+        except Exception as e:
+            logger.warning(f"⚠️ Could not publish {event_type} for exam {exam_code}: {e}")
+            with self._lock:
+                self._stats["publish_errors"] += 1
+            return None
+
+    def _publish_to_collection(self, exam_code: str, event_type: str, data: Dict[str, Any]) -> int:
+        counter = self.db.exam_event_counters.find_one_and_update(
+            {"_id": exam_code}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        event_id = counter["seq"]
+        self.db.exam_events.insert_one({
+            "_id": f"{exam_code}:{event_id}", "exam_code": exam_code, "seq": event_id,
+            "type": event_type, "data": data, "ts": datetime.utcnow()
+        })
+        with self._lock:
+            self._stats["published"] += 1
+        return event_id
+
+    def _dispatch(self, exam_code: str, event: Dict[str, Any]):
+        # Caller holds the lock, so each stream sees an exam's events in order
+        for stream in self._subscribers.get(exam_code, ()):
+            was_overflowed = stream.overflowed
+            stream.deliver(event)
+            self._stats["delivered"] += 1
+            if stream.overflowed and not was_overflowed:
+                self._stats["overflowed"] += 1
+
+    # ------------------------------------------------------------------
+    # Change-stream source
+    # ------------------------------------------------------------------
+
+    def check_source(self) -> bool:
+        """At start-up: can this deployment run change streams? Falls back to memory when not"""
+        if self.source != "change_stream":
+            return True
+        try:
+            hello = self.db.client.admin.command('hello')
+        except Exception as e:
+            logger.warning(f"⚠️ Could not check MongoDB for change stream support: {e}")
+            return False
+        if hello.get('setName') or hello.get('msg') == 'isdbgrid':
+            return True
+        self._fall_back("MongoDB is a standalone server")
+        return False
+
+    def _fall_back(self, reason: str):
+        logger.error(f"❌ EXAM_EVENTS_SOURCE=change_stream needs a replica set or sharded cluster ({reason}); "
+                     f"using in-process events, so live exam streams only see their own worker's events")
+        self.source = "memory"
+        self._stop.set()
+        self._watcher_pid = None
+
+    def _ensure_watcher(self):
+        if self.source != "change_stream" or self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            self._stop = threading.Event()
+            self._watcher = threading.Thread(target=self._watch, args=(self._stop,),
+                                             name='exam-events-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch(self, stop_event: threading.Event):
+        """Tail exam_events and fan inserts out to this process's streams"""
+        resume_token = None
+        while not stop_event.is_set():
+            try:
+                with self.db.exam_events.watch([{"$match": {"operationType": "insert"}}],
+                                               resume_after=resume_token, max_await_time_ms=1000) as changes:
+                    while not stop_event.is_set():
+                        change = changes.try_next()
+                        if change is None:
+                            continue
+                        resume_token = changes.resume_token
+                        document = change["fullDocument"]
+                        with self._lock:
+                            self._dispatch(document["exam_code"], {
+                                "id": document["seq"], "type": document["type"], "data": document["data"]
+                            })
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    self._fall_back(str(e))
+                    return
+                logger.warning(f"⚠️ Exam event change stream interrupted: {e}")
+                stop_event.wait(1.0)
+            except Exception as e:
+                logger.warning(f"⚠️ Exam event change stream interrupted: {e}")
+                stop_event.wait(1.0)
+
+    # ------------------------------------------------------------------
+    # Streams
+    # ------------------------------------------------------------------
+
+    def open(self, exam_code: str, last_event_id: Optional[int] = None,
+             loop: Optional[asyncio.AbstractEventLoop] = None) -> ExamStream:
+        """Subscribe a client; raises ExamStreamLimit at the per-exam cap"""
+        self._ensure_watcher()
+        stream = ExamStream(self, exam_code, last_event_id, loop)
+        with self._lock:
+            streams = self._subscribers.setdefault(exam_code, set())
+            if len(streams) >= self.max_streams_per_exam:
+                self._stats["rejected"] += 1
+                raise ExamStreamLimit(exam_code, self.max_streams_per_exam)
+            streams.add(stream)
+        return stream
+
+    def unsubscribe(self, stream: ExamStream):
+        with self._lock:
+            streams = self._subscribers.get(stream.exam_code)
+            if streams is not None:
+                streams.discard(stream)
+                if not streams:
+                    del self._subscribers[stream.exam_code]
+
+    def current_id(self, exam_code: str) -> int:
+        """Id of the exam's latest event (0 before the first)"""
+        if self.source == "change_stream":
+            counter = self.db.exam_event_counters.find_one({"_id": exam_code}, {"seq": 1})
+            return counter["seq"] if counter else 0
+        with self._lock:
+            return self._sequences.get(exam_code, 0)
+
+    def replay(self, exam_code: str, after: int) -> Optional[List[Dict[str, Any]]]:
+        """Events after the given id, or None when they are no longer (or never were) available"""
+        current = self.current_id(exam_code)
+        if after > current:
+            # Ids from before a restart or an evicted buffer
+            return None
+        if after == current:
+            return []
+        if self.source == "change_stream":
+            missed = [{"id": document["seq"], "type": document["type"], "data": document["data"]}
+                      for document in self.db.exam_events.find({"exam_code": exam_code, "seq": {"$gt": after}})
+                      .sort("seq", 1).limit(self.buffer_size + 1)]
+        else:
+            with self._lock:
+                missed = [event for event in self._buffers.get(exam_code, ()) if event["id"] > after]
+        if not missed or missed[0]["id"] != after + 1 or len(missed) > self.buffer_size:
+            return None
+        return missed
+
+    def frames(self, stream: ExamStream, snapshot: Callable[[], Dict[str, Any]]):
+        """SSE frames for a WSGI response; ends when the client goes away or falls behind"""
+        try:
+            yield from stream.opening(snapshot)
+            while not stream.done:
+                if stream.wait(self.heartbeat_seconds):
+                    yield from stream.frames()
+                else:
+                    yield HEARTBEAT_FRAME
+        finally:
+            stream.close()
+
+    async def aframes(self, stream: ExamStream, snapshot: Callable[[], Dict[str, Any]]):
+        """SSE frames for an ASGI response (opening reads run off the event loop)"""
+        try:
+            for frame in await asyncio.to_thread(stream.opening, snapshot):
+                yield frame
+            while not stream.done:
+                if await stream.wait_async(self.heartbeat_seconds):
+                    for frame in stream.frames():
+                        yield frame
+                else:
+                    yield HEARTBEAT_FRAME
+        finally:
+            stream.close()
+
+    def stop(self):
+        """Stop the change-stream watcher and end every open stream"""
+        self._stop.set()
+        with self._lock:
+            streams = [stream for streams in self._subscribers.values() for stream in streams]
+        for stream in streams:
+            stream.closed = True
+            stream.wake()
+        self._watcher_pid = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"source": self.source, "streams": sum(len(s) for s in self._subscribers.values()),
+                    "exams_streaming": len(self._subscribers),
+                    "max_streams_per_exam": self.max_streams_per_exam, **self._stats}
+
+
+# Create global instance
+exam_events = ExamEventBus()
@@ -0,0 +1,135 @@
+import os
+import json
+import copy
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Any, Tuple
+
+from services.grading_engine import grading_engine, LANGUAGE_ALIASES
+
+logger = logging.getLogger(__name__)
+
+# Problem fields that change a grading result; anything else (title,
+# description, starter code) can be edited without invalidating the cache
+GRADING_FIELDS = ("test_cases", "time_limit", "memory_limit", "function_name", "fail_fast", "total_points")
+
+
+def problem_version(problem: Dict[str, Any]) -> str:
+    """Hash of everything in a problem definition that affects grading"""
+    relevant = {field: problem.get(field) for field in GRADING_FIELDS}
+    canonical = json.dumps(relevant, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def normalize_source(code: str) -> str:
+    """Source with line endings unified and trailing whitespace / blank edges removed"""
+    lines = (code or '').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+
+def source_hash(code: str) -> str:
+    return hashlib.sha256(normalize_source(code).encode()).hexdigest()
+
+
+class GradingCache:
+    """Content-addressed LRU cache of grading results.
+
+    Key: (exam + problem id, problem version hash, language, normalized
+    source hash). Identical resubmissions and shared starter/reference
+    solutions skip the sandbox entirely. Because the problem version is part
+    of the key, an edited problem can never hit an old entry in any worker;
+    invalidate_scope() additionally frees this worker's entries for an exam
+    straight away. Bounded by GRADING_CACHE_MAX_ENTRIES and
+    GRADING_CACHE_MAX_BYTES, least recently used first out.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries or int(os.getenv('GRADING_CACHE_MAX_ENTRIES', 2048))
+        self.max_bytes = max_bytes or int(os.getenv('GRADING_CACHE_MAX_MB', 64)) * 1024 * 1024
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str, str, str], Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(scope: str, problem: Dict[str, Any], language: str, code: str) -> Tuple[str, str, str, str]:
+        language = (language or '').lower()
+        return (f"{scope}:{problem.get('id', '')}", problem_version(problem),
+                LANGUAGE_ALIASES.get(language, language), source_hash(code))
+
+    def get(self, key: Tuple[str, str, str, str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return copy.deepcopy(entry[0])
+
+    def put(self, key: Tuple[str, str, str, str], result: Dict[str, Any]):
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (copy.deepcopy(result), size)
+            self._bytes += size
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def invalidate_scope(self, scope: str) -> int:
+        """Drop every entry for one exam's problems (after a host edits them)"""
+        prefix = f"{scope}:"
+        with self._lock:
+            stale = [key for key in self._entries if key[0].startswith(prefix)]
+            for key in stale:
+                self._bytes -= self._entries.pop(key)[1]
+            self._stats["invalidations"] += 1
+        return len(stale)
+
+    def grade(self, scope: str, code: str, language: str, problem: Dict[str, Any]) -> Dict[str, Any]:
+        """Grading result for a submission, from the cache when the same code was already graded"""
+        key = self.key(scope, problem, language, code)
+        cached = self.get(key)
+        if cached is not None:
+            cached["cached"] = True
+            cached["execution_time"] = 0
+            return cached
+
+        result = grading_engine.grade(code, language, problem)
+        # Infrastructure failures and load-dependent verdicts (time limits,
+        # compile timeouts) aren't a property of the code; don't pin them
+        if not result["details"].get("load_dependent") and not any(
+                case["status"] == "internal_error" for case in result["test_results"]):
+            self.put(key, {**result, "graded_at": datetime.utcnow().isoformat()})
+        result["cached"] = False
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_entries": self.max_entries,
+                    "max_bytes": self.max_bytes, **self._stats}
+
+
+# Create global instance
+grading_cache = GradingCache()
@@ -0,0 +1,241 @@
+"""
+Grading harness: compiles one submission and runs all of its test cases.
+
+Runs inside the grading sandbox (a throwaway container, or bubblewrap), so it
+only uses the standard library and is shipped alongside every job rather than
+baked into the sandbox image. Usage: python3 harness.py [job.json] (stdin when
+omitted); prints one JSON document with the compile error and per-case results.
+
+The job carries inputs only: expected outputs never enter the sandbox, so a
+case that runs to completion is reported as "completed" with its output and
+the engine decides pass or fail. The compiler and every case run as
+`solution_uid` (via `setpriv`), apart from the harness, its job file and the
+case output files, which stay private to the harness's uid.
+
+Every case runs in its own process group, under `prlimit` (CPU time, output
+size, address space, process count) and a wall-clock deadline; cases run in
+parallel on `workers` threads.
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import shutil
+import signal
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ERROR_SNIPPET_BYTES = 2000
+
+
+def _write(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def _read(path, limit):
+    with open(path, 'rb') as f:
+        return f.read(limit).decode('utf-8', errors='replace')
+
+
+def _expand(command, work, mode=None):
+    return [part.replace('{work}', work).replace('{mode}', mode or '') for part in command]
+
+
+def _environment(home):
+    return {"PATH": os.environ.get('PATH', '/usr/local/bin:/usr/bin:/bin'), "HOME": home,
+            "LANG": "C.UTF-8", "PYTHONIOENCODING": "utf-8"}
+
+
+class Harness:
+    def __init__(self, job, private):
+        self.job = job
+        self.private = private
+        # The solution's directory: sources, build output and every case's cwd
+        self.work = os.path.join(private, 'solution')
+        self.limits = job["limits"]
+        self.time_limit = self.limits["time_limit_ms"] / 1000
+        self.output_limit = job["output_limit"]
+        self._failure_lock = threading.Lock()
+        self._first_failure = None
+        self.compile_timed_out = False
+
+    def _as_solution(self):
+        """setpriv prefix that drops to the solution's uid (none when the job doesn't set one)"""
+        uid = self.job.get("solution_uid")
+        if uid is None:
+            return []
+        return ['setpriv', f'--reuid={uid}', f'--regid={uid}', '--clear-groups', '--inh-caps=-all',
+                '--no-new-privs', '--']
+
+    def compile(self):
+        """None, or the compile error shown to the student"""
+        command = self.job.get("compile")
+        if not command:
+            return None
+        command = _expand(command, self.work)
+        try:
+            compiled = subprocess.run(self._as_solution() + command, cwd=self.work, env=_environment(self.work),
+                                      capture_output=True, text=True, timeout=self.job["compile_timeout"])
+        except FileNotFoundError:
+            return f"{command[0]} is not installed on the grading server"
+        except subprocess.TimeoutExpired:
+            self.compile_timed_out = True
+            return f"Compilation timed out ({self.job['compile_timeout']:g}s limit)"
+        if compiled.returncode != 0:
+            message = (compiled.stderr or compiled.stdout or "Compilation failed").replace(self.work + os.sep, '')
+            return message[:ERROR_SNIPPET_BYTES]
+        return None
+
+    def _prlimit(self):
+        """Resource limits applied by the prlimit wrapper (no preexec_fn: cases start from threads)"""
+        cpu_seconds = math.ceil(self.time_limit + self.job["cpu_allowance"]) + 1
+        wrapper = ['prlimit', f'--cpu={cpu_seconds}:{cpu_seconds + 1}', f'--fsize={self.output_limit}',
+                   '--core=0']
+        if self.job.get("nproc"):
+            wrapper.append(f'--nproc={self.job["nproc"]}')
+        if self.job["memory"] == 'rlimit':
+            wrapper.append(f'--as={self.limits["memory_limit"]}')
+        return wrapper + ['--']
+
+    def _stopped(self, index):
+        """Fail-fast: a hidden case is stopped once an earlier hidden case has failed"""
+        with self._failure_lock:
+            return self._first_failure is not None and self._first_failure < index
+
+    def _failed(self, index):
+        with self._failure_lock:
+            if self._first_failure is None or index < self._first_failure:
+                self._first_failure = index
+
+    def run_case(self, index, case, fail_fast):
+        stop = (lambda: self._stopped(index)) if fail_fast else None
+        if stop is not None and stop():
+            return {"status": "skipped"}
+        # Harness-owned: the solution writes its output through the inherited descriptors only
+        case_dir = os.path.join(self.private, f'case-{index}')
+        os.mkdir(case_dir, 0o700)
+        raw_input = case.get('input', '')
+        mode = 'text' if isinstance(raw_input, str) else 'json'
+        paths = {name: os.path.join(case_dir, name) for name in ('stdin', 'stdout', 'stderr')}
+        _write(paths['stdin'], raw_input if mode == 'text' else json.dumps(raw_input))
+
+        deadline_seconds = self.time_limit * self.job["wall_factor"] + self.job["cpu_allowance"] + 1
+        with open(paths['stdin'], 'rb') as stdin, open(paths['stdout'], 'wb') as stdout, \
+                open(paths['stderr'], 'wb') as stderr:
+            started = time.perf_counter()
+            command = self._as_solution() + self._prlimit() + _expand(self.job["run"], self.work, mode)
+            process = subprocess.Popen(command, stdin=stdin, stdout=stdout, stderr=stderr, cwd=self.work,
+                                       env=_environment(self.work), start_new_session=True)
+            usage, killed_by = self._wait(process, started + deadline_seconds, stop)
+            wall_ms = (time.perf_counter() - started) * 1000
+
+        output = _read(paths['stdout'], self.output_limit)
+        errors = _read(paths['stderr'], ERROR_SNIPPET_BYTES)
+        cpu_ms = (usage.ru_utime + usage.ru_stime) * 1000
+        memory_kb = usage.ru_maxrss
+        returncode = process.returncode
+
+        if killed_by == "stop":
+            status = "skipped"
+        elif (killed_by == "deadline" or returncode == -signal.SIGXCPU
+              or cpu_ms > (self.time_limit + self.job["cpu_allowance"]) * 1000):
+            status = "time_limit_exceeded"
+        elif returncode == -signal.SIGXFSZ or os.path.getsize(paths['stdout']) >= self.output_limit:
+            # Python ignores SIGXFSZ and fails the write instead
+            status = "output_limit_exceeded"
+        elif memory_kb * 1024 > self.limits["memory_limit"] or (returncode != 0 and re.search(
+                r'MemoryError|OutOfMemoryError|heap out of memory|bad_alloc', errors)):
+            status = "memory_limit_exceeded"
+        elif returncode != 0:
+            status = "runtime_error"
+        else:
+            # Pass or fail is decided by the engine, which holds the expected output
+            status = "completed"
+
+        result = {"status": status, "output": output.strip(), "stderr": errors.strip(),
+                  "time_ms": wall_ms, "cpu_ms": cpu_ms, "memory_kb": memory_kb}
+        if killed_by:
+            result["killed_by"] = killed_by
+        return result
+
+    @staticmethod
+    def _wait(process, deadline, stop):
+        """Reap the case with its rusage; kills the process group at the deadline or on stop"""
+        delay = 0.001
+        killed_by = None
+        while True:
+            pid, status, usage = os.wait4(process.pid, 0 if killed_by else os.WNOHANG)
+            if pid:
+                process.returncode = os.waitstatus_to_exitcode(status)
+                return usage, killed_by
+            if time.perf_counter() >= deadline:
+                killed_by = "deadline"
+            elif stop is not None and stop():
+                killed_by = "stop"
+            if killed_by:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                continue
+            time.sleep(delay)
+            delay = min(delay * 2, 0.01)
+
+    def run(self):
+        # The solution may pass through to its directory but not list the harness's
+        os.chmod(self.private, 0o711)
+        os.mkdir(self.work)
+        for name, content in self.job["files"].items():
+            _write(os.path.join(self.work, name), content)
+        if self.job.get("solution_uid") is not None:
+            # Build output goes here too; the harness's own directory stays private
+            os.chown(self.work, self.job["solution_uid"], self.job["solution_uid"])
+        compile_started = time.perf_counter()
+        compile_error = self.compile()
+        compile_ms = (time.perf_counter() - compile_started) * 1000
+        cases = self.job["cases"]
+        if compile_error is not None:
+            return {"compile_error": compile_error, "compile_timed_out": self.compile_timed_out,
+                    "compile_ms": compile_ms, "results": []}
+
+        results = [None] * len(cases)
+        with ThreadPoolExecutor(max_workers=max(1, self.job["workers"])) as pool:
+            futures = {pool.submit(self._guarded, index, case, case.get("fail_fast")): index
+                       for index, case in enumerate(cases)}
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                # Wrong answers are only known to the engine, which applies the same rule
+                if cases[index].get("fail_fast") and results[index]["status"] not in ("completed", "skipped"):
+                    self._failed(index)
+        return {"compile_error": None, "compile_ms": compile_ms, "results": results}
+
+    def _guarded(self, index, case, fail_fast):
+        try:
+            return self.run_case(index, case, fail_fast)
+        except Exception as e:
+            return {"status": "internal_error", "stderr": str(e)}
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding='utf-8') as f:
+            job = json.load(f)
+    else:
+        job = json.load(sys.stdin)
+    private = tempfile.mkdtemp(prefix='grading-')
+    try:
+        report = Harness(job, private).run()
+    finally:
+        shutil.rmtree(private, ignore_errors=True)
+    sys.stdout.write(json.dumps(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+import os
+import math
+import time
+import uuid
+import socket
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Any
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from services.mongo_registry import mongo_registry
+
+logger = logging.getLogger(__name__)
+
+STATE_ID = "dispatch"
+ACTIVE_STATUSES = ["queued", "running"]
+
+
+class GradingQueueFull(Exception):
+    """The queue is at GRADING_QUEUE_MAX_DEPTH; retry_after is a wait estimate in seconds"""
+
+    def __init__(self, depth: int, retry_after: int):
+        super().__init__(f"Grading queue is full ({depth} submissions waiting)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class GradingQueue:
+    """Durable submission grading queue on MongoDB (grading_jobs).
+
+    Submissions are enqueued as jobs and graded by a fixed pool of grader
+    threads, so no HTTP request waits for a test run. A job is claimed with
+    one find_one_and_update, so every job is graded by exactly one grader
+    across all workers and processes. A claim holds a lease
+    (GRADING_JOB_LEASE) that a heartbeat renews every third of the lease
+    while the job is being graded, so long runs keep it; jobs whose grader
+    died are requeued once it expires, up to GRADING_JOB_MAX_ATTEMPTS times.
+
+    Fairness is per exam (start-time fair queuing): each job gets a round,
+    one past its exam's previous round but never below the round currently
+    being served, and graders take the lowest round first. Every exam with
+    waiting work gets one job graded per round, so a class that submits a
+    burst can't starve another exam's submissions.
+
+    Depth is capped at GRADING_QUEUE_MAX_DEPTH queued + running jobs by a
+    slot counter on the dispatch state document: enqueue takes a slot with
+    one guarded $inc before inserting, and the job gives it back when it
+    finishes or fails. The grader sweep recounts the counter from the jobs
+    in case a process died between a job write and its counter update.
+
+    GRADING_QUEUE_WORKERS grader threads run in every API process that
+    enqueues (0 disables them; run scripts/grading_worker.py instead).
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_depth: Optional[int] = None):
+        self.workers = int(os.getenv('GRADING_QUEUE_WORKERS', 2)) if workers is None else workers
+        self.max_depth = max_depth or int(os.getenv('GRADING_QUEUE_MAX_DEPTH', 200))
+        self.lease_seconds = float(os.getenv('GRADING_JOB_LEASE', 120))
+        self.max_attempts = int(os.getenv('GRADING_JOB_MAX_ATTEMPTS', 3))
+        self.poll_interval = float(os.getenv('GRADING_QUEUE_POLL_INTERVAL', 1.0))
+        self._handler: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._pid: Optional[int] = None
+        self._avg_job_seconds = 2.0
+        self._stats = {"enqueued": 0, "rejected": 0, "graded": 0, "failed": 0, "requeued": 0}
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # Grader threads belong to the parent; the child starts its own on first use
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pid = None
+
+    @property
+    def db(self):
+        return mongo_registry.get_db()
+
+    def register_handler(self, handler: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        """Grading function: job document -> result stored on the job"""
+        self._handler = handler
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def enqueue(self, exam_code: str, payload: Dict[str, Any], job_id: Optional[str] = None) -> Dict[str, Any]:
+        """Queue a submission; raises GradingQueueFull at the depth limit"""
+        if not self._reserve_slot():
+            with self._lock:
+                self._stats["rejected"] += 1
+            depth = self.depth()
+            raise GradingQueueFull(depth["queued"], self.retry_after(depth))
+
+        try:
+            job = {
+                "_id": job_id or str(uuid.uuid4()),
+                "exam_code": exam_code,
+                **payload,
+                "status": "queued",
+                "round": self._next_round(exam_code),
+                "attempts": 0,
+                "enqueued_at": datetime.utcnow(),
+            }
+            self.db.grading_jobs.insert_one(job)
+        except Exception:
+            self._release_slots(1)
+            raise
+        with self._lock:
+            self._stats["enqueued"] += 1
+        self.ensure_started()
+        self._wake.set()
+        return job
+
+    def _reserve_slot(self) -> bool:
+        """Take one of the max_depth slots, atomically; False when the queue is full"""
+        try:
+            # A missing counter starts from zero (the sweep recounts it); a full one fails the
+            # filter, and the upsert then collides with the existing state document
+            self.db.grading_queue_state.update_one(
+                {"_id": STATE_ID, "$or": [{"active": {"$lt": self.max_depth}}, {"active": {"$exists": False}}]},
+                {"$inc": {"active": 1}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def _release_slots(self, count: int):
+        try:
+            self.db.grading_queue_state.update_one(
+                {"_id": STATE_ID},
+                [{"$set": {"active": {"$max": [{"$subtract": [{"$ifNull": ["$active", 0]}, count]}, 0]}}}]
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Could not release {count} grading queue slots (the sweep will): {e}")
+
+    def recount_slots(self) -> int:
+        """Set the slot counter to the real queued + running count, unless it moved meanwhile"""
+        state = self.db.grading_queue_state.find_one({"_id": STATE_ID}, {"active": 1})
+        depth = self.depth()
+        active = depth["queued"] + depth["running"]
+        if state is not None and state.get("active") != active:
+            self.db.grading_queue_state.update_one({"_id": STATE_ID, "active": state.get("active")},
+                                                   {"$set": {"active": active}})
+        return active
+
+    def _next_round(self, exam_code: str) -> int:
+        state = self.db.grading_queue_state.find_one({"_id": STATE_ID}, {"round": 1}) or {}
+        serving = state.get("round", 0)
+        exam = self.db.grading_exam_rounds.find_one_and_update(
+            {"_id": exam_code},
+            [{"$set": {"round": {"$max": [{"$add": [{"$ifNull": ["$round", 0]}, 1]}, serving]}}}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return exam["round"]
+
+    def depth(self) -> Dict[str, int]:
+        """Queued and running job counts (index-only; bounded by max_depth)"""
+        rows = self.db.grading_jobs.aggregate([
+            {"$match": {"status": {"$in": ACTIVE_STATUSES}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ])
+        counts = {status: 0 for status in ACTIVE_STATUSES}
+        counts.update({row["_id"]: row["count"] for row in rows})
+        return counts
+
+    def retry_after(self, depth: Dict[str, int]) -> int:
+        """Seconds until the backlog has roughly drained at the current grading rate"""
+        graders = max(depth["running"], self.workers, 1)
+        return int(min(max(math.ceil(depth["queued"] * self._avg_job_seconds / graders), 1), 120))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status document (without the submitted code)"""
+        job = self.db.grading_jobs.find_one({"_id": job_id}, {"code": 0, "lease_token": 0})
+        if job is not None and job["status"] == "queued":
+            job["position"] = self.db.grading_jobs.count_documents({
+                "status": "queued",
+                "$or": [{"round": {"$lt": job["round"]}},
+                        {"round": job["round"], "enqueued_at": {"$lt": job["enqueued_at"]}}]
+            }) + 1
+        return job
+
+    # ------------------------------------------------------------------
+    # Grader side
+    # ------------------------------------------------------------------
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Atomically take the next job in fair order"""
+        now = datetime.utcnow()
+        job = self.db.grading_jobs.find_one_and_update(
+            {"status": "queued"},
+            {"$set": {"status": "running", "worker": worker, "started_at": now,
+                      "lease_until": now + timedelta(seconds=self.lease_seconds),
+                      "lease_token": str(uuid.uuid4())},
+             "$inc": {"attempts": 1}},
+            sort=[("round", 1), ("enqueued_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is not None:
+            self.db.grading_queue_state.update_one({"_id": STATE_ID}, {"$max": {"round": job["round"]}},
+                                                   upsert=True)
+        return job
+
+    def _finish(self, job: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        # Only the grader still holding the lease may record the outcome
+        result = self.db.grading_jobs.update_one(
+            {"_id": job["_id"], "lease_token": job["lease_token"]},
+            {"$set": {**update, "finished_at": datetime.utcnow()},
+             "$unset": {"code": "", "lease_until": "", "lease_token": ""}}
+        )
+        return result.modified_count == 1
+
+    def _heartbeat(self, job: Dict[str, Any], done: threading.Event):
+        """Extend the job's lease until the handler returns (or the lease is lost)"""
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                renewed = self.db.grading_jobs.update_one(
+                    {"_id": job["_id"], "lease_token": job["lease_token"]},
+                    {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+                )
+                if renewed.matched_count == 0:
+                    if not done.is_set():
+                        logger.warning(f"⚠️ Grading job {job['_id']} lost its lease while running")
+                    return
+            except Exception as e:
+                # Keep trying; the lease only lapses if renewals fail for its whole length
+                logger.warning(f"⚠️ Could not renew lease of grading job {job['_id']}: {e}")
+
+    def requeue_expired(self) -> int:
+        """Requeue running jobs whose lease expired (their grader died); give up after max_attempts"""
+        now = datetime.utcnow()
+        expired = {"status": "running", "lease_until": {"$lt": now}}
+        failed = self.db.grading_jobs.update_many(
+            {**expired, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": "failed", "error": "Grading did not finish", "finished_at": now},
+             "$unset": {"code": "", "lease_until": "", "lease_token": ""}}
+        )
+        requeued = self.db.grading_jobs.update_many(
+            expired, {"$set": {"status": "queued"}, "$unset": {"lease_until": "", "lease_token": ""}}
+        )
+        if failed.modified_count:
+            self._release_slots(failed.modified_count)
+        if requeued.modified_count or failed.modified_count:
+            logger.warning(f"⚠️ Grading leases expired: {requeued.modified_count} requeued, "
+                           f"{failed.modified_count} failed")
+            with self._lock:
+                self._stats["requeued"] += requeued.modified_count
+        return requeued.modified_count
+
+    def process_one(self, worker: str) -> bool:
+        """Claim and grade one job; False when the queue is empty"""
+        job = self.claim(worker)
+        if job is None:
+            return False
+        started = time.monotonic()
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, done),
+                                     name=f"lease-{job['_id'][:8]}", daemon=True)
+        heartbeat.start()
+        try:
+            result = self._handler(job)
+            recorded = self._finish(job, {"status": "done", "result": result})
+            if recorded:
+                self._release_slots(1)
+            with self._lock:
+                self._stats["graded"] += 1
+                self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * (time.monotonic() - started)
+            if not recorded:
+                logger.warning(f"⚠️ Grading job {job['_id']} finished after its lease was taken over")
+        except Exception as e:
+            logger.error(f"❌ Grading job {job['_id']} failed: {e}")
+            if self._finish(job, {"status": "failed", "error": str(e)}):
+                self._release_slots(1)
+            with self._lock:
+                self._stats["failed"] += 1
+        finally:
+            done.set()
+        return True
+
+    def run(self, worker: str, stop_event: threading.Event):
+        """Grader loop: drain the queue, then wait for a wake-up or the poll interval"""
+        last_sweep = 0.0
+        while not stop_event.is_set():
+            try:
+                if time.monotonic() - last_sweep >= self.lease_seconds / 4:
+                    self.requeue_expired()
+                    self.recount_slots()
+                    last_sweep = time.monotonic()
+                if self.process_one(worker):
+                    continue
+            except Exception as e:
+                logger.error(f"❌ Grader {worker} error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def ensure_started(self):
+        """Start this process's grader threads once (after a fork, once per child)"""
+        if self.workers <= 0 or self._handler is None or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            host = f"{socket.gethostname()}:{os.getpid()}"
+            self._threads = [
+                threading.Thread(target=self.run, args=(f"{host}/{index}", self._stop),
+                                 name=f'grader-{index}', daemon=True)
+                for index in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        logger.info(f"✅ Started {self.workers} grader threads")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._pid == os.getpid():
+            for thread in self._threads:
+                thread.join(timeout)
+        self._threads = []
+        self._pid = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"workers": len(self._threads), "max_depth": self.max_depth,
+                    "avg_job_seconds": round(self._avg_job_seconds, 2), **self._stats}
+
+
+# Create global instance
+grading_queue = GradingQueue()
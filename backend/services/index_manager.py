@@ -0,0 +1,247 @@
+import logging
+from datetime import datetime
+from typing import Dict, List, Any
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Server error codes for "an index with this name/key already exists with different options"
+INDEX_CONFLICT_CODES = (85, 86)
+
+# ===================================================================
+# Declarative index spec: one entry per hot query shape in the routes.
+# Unique indexes only where the code already relies on uniqueness
+# (generated codes/ids, upserts keyed on the field).
+# ===================================================================
+
+INDEX_SPECS: Dict[str, List[Dict[str, Any]]] = {
+    "users": [
+        {"keys": [("wallet_address", ASCENDING)], "unique": True},
+        {"keys": [("email", ASCENDING)], "unique": True,
+         "partialFilterExpression": {"email": {"$type": "string"}}},
+        {"keys": [("status", ASCENDING)]},
+    ],
+    "user_profiles": [
+        {"keys": [("user_id", ASCENDING)], "unique": True},
+        {"keys": [("display_name", ASCENDING)]},
+    ],
+    "user_stats": [
+        {"keys": [("user_id", ASCENDING)], "unique": True},
+        # Leaderboard snapshot sort (ties by user_id); also serves total_xp range counts
+        {"keys": [("total_xp", DESCENDING), ("user_id", ASCENDING)]},
+        {"keys": [("total_points", DESCENDING)]},
+        # Rank index sync: documents changed since the last poll
+        {"keys": [("rollup.updated_at", ASCENDING)]},
+        {"keys": [("last_updated", ASCENDING)]},
+        # Nightly streak decay only visits users with a live streak
+        {"keys": [("current_streak", ASCENDING)],
+         "partialFilterExpression": {"current_streak": {"$gt": 0}}},
+    ],
+    "user_courses": [
+        {"keys": [("user_id", ASCENDING), ("completed_at", DESCENDING)]},
+    ],
+    "user_quizzes": [
+        {"keys": [("user_id", ASCENDING), ("completed_at", DESCENDING)]},
+    ],
+    "user_submissions": [
+        {"keys": [("user_id", ASCENDING), ("submitted_at", DESCENDING)]},
+        # Nightly streak advance: submissions since the previous run
+        {"keys": [("submitted_at", DESCENDING)]},
+    ],
+    "user_achievements": [
+        {"keys": [("user_id", ASCENDING), ("earned_at", DESCENDING)]},
+    ],
+    "user_activity_daily": [
+        {"keys": [("user_id", ASCENDING), ("day", ASCENDING)], "unique": True},
+    ],
+    "activity_feed": [
+        {"keys": [("user_id", ASCENDING), ("ts", DESCENDING), ("_id", DESCENDING)]},
+        {"keys": [("user_id", ASCENDING), ("type", ASCENDING), ("ts", DESCENDING), ("_id", DESCENDING)]},
+    ],
+    "user_blockchain": [
+        {"keys": [("user_id", ASCENDING)], "unique": True},
+    ],
+    "exams": [
+        {"keys": [("exam_code", ASCENDING)], "unique": True},
+    ],
+    "participants": [
+        {"keys": [("exam_code", ASCENDING), ("username", ASCENDING)], "unique": True},
+        # One seat per name per exam, case-insensitively (rows from before the
+        # participants migration have no name_lower yet)
+        {"keys": [("exam_code", ASCENDING), ("name_lower", ASCENDING)], "unique": True,
+         "partialFilterExpression": {"name_lower": {"$type": "string"}}},
+        # Participant lists in join order
+        {"keys": [("exam_code", ASCENDING), ("joined_at", ASCENDING)]},
+        # Leaderboard rank by count (live exam events)
+        {"keys": [("exam_code", ASCENDING), ("completed", ASCENDING), ("score", DESCENDING),
+                  ("submission_time", ASCENDING)]},
+    ],
+    "exam_events": [
+        # Stream resume after Last-Event-ID (EXAM_EVENTS_SOURCE=change_stream)
+        {"keys": [("exam_code", ASCENDING), ("seq", ASCENDING)]},
+        {"keys": [("ts", ASCENDING)], "expireAfterSeconds": 24 * 3600},
+    ],
+    "submissions": [
+        {"keys": [("submission_id", ASCENDING)], "unique": True},
+        {"keys": [("exam_code", ASCENDING), ("username", ASCENDING), ("submitted_at", DESCENDING)]},
+    ],
+    "grading_jobs": [
+        # Fair-order claim (lowest round first) and queue positions
+        {"keys": [("status", ASCENDING), ("round", ASCENDING), ("enqueued_at", ASCENDING)]},
+        # Expired-lease sweep
+        {"keys": [("status", ASCENDING), ("lease_until", ASCENDING)]},
+        # Finished jobs expire after a week (the submission record keeps the result)
+        {"keys": [("finished_at", ASCENDING)], "expireAfterSeconds": 7 * 24 * 3600},
+    ],
+    "quiz_rooms": [
+        {"keys": [("room_code", ASCENDING)], "unique": True},
+        {"keys": [("participants.session_id", ASCENDING)]},
+        {"keys": [("is_private", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "quizzes": [
+        {"keys": [("id", ASCENDING)]},
+    ],
+    "adaptive_quiz_sessions": [
+        {"keys": [("session_id", ASCENDING)], "unique": True},
+    ],
+    "certificates": [
+        {"keys": [("certificate_id", ASCENDING)], "unique": True},
+        {"keys": [("share_code", ASCENDING)], "unique": True,
+         "partialFilterExpression": {"share_code": {"$type": "string"}}},
+        {"keys": [("token_id", ASCENDING)], "unique": True,
+         "partialFilterExpression": {"token_id": {"$type": "string"}}},
+        {"keys": [("user_id", ASCENDING), ("created_at", DESCENDING)]},
+        {"keys": [("created_at", DESCENDING)]},
+    ],
+    "courses": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+    ],
+    "modules": [
+        {"keys": [("course_id", ASCENDING), ("order", ASCENDING)]},
+    ],
+    "lessons": [
+        {"keys": [("module_id", ASCENDING), ("order", ASCENDING)]},
+        {"keys": [("course_id", ASCENDING), ("id", ASCENDING)]},
+    ],
+    "questions": [
+        {"keys": [("subject", ASCENDING)]},
+        {"keys": [("difficulty", ASCENDING), ("subject", ASCENDING)]},
+    ],
+    "test_sessions": [
+        {"keys": [("user_id", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "dashboard_cache": [
+        {"keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+        {"keys": [("user_id", ASCENDING)]},
+    ],
+    "coding_logs": [
+        {"keys": [("session_id", ASCENDING), ("timestamp", DESCENDING)]},
+    ],
+}
+
+
+def _key_tuple(keys) -> tuple:
+    """Normalize an index key pattern for comparison"""
+    items = keys.items() if hasattr(keys, 'items') else keys
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in items)
+
+
+def _index_name(spec: Dict[str, Any]) -> str:
+    return spec.get("name") or "_".join(f"{field}_{direction}" for field, direction in spec["keys"])
+
+
+def apply_indexes(db, specs: Dict[str, List[Dict[str, Any]]] = None,
+                  rebuild_conflicts: bool = False) -> Dict[str, Any]:
+    """Create every index in the spec. Safe to run on every boot and from several workers.
+
+    create_index is a no-op when an identical index exists. An older index with
+    the same name or key but different options is left alone and reported,
+    unless rebuild_conflicts is set (CLI only), in which case it is dropped and
+    recreated from the spec.
+    """
+    specs = specs or INDEX_SPECS
+    summary = {"created_or_present": 0, "rebuilt": [], "failed": []}
+
+    for collection_name, indexes in specs.items():
+        collection = db[collection_name]
+        for spec in indexes:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            options.setdefault("name", _index_name(spec))
+            try:
+                collection.create_index(spec["keys"], **options)
+                summary["created_or_present"] += 1
+            except OperationFailure as e:
+                if rebuild_conflicts and e.code in INDEX_CONFLICT_CODES:
+                    if _rebuild_index(collection, spec, options):
+                        summary["rebuilt"].append({"collection": collection_name, "index": options["name"]})
+                        summary["created_or_present"] += 1
+                        continue
+                # Conflicting options or duplicate data - report, never drop automatically
+                logger.error(f"❌ Index {collection_name}.{options['name']} not applied: {e}")
+                summary["failed"].append({
+                    "collection": collection_name,
+                    "index": options["name"],
+                    "error": str(e)
+                })
+
+    logger.info(f"✅ Index spec applied: {summary['created_or_present']} ok, {len(summary['failed'])} failed")
+    return summary
+
+
+def _rebuild_index(collection, spec: Dict[str, Any], options: Dict[str, Any]) -> bool:
+    """Drop whatever index clashes with the spec entry (by name or by key) and recreate it"""
+    wanted_keys = _key_tuple(spec["keys"])
+    try:
+        for info in collection.list_indexes():
+            if info["name"] != "_id_" and (info["name"] == options["name"] or _key_tuple(info["key"]) == wanted_keys):
+                collection.drop_index(info["name"])
+                logger.warning(f"⚠️ Dropped conflicting index {collection.name}.{info['name']}")
+        collection.create_index(spec["keys"], **options)
+        logger.info(f"✅ Rebuilt index {collection.name}.{options['name']}")
+        return True
+    except OperationFailure as e:
+        logger.error(f"❌ Rebuild of {collection.name}.{options['name']} failed: {e}")
+        return False
+
+
+def index_report(db, specs: Dict[str, List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Compare live indexes with the spec and report missing, unexpected and unused ones"""
+    specs = specs or INDEX_SPECS
+    report = {"missing": [], "unexpected": [], "unused": [], "generated_at": datetime.now().isoformat()}
+    existing_collections = set(db.list_collection_names())
+
+    for collection_name in sorted(set(specs) | existing_collections):
+        if collection_name.startswith("system."):
+            continue
+        collection = db[collection_name]
+        live = {}
+        if collection_name in existing_collections:
+            live = {info["name"]: _key_tuple(info["key"]) for info in collection.list_indexes()}
+        live_keys = set(live.values())
+        wanted = {_key_tuple(spec["keys"]): _index_name(spec) for spec in specs.get(collection_name, [])}
+
+        for keys, name in wanted.items():
+            if keys not in live_keys:
+                report["missing"].append({"collection": collection_name, "index": name})
+
+        for name, keys in live.items():
+            if name != "_id_" and keys not in wanted:
+                report["unexpected"].append({"collection": collection_name, "index": name})
+
+        if collection_name in existing_collections:
+            try:
+                for stat in collection.aggregate([{"$indexStats": {}}]):
+                    if stat["name"] != "_id_" and stat.get("accesses", {}).get("ops", 0) == 0:
+                        report["unused"].append({
+                            "collection": collection_name,
+                            "index": stat["name"],
+                            "since": stat.get("accesses", {}).get("since").isoformat()
+                            if stat.get("accesses", {}).get("since") else None
+                        })
+            except OperationFailure as e:
+                logger.warning(f"⚠️ $indexStats unavailable for {collection_name}: {e}")
+
+    return report
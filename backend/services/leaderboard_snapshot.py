@@ -0,0 +1,242 @@
+import os
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+
+from pymongo.errors import DuplicateKeyError
+
+from services.mongo_registry import mongo_registry
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ID = "global"
+DEFAULT_AVATAR = "https://api.dicebear.com/7.x/avataaars/svg?seed={user_id}"
+
+
+def leaderboard_pipeline(size: int) -> List[Dict[str, Any]]:
+    """Top users by XP joined to their profiles in one aggregation (no per-row lookups)"""
+    return [
+        {"$sort": {"total_xp": -1, "user_id": 1}},
+        {"$limit": size},
+        {"$project": {"_id": 0, "user_id": 1, "total_xp": 1, "current_streak": 1}},
+        {"$lookup": {
+            "from": "user_profiles",
+            "localField": "user_id",
+            "foreignField": "user_id",
+            "as": "profile"
+        }},
+        {"$project": {
+            "user_id": 1,
+            "total_xp": 1,
+            "current_streak": 1,
+            "profile": {"$arrayElemAt": ["$profile", 0]}
+        }},
+        {"$project": {
+            "user_id": 1,
+            "total_xp": 1,
+            "current_streak": 1,
+            "profile.display_name": 1,
+            "profile.avatar_url": 1,
+            "profile.badges": 1,
+            "profile.wallet_address": 1
+        }},
+    ]
+
+
+def leaderboard_entry(row: Dict[str, Any], rank: int) -> Dict[str, Any]:
+    """One leaderboard row in the shape the frontend expects"""
+    user_id = row["user_id"]
+    profile = row.get("profile")
+    display_name = profile.get("display_name") if profile else None
+    return {
+        "rank": rank,
+        "user_id": user_id,
+        "username": (display_name or f"User_{user_id[-6:]}") if profile else "Anonymous User",
+        "display_name": display_name,
+        "total_xp": row.get("total_xp", 0),
+        "streak": row.get("current_streak", 0),
+        "avatar": (profile or {}).get("avatar_url") or DEFAULT_AVATAR.format(user_id=user_id),
+        "badges": (profile or {}).get("badges", []),
+        "wallet_address": profile.get("wallet_address") if profile else None
+    }
+
+
+class LeaderboardSnapshot:
+    """Materialized global leaderboard, shared through leaderboard_snapshots.
+
+    One worker at a time (holding a short lease on the snapshot document)
+    rebuilds the top LEADERBOARD_SNAPSHOT_SIZE rows with a single
+    $lookup aggregation - on a schedule, or sooner when an XP change lands
+    at or above the snapshot's cut-off. Every worker serves pages from its
+    in-memory copy and re-reads the document only when it has changed.
+    """
+
+    def __init__(self):
+        self.size = int(os.getenv('LEADERBOARD_SNAPSHOT_SIZE', 1000))
+        self.rebuild_interval = float(os.getenv('LEADERBOARD_SNAPSHOT_INTERVAL', 300))
+        self.check_interval = float(os.getenv('LEADERBOARD_CHECK_INTERVAL', 5))
+        self.lease_seconds = 60
+        self._lock = threading.Lock()
+        self._clear()
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _clear(self):
+        self._entries: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self._built_at: Optional[datetime] = None
+        self._threshold_xp = 0
+        self._last_check = 0.0
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    @property
+    def collection(self):
+        return mongo_registry.get_db().leaderboard_snapshots
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+
+    def build(self) -> Dict[str, Any]:
+        """Compute the snapshot rows (competition ranks: ties share a rank)"""
+        rows = mongo_registry.get_db().user_stats.aggregate(leaderboard_pipeline(self.size))
+        entries = []
+        for position, row in enumerate(rows, 1):
+            tied = entries and entries[-1]["total_xp"] == row.get("total_xp", 0)
+            entries.append(leaderboard_entry(row, entries[-1]["rank"] if tied else position))
+        threshold = entries[-1]["total_xp"] if len(entries) >= self.size else 0
+        return {"entries": entries, "threshold_xp": threshold}
+
+    def _claim_rebuild(self, force: bool) -> bool:
+        """Take the rebuild lease if the snapshot is due (or force is set)"""
+        now = datetime.utcnow()
+        due = [{"stale": True}, {"built_at": {"$lt": now - timedelta(seconds=self.rebuild_interval)}}]
+        query = {"_id": SNAPSHOT_ID, "$or": [{"lease_until": {"$exists": False}}, {"lease_until": {"$lt": now}}]}
+        if not force:
+            query["$and"] = [{"$or": due}]
+        try:
+            claimed = self.collection.find_one_and_update(
+                query,
+                {"$set": {"lease_until": now + timedelta(seconds=self.lease_seconds)}},
+                {"_id": 1},
+                upsert=force
+            )
+            return claimed is not None or force
+        except DuplicateKeyError:
+            return False  # someone else holds the lease on a brand new snapshot
+
+    def rebuild(self, force: bool = False) -> bool:
+        """Rebuild and publish the snapshot if due; returns True if this call rebuilt it"""
+        if not self._claim_rebuild(force):
+            return False
+        started = time.monotonic()
+        snapshot = self.build()
+        now = datetime.utcnow()
+        built_at = now.replace(microsecond=now.microsecond // 1000 * 1000)  # BSON keeps milliseconds
+        self.collection.update_one(
+            {"_id": SNAPSHOT_ID},
+            {"$set": {**snapshot, "built_at": built_at, "stale": False},
+             "$unset": {"lease_until": ""}},
+            upsert=True
+        )
+        self._install(snapshot["entries"], snapshot["threshold_xp"], built_at)
+        logger.info(f"✅ Leaderboard snapshot rebuilt: {len(snapshot['entries'])} rows "
+                    f"in {(time.monotonic() - started) * 1000:.0f}ms")
+        return True
+
+    def _install(self, entries: List[Dict[str, Any]], threshold_xp, built_at: Optional[datetime]):
+        with self._lock:
+            self._entries = entries
+            self._positions = {entry["user_id"]: index for index, entry in enumerate(entries)}
+            self._threshold_xp = threshold_xp
+            self._built_at = built_at
+            self._last_check = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # Freshness
+    # ------------------------------------------------------------------
+
+    def refresh(self):
+        """Rebuild when due, otherwise pick up another worker's newer snapshot"""
+        if self._last_check and time.monotonic() - self._last_check < self.check_interval:
+            return
+        try:
+            if not self.rebuild(force=self._built_at is None and not self._stored_exists()):
+                header = self.collection.find_one({"_id": SNAPSHOT_ID}, {"built_at": 1})
+                if header and header.get("built_at") and header["built_at"] != self._built_at:
+                    stored = self.collection.find_one({"_id": SNAPSHOT_ID})
+                    self._install(stored.get("entries", []), stored.get("threshold_xp", 0), stored["built_at"])
+                else:
+                    self._last_check = time.monotonic()
+        except Exception as e:
+            logger.warning(f"⚠️ Leaderboard snapshot refresh failed: {e}")
+            self._last_check = time.monotonic()
+            if not self._entries:
+                # No snapshot to serve at all - build one for this worker only
+                snapshot = self.build()
+                self._install(snapshot["entries"], snapshot["threshold_xp"], None)
+
+    def _stored_exists(self) -> bool:
+        return self.collection.find_one({"_id": SNAPSHOT_ID, "built_at": {"$exists": True}}, {"_id": 1}) is not None
+
+    def note_xp_change(self, user_id: str, total_xp):
+        """Mark the snapshot stale when an XP change can move the top rows"""
+        if self._entries and (user_id in self._positions or (total_xp or 0) >= self._threshold_xp):
+            self._mark_stale()
+
+    def note_profile_change(self, user_id: str):
+        """Names and avatars are part of the rows - rebuild if this user is in them"""
+        if user_id in self._positions:
+            self._mark_stale()
+
+    def _mark_stale(self):
+        try:
+            self.collection.update_one({"_id": SNAPSHOT_ID, "stale": {"$ne": True}}, {"$set": {"stale": True}})
+            self._last_check = 0.0
+        except Exception as e:
+            logger.warning(f"⚠️ Could not mark leaderboard snapshot stale: {e}")
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def page(self, page: int, page_size: int) -> Dict[str, Any]:
+        self.refresh()
+        with self._lock:
+            entries = self._entries
+            built_at = self._built_at
+        start = (page - 1) * page_size
+        return {
+            "data": entries[start:start + page_size],
+            "pagination": {
+                "page": page,
+                "page_size": page_size,
+                "total": len(entries),
+                "pages": (len(entries) + page_size - 1) // page_size
+            },
+            "snapshot_built_at": built_at.isoformat() if built_at else None
+        }
+
+    def position_of(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """The user's row if they are inside the snapshot"""
+        with self._lock:
+            index = self._positions.get(user_id)
+            return dict(self._entries[index], index=index) if index is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rows": len(self._entries),
+                "threshold_xp": self._threshold_xp,
+                "built_at": self._built_at.isoformat() if self._built_at else None
+            }
+
+
+# Create global instance
+leaderboard_snapshot = LeaderboardSnapshot()
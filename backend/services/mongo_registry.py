@@ -0,0 +1,268 @@
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Optional, Any
+
+from pymongo import MongoClient
+
+logger = logging.getLogger(__name__)
+
+# Read preference for the code currently running (set per request by services.read_routing)
+_read_preference: ContextVar = ContextVar('mongo_read_preference', default=None)
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment"""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        logger.warning(f"⚠️ Invalid value for {name}, using default {default}")
+        return default
+
+
+class MongoClientRegistry:
+    """One lazily built MongoClient per process, shared by every blueprint.
+
+    The client is created on first use, so nothing is opened in the gunicorn
+    master before it forks. After a fork the child drops the inherited client
+    and builds its own pool the next time a handle is requested.
+    """
+
+    def __init__(self, uri: Optional[str] = None, db_name: Optional[str] = None):
+        self._uri = uri
+        self._db_name = db_name
+        self._lock = threading.RLock()
+        self._client: Optional[MongoClient] = None
+        self._pid: Optional[int] = None
+
+        # Liveness probe state (updated by the background thread)
+        self._probe_thread: Optional[threading.Thread] = None
+        self._probe_stop = threading.Event()
+        self._healthy: Optional[bool] = None
+        self._last_ping_at: Optional[datetime] = None
+        self._last_ping_ms: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    # ------------------------------------------------------------------
+    # Configuration
+    # ------------------------------------------------------------------
+
+    @property
+    def uri(self) -> str:
+        return self._uri or os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
+
+    @property
+    def db_name(self) -> str:
+        return self._db_name or os.getenv('MONGODB_DB_NAME', 'openlearnx')
+
+    def configure(self, uri: Optional[str] = None, db_name: Optional[str] = None):
+        """Override URI / database name; an existing client is rebuilt on next use"""
+        with self._lock:
+            changed = (uri and uri != self._uri) or (db_name and db_name != self._db_name)
+            if uri:
+                self._uri = uri
+            if db_name:
+                self._db_name = db_name
+            if changed and self._client is not None:
+                self._close_locked()
+
+    def client_options(self) -> Dict[str, Any]:
+        """Pool sizes and timeouts, tunable per deployment through the environment"""
+        return {
+            "maxPoolSize": _env_int('MONGO_MAX_POOL_SIZE', 50),
+            "minPoolSize": _env_int('MONGO_MIN_POOL_SIZE', 0),
+            "maxIdleTimeMS": _env_int('MONGO_MAX_IDLE_TIME_MS', 60000),
+            "waitQueueTimeoutMS": _env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000),
+            "serverSelectionTimeoutMS": _env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+            "connectTimeoutMS": _env_int('MONGO_CONNECT_TIMEOUT_MS', 5000),
+            "socketTimeoutMS": _env_int('MONGO_SOCKET_TIMEOUT_MS', 30000),
+            "appname": os.getenv('MONGO_APP_NAME', 'openlearnx-backend'),
+        }
+
+    # ------------------------------------------------------------------
+    # Handles
+    # ------------------------------------------------------------------
+
+    def get_client(self) -> MongoClient:
+        """Return this process's MongoClient, building it on first use"""
+        client = self._client
+        if client is not None and self._pid == os.getpid():
+            return client
+
+        with self._lock:
+            if self._client is not None and self._pid != os.getpid():
+                # Inherited from the parent process - never reuse its sockets
+                self._client = None
+            if self._client is None:
+                self._client = MongoClient(self.uri, **self.client_options())
+                self._pid = os.getpid()
+                logger.info(f"✅ MongoDB client pool created (pid={self._pid})")
+                self._start_probe_locked()
+            return self._client
+
+    def get_db(self, **options):
+        """Return the application database from the shared client"""
+        if options:
+            return self.get_client().get_database(self.db_name, **options)
+        return self.get_client()[self.db_name]
+
+    def current_db(self):
+        """Application database honouring the read preference of the current request, if any"""
+        preference = _read_preference.get()
+        if preference is None:
+            return self.get_db()
+        return self.get_db(read_preference=preference)
+
+    @contextmanager
+    def use_read_preference(self, preference):
+        """Route reads made through current_db()/lazy_db() with the given preference"""
+        token = _read_preference.set(preference)
+        try:
+            yield
+        finally:
+            _read_preference.reset(token)
+
+    def lazy_db(self) -> "LazyDatabase":
+        """Module-level database handle that resolves through the registry on use"""
+        return LazyDatabase(self)
+
+    def is_available(self) -> bool:
+        """False only when the liveness probe has observed the server down"""
+        return self._healthy is not False
+
+    # ------------------------------------------------------------------
+    # Liveness probe
+    # ------------------------------------------------------------------
+
+    def ping(self, client: Optional[MongoClient] = None) -> bool:
+        """Run one liveness check now and record the result"""
+        client = client or self.get_client()
+        started = time.perf_counter()
+        try:
+            client.admin.command('ping')
+            self._healthy = True
+            self._last_error = None
+        except Exception as e:
+            self._healthy = False
+            self._last_error = str(e)
+            logger.warning(f"⚠️ MongoDB liveness probe failed: {e}")
+        self._last_ping_ms = round((time.perf_counter() - started) * 1000, 2)
+        self._last_ping_at = datetime.now()
+        return bool(self._healthy)
+
+    def _start_probe_locked(self):
+        interval = _env_int('MONGO_HEALTH_CHECK_INTERVAL', 15)
+        if interval <= 0:
+            return
+        self._probe_stop = threading.Event()
+        stop_event = self._probe_stop
+        client = self._client
+
+        def probe():
+            while not stop_event.is_set():
+                try:
+                    self.ping(client)
+                except Exception as e:
+                    logger.error(f"❌ MongoDB probe error: {e}")
+                stop_event.wait(interval)
+
+        self._probe_thread = threading.Thread(target=probe, name='mongo-liveness-probe', daemon=True)
+        self._probe_thread.start()
+
+    def status(self) -> Dict[str, Any]:
+        """Snapshot of the pool and probe state for health endpoints"""
+        options = self.client_options()
+        return {
+            "connected": self._client is not None and self._pid == os.getpid(),
+            "healthy": self._healthy,
+            "last_ping_at": self._last_ping_at.isoformat() if self._last_ping_at else None,
+            "last_ping_ms": self._last_ping_ms,
+            "last_error": self._last_error,
+            "pid": self._pid,
+            "max_pool_size": options["maxPoolSize"],
+            "min_pool_size": options["minPoolSize"],
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def reset_after_fork(self):
+        """Forget any client inherited from the parent process"""
+        self._reset_after_fork()
+
+    def warm_up(self, timeout: float = 10.0) -> bool:
+        """Build the pool and wait until the server answers a ping.
+
+        Called before a worker starts accepting requests so the first
+        requests after a restart don't pay for server discovery.
+        """
+        deadline = time.monotonic() + timeout
+        client = self.get_client()
+        while True:
+            if self.ping(client):
+                logger.info(f"✅ MongoDB warm-up complete in {self._last_ping_ms}ms (pid={os.getpid()})")
+                return True
+            if time.monotonic() >= deadline:
+                logger.warning(f"⚠️ MongoDB warm-up timed out after {timeout}s (pid={os.getpid()})")
+                return False
+            time.sleep(0.5)
+
+    def close(self):
+        """Stop the probe and close the pool owned by this process"""
+        with self._lock:
+            self._close_locked()
+
+    def _close_locked(self):
+        self._probe_stop.set()
+        if self._client is not None and self._pid == os.getpid():
+            try:
+                self._client.close()
+                logger.info(f"✅ MongoDB client pool closed (pid={self._pid})")
+            except Exception as e:
+                logger.warning(f"⚠️ Error closing MongoDB client: {e}")
+        self._client = None
+        self._pid = None
+        self._healthy = None
+
+    def _reset_after_fork(self):
+        # Runs in the child right after fork(); the lock may have been held by
+        # another thread in the parent, so replace it instead of acquiring it.
+        self._lock = threading.RLock()
+        self._client = None
+        self._pid = None
+        self._probe_thread = None
+        self._probe_stop = threading.Event()
+        self._healthy = None
+
+
+class LazyDatabase:
+    """Stand-in for a pymongo Database that is resolved per process on access"""
+
+    def __init__(self, registry: MongoClientRegistry):
+        self._registry = registry
+
+    def __getattr__(self, name):
+        return getattr(self._registry.current_db(), name)
+
+    def __getitem__(self, name):
+        return self._registry.current_db()[name]
+
+    def __repr__(self):
+        return f"LazyDatabase({self._registry.db_name!r})"
+
+
+# Create global instance
+mongo_registry = MongoClientRegistry()
+
+
+def get_database():
+    """Get the shared MongoDB database handle"""
+    return mongo_registry.get_db()
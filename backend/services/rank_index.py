@@ -0,0 +1,358 @@
+import os
+import time
+import threading
+import logging
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Any, Tuple
+
+from services.mongo_registry import mongo_registry
+
+logger = logging.getLogger(__name__)
+
+# Allowance for clock differences between the app servers writing the change marker
+SYNC_CLOCK_SKEW = timedelta(seconds=2)
+
+
+class FenwickTree:
+    """Binary indexed tree of counts: point update, prefix sum and k-th search in O(log n)"""
+
+    def __init__(self, size: int, counts: Optional[List[int]] = None):
+        self.size = size
+        self._tree = [0] * (size + 1)
+        if counts:
+            # Linear-time construction
+            for i, count in enumerate(counts, 1):
+                self._tree[i] += count
+                parent = i + (i & -i)
+                if parent <= size:
+                    self._tree[parent] += self._tree[i]
+
+    def add(self, index: int, delta: int):
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index: int) -> int:
+        """Sum of counts[0..index] (0 for index < 0)"""
+        total = 0
+        i = min(index + 1, self.size)
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def lower_bound(self, target: int) -> int:
+        """Smallest index whose prefix sum reaches target (target >= 1)"""
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = position + step
+            if nxt <= self.size and self._tree[nxt] < target:
+                position = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return position
+
+
+class RankIndex:
+    """In-memory order-statistic index over one user_stats score field.
+
+    Scores are grouped into fixed-width buckets; a Fenwick tree counts users
+    per bucket and each bucket keeps its (-score, user_id) entries sorted, so
+    rank-of-user, the user at a position, top-K and neighbours cost
+    O(log buckets + log bucket size) instead of a count over every user.
+
+    Each worker builds its own copy from user_stats in the background on
+    first use (queries fall back to MongoDB until then), applies its own
+    writes through set_score(), and picks up other workers' writes by
+    re-reading documents whose change marker moved since the last sync.
+    A periodic full rebuild catches deletions and unmarked writes.
+    """
+
+    def __init__(self, score_field: str, changed_field: str, collection: str = 'user_stats',
+                 bucket_width: Optional[int] = None):
+        self.score_field = score_field
+        self.changed_field = changed_field
+        self.collection = collection
+        self.bucket_width = bucket_width or int(os.getenv('RANK_BUCKET_WIDTH', 10))
+        self.sync_interval = float(os.getenv('RANK_SYNC_INTERVAL', 5))
+        self.rebuild_interval = float(os.getenv('RANK_REBUILD_INTERVAL', 3600))
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._clear()
+        self._building = False
+        self._stats = {"builds": 0, "syncs": 0, "synced_docs": 0, "fallbacks": 0}
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _clear(self):
+        self._scores: Dict[str, float] = {}
+        self._buckets: Dict[int, List[Tuple[float, str]]] = {}
+        self._tree = FenwickTree(1)
+        self._ready = False
+        self._built_at = 0.0
+        self._last_sync = 0.0
+        self._synced_until: Optional[datetime] = None
+
+    def _reset_after_fork(self):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._clear()
+        self._building = False
+
+    # ------------------------------------------------------------------
+    # Structure
+    # ------------------------------------------------------------------
+
+    def _bucket(self, score) -> int:
+        return max(0, int(score // self.bucket_width))
+
+    def _grow(self, bucket: int):
+        """Resize the tree (doubling) so the bucket index fits"""
+        if bucket < self._tree.size:
+            return
+        size = self._tree.size
+        while size <= bucket:
+            size *= 2
+        counts = [len(self._buckets.get(b, ())) for b in range(size)]
+        self._tree = FenwickTree(size, counts)
+
+    def load(self, scores: Iterable[Tuple[str, Any]]):
+        """Replace the whole index from (user_id, score) pairs"""
+        new_scores: Dict[str, float] = {}
+        for user_id, score in scores:
+            if user_id:
+                new_scores[user_id] = score or 0
+        buckets: Dict[int, List[Tuple[float, str]]] = {}
+        for user_id, score in new_scores.items():
+            buckets.setdefault(self._bucket(score), []).append((-score, user_id))
+        for entries in buckets.values():
+            entries.sort()
+        size = 1
+        while size <= max(buckets, default=0):
+            size *= 2
+        counts = [len(buckets.get(b, ())) for b in range(size)]
+
+        with self._lock:
+            self._scores, self._buckets = new_scores, buckets
+            self._tree = FenwickTree(size, counts)
+            self._ready = True
+
+    def _remove(self, user_id: str):
+        score = self._scores.pop(user_id, None)
+        if score is None:
+            return
+        bucket = self._bucket(score)
+        entries = self._buckets[bucket]
+        del entries[bisect_left(entries, (-score, user_id))]
+        if not entries:
+            del self._buckets[bucket]
+        self._tree.add(bucket, -1)
+
+    def set_score(self, user_id: str, score):
+        """Insert or move a user (called by writers after updating user_stats)"""
+        if not user_id:
+            return
+        score = score or 0
+        with self._lock:
+            if not self._ready or self._scores.get(user_id) == score:
+                return
+            self._remove(user_id)
+            bucket = self._bucket(score)
+            self._grow(bucket)
+            insort(self._buckets.setdefault(bucket, []), (-score, user_id))
+            self._scores[user_id] = score
+            self._tree.add(bucket, 1)
+
+    def remove(self, user_id: str):
+        with self._lock:
+            if self._ready:
+                self._remove(user_id)
+
+    def _count_above(self, score) -> int:
+        bucket = self._bucket(score)
+        higher = len(self._scores) - self._tree.prefix(bucket)
+        return higher + bisect_left(self._buckets.get(bucket, []), (-score,))
+
+    def _position(self, user_id: str) -> int:
+        """1-based position in descending score order (ties broken by user id)"""
+        score = self._scores[user_id]
+        bucket = self._bucket(score)
+        higher = len(self._scores) - self._tree.prefix(bucket)
+        return higher + bisect_left(self._buckets[bucket], (-score, user_id)) + 1
+
+    def _locate(self, position: int) -> Tuple[int, int]:
+        """Bucket and offset of the entry at a 1-based position"""
+        total = len(self._scores)
+        bucket = self._tree.lower_bound(total - position + 1)
+        above = total - self._tree.prefix(bucket)
+        return bucket, position - above - 1
+
+    def _range(self, first: int, last: int) -> List[Dict[str, Any]]:
+        """Entries at positions first..last with competition ranks (ties share a rank)"""
+        first, last = max(1, first), min(last, len(self._scores))
+        entries = []
+        position = first
+        while position <= last:
+            bucket, offset = self._locate(position)
+            chunk = self._buckets[bucket][offset:offset + last - position + 1]
+            for neg_score, user_id in chunk:
+                score = -neg_score
+                if entries and entries[-1]["score"] == score:
+                    rank = entries[-1]["rank"]
+                elif entries:
+                    rank = position  # everyone before this entry scored strictly higher
+                else:
+                    rank = self._count_above(score) + 1
+                entries.append({"user_id": user_id, "score": score, "rank": rank})
+                position += 1
+        return entries
+
+    # ------------------------------------------------------------------
+    # Freshness
+    # ------------------------------------------------------------------
+
+    def _build(self):
+        try:
+            started = time.monotonic()
+            synced_until = datetime.now() - SYNC_CLOCK_SKEW
+            cursor = mongo_registry.get_db()[self.collection].find(
+                {}, {"_id": 0, "user_id": 1, self.score_field: 1}
+            )
+            self.load((doc.get("user_id"), doc.get(self.score_field, 0)) for doc in cursor)
+            with self._lock:
+                self._built_at = self._last_sync = time.monotonic()
+                self._synced_until = synced_until
+                self._stats["builds"] += 1
+            logger.info(f"✅ Rank index on {self.score_field} built: {len(self._scores):,} users "
+                        f"in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"❌ Rank index on {self.score_field} build failed: {e}")
+        finally:
+            self._building = False
+
+    def _start_build(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._build, name=f"rank-index-{self.score_field}", daemon=True).start()
+
+    def _sync(self):
+        """Apply documents whose change marker moved since the last sync"""
+        if not self._sync_lock.acquire(blocking=False):
+            return  # another request is syncing; serve the current view
+        try:
+            synced_until = datetime.now() - SYNC_CLOCK_SKEW
+            cursor = mongo_registry.get_db()[self.collection].find(
+                {self.changed_field: {"$gte": self._synced_until}},
+                {"_id": 0, "user_id": 1, self.score_field: 1}
+            )
+            count = 0
+            for doc in cursor:
+                self.set_score(doc.get("user_id"), doc.get(self.score_field, 0))
+                count += 1
+            with self._lock:
+                self._synced_until = synced_until
+                self._last_sync = time.monotonic()
+                self._stats["syncs"] += 1
+                self._stats["synced_docs"] += count
+        except Exception as e:
+            logger.warning(f"⚠️ Rank index on {self.score_field} sync failed: {e}")
+        finally:
+            self._sync_lock.release()
+
+    def ensure_fresh(self) -> bool:
+        """True when the in-memory index can answer; kicks off builds and syncs as needed"""
+        if not self._ready:
+            self._start_build()
+            return False
+        now = time.monotonic()
+        if now - self._built_at > self.rebuild_interval:
+            self._start_build()
+        if now - self._last_sync > self.sync_interval:
+            self._sync()
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def rank_of(self, user_id: str, score=None) -> int:
+        """Competition rank (1 + users with a strictly higher score)"""
+        if self.ensure_fresh():
+            with self._lock:
+                if score is not None and user_id in self._scores:
+                    # The caller just read the document - fresher than our copy
+                    self.set_score(user_id, score)
+                known = self._scores.get(user_id)
+                return self._count_above(known if known is not None else (score or 0)) + 1
+        self._stats["fallbacks"] += 1
+        if score is None:
+            doc = mongo_registry.get_db()[self.collection].find_one(
+                {"user_id": user_id}, {"_id": 0, self.score_field: 1}
+            )
+            score = (doc or {}).get(self.score_field, 0)
+        return mongo_registry.get_db()[self.collection].count_documents({self.score_field: {"$gt": score}}) + 1
+
+    def top(self, k: int) -> List[Dict[str, Any]]:
+        """The k highest scores as [{"user_id", "score", "rank"}]"""
+        if self.ensure_fresh():
+            with self._lock:
+                return self._range(1, k)
+        self._stats["fallbacks"] += 1
+        cursor = mongo_registry.get_db()[self.collection].find(
+            {}, {"_id": 0, "user_id": 1, self.score_field: 1}
+        ).sort(self.score_field, -1).limit(k)
+        return _with_ranks([(doc.get("user_id"), doc.get(self.score_field, 0)) for doc in cursor], 1)
+
+    def around(self, user_id: str, n: int = 5) -> List[Dict[str, Any]]:
+        """Up to n users either side of a user, in leaderboard order"""
+        if self.ensure_fresh():
+            with self._lock:
+                if user_id not in self._scores:
+                    return []
+                position = self._position(user_id)
+                return self._range(position - n, position + n)
+        self._stats["fallbacks"] += 1
+        collection = mongo_registry.get_db()[self.collection]
+        projection = {"_id": 0, "user_id": 1, self.score_field: 1}
+        me = collection.find_one({"user_id": user_id}, projection)
+        if not me:
+            return []
+        score = me.get(self.score_field, 0)
+        above = list(collection.find({self.score_field: {"$gt": score}}, projection)
+                     .sort(self.score_field, 1).limit(n))[::-1]
+        below = list(collection.find({self.score_field: {"$lte": score}, "user_id": {"$ne": user_id}}, projection)
+                     .sort(self.score_field, -1).limit(n))
+        window = [(doc.get("user_id"), doc.get(self.score_field, 0)) for doc in above + [me] + below]
+        first_score = window[0][1]
+        return _with_ranks(window, collection.count_documents({self.score_field: {"$gt": first_score}}) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "field": self.score_field,
+                "ready": self._ready,
+                "users": len(self._scores),
+                "buckets": len(self._buckets),
+                **self._stats
+            }
+
+
+def _with_ranks(pairs: List[Tuple[str, Any]], first_rank: int) -> List[Dict[str, Any]]:
+    """Competition ranks for a contiguous, score-descending window starting at first_rank"""
+    entries = []
+    for offset, (user_id, score) in enumerate(pairs):
+        score = score or 0
+        rank = entries[-1]["rank"] if entries and entries[-1]["score"] == score else first_rank + offset
+        entries.append({"user_id": user_id, "score": score, "rank": rank})
+    return entries
+
+
+# Create global instances
+xp_rank_index = RankIndex('total_xp', 'rollup.updated_at')
+points_rank_index = RankIndex('total_points', 'last_updated')
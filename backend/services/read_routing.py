@@ -0,0 +1,84 @@
+import os
+import threading
+import logging
+from functools import wraps
+from typing import Dict, Optional, Any
+
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+
+from services.mongo_registry import mongo_registry
+
+logger = logging.getLogger(__name__)
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+class ReadRouter:
+    """Sends reads from routes tagged as staleness-tolerant to secondaries.
+
+    Untagged routes - including every write-after-read path such as exam
+    submission and certificate minting - keep reading from the primary.
+    Writes always go to the primary regardless of the read preference.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def mode(self) -> str:
+        return os.getenv('MONGO_ANALYTICS_READ_PREFERENCE', 'secondaryPreferred')
+
+    @property
+    def max_staleness(self) -> int:
+        # The server enforces a minimum of 90 seconds; -1 means no limit
+        return int(os.getenv('MONGO_MAX_STALENESS_SECONDS', 120))
+
+    def read_preference(self, max_staleness: Optional[int] = None):
+        """Read preference used for tagged routes, or None to stay on the primary"""
+        mode_class = READ_PREFERENCE_MODES.get(self.mode)
+        if mode_class is None:
+            logger.warning(f"⚠️ Unknown read preference '{self.mode}', using primary")
+            return None
+        if mode_class is Primary:
+            return None
+        staleness = self.max_staleness if max_staleness is None else max_staleness
+        return mode_class(max_staleness=staleness)
+
+    def secondary_ok(self, fn=None, *, max_staleness: Optional[int] = None):
+        """Decorator for read-only routes that tolerate slightly stale data"""
+        def decorator(view):
+            route = f"{view.__module__.split('.')[-1]}.{view.__name__}"
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                preference = self.read_preference(max_staleness)
+                self._record(route, preference.mongos_mode if preference else "primary")
+                if preference is None:
+                    return view(*args, **kwargs)
+                with mongo_registry.use_read_preference(preference):
+                    return view(*args, **kwargs)
+            return wrapper
+
+        return decorator(fn) if fn is not None else decorator
+
+    def _record(self, route: str, mode: str):
+        with self._lock:
+            route_usage = self._usage.setdefault(route, {})
+            route_usage[mode] = route_usage.get(mode, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-route request counts by read preference, for health endpoints"""
+        with self._lock:
+            usage = {route: dict(modes) for route, modes in self._usage.items()}
+        return {"mode": self.mode, "max_staleness_seconds": self.max_staleness, "routes": usage}
+
+
+# Create global instance
+read_router = ReadRouter()
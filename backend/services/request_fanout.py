@@ -0,0 +1,90 @@
+import os
+import time
+import threading
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+class RequestFanout:
+    """Runs the independent reads of one request concurrently, each with a deadline.
+
+    Every call runs in a copy of the caller's context, so the Flask request
+    and the per-request read preference carry over into the pool threads.
+    A call still running at the deadline is reported as timed out and left
+    to finish in the background; its result is discarded.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or int(os.getenv('REQUEST_FANOUT_WORKERS', 16))
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stats = {"calls": 0, "timeouts": 0, "errors": 0}
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # Pool threads don't survive a fork
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='request-fanout')
+            return self._executor
+
+    def run(self, calls: Dict[str, Callable[[], Any]], timeout: float) -> Dict[str, Dict[str, Any]]:
+        """name -> {"ok", "result" | "error", "timed_out", "elapsed_ms"} once all finish or time runs out"""
+        if not calls:
+            return {}
+        started = time.perf_counter()
+        finished_at: Dict[str, float] = {}
+
+        def timed(name, fn):
+            try:
+                return fn()
+            finally:
+                finished_at[name] = time.perf_counter()
+
+        pool = self._pool()
+        futures = {
+            name: pool.submit(contextvars.copy_context().run, timed, name, fn)
+            for name, fn in calls.items()
+        }
+        wait(futures.values(), timeout=max(0.0, timeout))
+
+        outcomes = {}
+        for name, future in futures.items():
+            if not future.done():
+                future.cancel()
+                outcomes[name] = {"ok": False, "timed_out": True, "error": f"{name} timed out",
+                                  "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+                continue
+            elapsed_ms = round((finished_at.get(name, time.perf_counter()) - started) * 1000, 1)
+            try:
+                outcomes[name] = {"ok": True, "timed_out": False, "result": future.result(),
+                                  "elapsed_ms": elapsed_ms}
+            except Exception as e:
+                logger.warning(f"⚠️ {name} failed: {e}")
+                outcomes[name] = {"ok": False, "timed_out": False, "error": str(e), "elapsed_ms": elapsed_ms}
+
+        with self._lock:
+            self._stats["calls"] += len(outcomes)
+            self._stats["timeouts"] += sum(1 for outcome in outcomes.values() if outcome["timed_out"])
+            self._stats["errors"] += sum(1 for outcome in outcomes.values()
+                                         if not outcome["ok"] and not outcome["timed_out"])
+        return outcomes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"max_workers": self.max_workers, **self._stats}
+
+
+# Create global instance
+request_fanout = RequestFanout()
@@ -0,0 +1,259 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+import logging
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Callable, Dict, Optional, Any, Tuple
+
+from flask import current_app, request, make_response, has_app_context, has_request_context, g
+
+from services.mongo_registry import mongo_registry
+
+logger = logging.getLogger(__name__)
+
+# Version value used while a user has never been invalidated (or their marker expired)
+INITIAL_VERSION = "0"
+
+
+class MemoryCacheBackend:
+    """In-process backend - shared by every app in the process, for tests and single-worker dev"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[str, Tuple[str, datetime]] = {}
+
+    def lookup(self, key: str, user_id: str, now: datetime) -> Tuple[Optional[Dict[str, Any]], str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] <= now:
+                self._entries.pop(key, None)
+                entry = None
+            version, version_expires = self._versions.get(user_id, (INITIAL_VERSION, None))
+            if version_expires and version_expires <= now:
+                self._versions.pop(user_id, None)
+                version = INITIAL_VERSION
+            return entry, version
+
+    def store(self, key: str, user_id: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = {**entry, "user_id": user_id}
+
+    def invalidate(self, user_id: str, version: str, expires_at: datetime):
+        with self._lock:
+            self._versions[user_id] = (version, expires_at)
+            for key in [key for key, entry in self._entries.items() if entry["user_id"] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+class MongoCacheBackend:
+    """Shared backend: one dashboard_cache collection visible to every gunicorn worker.
+
+    Entries and per-user version markers expire through a TTL index on
+    expires_at; lookups also check expires_at since the TTL monitor only
+    runs once a minute.
+    """
+
+    @property
+    def collection(self):
+        return mongo_registry.get_db().dashboard_cache
+
+    def lookup(self, key: str, user_id: str, now: datetime) -> Tuple[Optional[Dict[str, Any]], str]:
+        # Entry and version marker in one round trip
+        entry, version = None, INITIAL_VERSION
+        for document in self.collection.find({"_id": {"$in": [key, _version_key(user_id)]},
+                                              "expires_at": {"$gt": now}}):
+            if document["_id"] == key:
+                entry = document
+            else:
+                version = document["version"]
+        return entry, version
+
+    def store(self, key: str, user_id: str, entry: Dict[str, Any]):
+        self.collection.replace_one({"_id": key}, {**entry, "_id": key, "user_id": user_id}, upsert=True)
+
+    def invalidate(self, user_id: str, version: str, expires_at: datetime):
+        self.collection.update_one(
+            {"_id": _version_key(user_id)},
+            {"$set": {"version": version, "user_id": user_id, "expires_at": expires_at}},
+            upsert=True
+        )
+        self.collection.delete_many({"user_id": user_id, "_id": {"$ne": _version_key(user_id)}})
+
+    def clear(self):
+        self.collection.delete_many({})
+
+
+def _version_key(user_id: str) -> str:
+    return f"version:{user_id}"
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag value (unquoted) for a response body"""
+    return hashlib.sha1(body).hexdigest()
+
+
+class ResponseCache:
+    """Per-user TTL cache for dashboard GET responses with ETag revalidation.
+
+    Every cached entry carries the user's cache version at the time the
+    response was computed. invalidate_user() moves the version on, so an
+    entry computed concurrently with a write is never served afterwards.
+    Views whose data is written outside this process can also pass a
+    fingerprint function returning (value, state): an entry is only served
+    while the user's fingerprint value still matches the one taken before
+    it was computed, and on a miss the view gets the state back through
+    fingerprint_state() instead of reading it again.
+    The TTL comes from DASHBOARD_CACHE_TIMEOUT (0 disables caching).
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0, "stores": 0, "invalidations": 0, "errors": 0}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            backend_name = os.getenv('DASHBOARD_CACHE_BACKEND', 'mongo')
+            self._backend = MemoryCacheBackend() if backend_name == 'memory' else MongoCacheBackend()
+        return self._backend
+
+    def use_backend(self, backend):
+        """Swap the backend (tests use MemoryCacheBackend)"""
+        self._backend = backend
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    @staticmethod
+    def timeout() -> int:
+        if has_app_context():
+            return int(current_app.config.get('DASHBOARD_CACHE_TIMEOUT', 0) or 0)
+        return int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 300))
+
+    def cached(self, name: str, user_resolver: Callable[[], Tuple[Optional[str], Any]],
+               fingerprint: Optional[Callable[[str], Any]] = None):
+        """Decorator for per-user GET views; only successful 200 responses are stored"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                timeout = self.timeout()
+                if request.method != 'GET' or timeout <= 0:
+                    return view(*args, **kwargs)
+                user_id, _ = user_resolver()
+                if not user_id:
+                    return view(*args, **kwargs)
+
+                key = f"{name}:{user_id}:{request.query_string.decode()}"
+                marker = None
+                if fingerprint:
+                    # First: bringing the state up to date may invalidate the user's entries
+                    value, g.response_cache_state = fingerprint(user_id)
+                    marker = _fingerprint(value)
+                now = datetime.utcnow()
+                entry, version = self._lookup(key, user_id, now)
+                if version is None:
+                    # Cache backend unavailable - serve uncached
+                    return view(*args, **kwargs)
+                if entry is not None and entry.get("version") == version and entry.get("fingerprint") == marker:
+                    self._count("hits")
+                    return self._respond(entry["body"], entry["etag"], "HIT")
+
+                self._count("misses")
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                etag = make_etag(body)
+                if _success(body):
+                    self._store(key, user_id, {
+                        "body": body.decode(),
+                        "etag": etag,
+                        "version": version,
+                        "fingerprint": marker,
+                        "expires_at": now + timedelta(seconds=timeout)
+                    })
+                return self._respond(body, etag, "MISS", response)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def fingerprint_state(default: Callable[[], Any]) -> Any:
+        """State the fingerprint function returned for this request, or default() when it didn't run"""
+        if has_request_context() and 'response_cache_state' in g:
+            return g.response_cache_state
+        return default()
+
+    def _respond(self, body, etag: str, cache_status: str, response=None):
+        if request.if_none_match.contains(etag):
+            self._count("not_modified")
+            response = make_response('', 304)
+        elif response is None:
+            response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.headers['X-Cache'] = cache_status
+        return response
+
+    def _lookup(self, key: str, user_id: str, now: datetime):
+        try:
+            return self.backend.lookup(key, user_id, now)
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"⚠️ Dashboard cache lookup failed: {e}")
+            return None, None
+
+    def _store(self, key: str, user_id: str, entry: Dict[str, Any]):
+        try:
+            self.backend.store(key, user_id, entry)
+            self._count("stores")
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"⚠️ Dashboard cache store failed: {e}")
+
+    def invalidate_user(self, user_id: str):
+        """Drop a user's cached responses after they write activity or profile data"""
+        if not user_id:
+            return
+        # Version markers outlive any entry computed before them
+        expires_at = datetime.utcnow() + timedelta(seconds=max(self.timeout(), 60) * 2)
+        try:
+            self.backend.invalidate(user_id, uuid.uuid4().hex, expires_at)
+            self._count("invalidations")
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"⚠️ Dashboard cache invalidation failed for {user_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this worker, for health endpoints"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+
+def _fingerprint(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _success(body: bytes) -> bool:
+    try:
+        return json.loads(body).get("success") is True
+    except (ValueError, AttributeError):
+        return False
+
+
+# Create global instance
+response_cache = ResponseCache()
@@ -0,0 +1,260 @@
+import os
+import re
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+import numpy as np
+from pymongo import ReturnDocument
+
+from services.mongo_registry import mongo_registry
+
+logger = logging.getLogger(__name__)
+
+TAXONOMY_ID = "current"
+MAX_MEMO_ENTRIES = 50_000
+
+# Skills in priority order: a topic counts towards the first skill with a
+# keyword that occurs anywhere in it (substring match, case-insensitive).
+DEFAULT_TAXONOMY = {
+    "skills": [
+        {"name": "Frontend", "keywords": ["react", "frontend", "css", "html", "javascript"],
+         "languages": ["javascript", "typescript"]},
+        {"name": "Backend", "keywords": ["backend", "api", "server", "node", "python"],
+         "languages": ["python", "java"]},
+        {"name": "Blockchain", "keywords": ["blockchain", "web3", "smart", "solidity"],
+         "languages": ["solidity"]},
+        {"name": "AI/ML", "keywords": ["ai", "ml", "machine", "learning"], "languages": []},
+        {"name": "DevOps", "keywords": ["devops", "docker", "deploy"], "languages": []},
+    ],
+    # Skill points per XP point of a completed course / a coding submission
+    "weights": {"course": 0.1, "coding": 0.05},
+}
+
+
+def validate_taxonomy(definition: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalized copy of a taxonomy definition; ValueError describing the first problem"""
+    if not isinstance(definition, dict) or not isinstance(definition.get("skills"), list) or not definition["skills"]:
+        raise ValueError("Taxonomy needs a non-empty 'skills' list")
+    skills, names, languages = [], set(), {}
+    for skill in definition["skills"]:
+        name = skill.get("name") if isinstance(skill, dict) else None
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("Every skill needs a name")
+        if '.' in name or name.startswith('$'):
+            raise ValueError(f"Skill '{name}': names are rollup field names and can't contain '.' or start with '$'")
+        if name in names:
+            raise ValueError(f"Duplicate skill '{name}'")
+        names.add(name)
+        keywords, skill_languages = skill.get("keywords", []), skill.get("languages", [])
+        for field, values in (("keywords", keywords), ("languages", skill_languages)):
+            if not isinstance(values, list) or not all(isinstance(v, str) and v.strip() for v in values):
+                raise ValueError(f"Skill '{name}': '{field}' must be a list of non-empty strings")
+        for language in skill_languages:
+            language = language.strip().lower()
+            if languages.get(language, name) != name:
+                raise ValueError(f"Language '{language}' is mapped to both '{languages[language]}' and '{name}'")
+            languages[language] = name
+        skills.append({
+            "name": name,
+            "keywords": [keyword.strip().lower() for keyword in keywords],
+            "languages": [language.strip().lower() for language in skill_languages]
+        })
+    weights = {**DEFAULT_TAXONOMY["weights"], **(definition.get("weights") or {})}
+    if not all(isinstance(weights[key], (int, float)) for key in ("course", "coding")):
+        raise ValueError("Weights must be numbers")
+    return {"skills": skills, "weights": {"course": weights["course"], "coding": weights["coding"]}}
+
+
+class CompiledTaxonomy:
+    """One taxonomy compiled for matching: a single multi-keyword pattern plus memo tables.
+
+    The pattern is a lookahead alternation, so one scan reports every keyword
+    at every position (overlaps included). Alternatives are ordered by skill
+    priority, so the lowest skill index seen is exactly the first skill whose
+    keyword list the old nested substring loop would have matched.
+    """
+
+    def __init__(self, definition: Dict[str, Any], version: int = 0):
+        self.definition = validate_taxonomy(definition)
+        self.version = version
+        self.skills: List[str] = [skill["name"] for skill in self.definition["skills"]]
+        self.skill_index = {name: index for index, name in enumerate(self.skills)}
+        self.course_weight = self.definition["weights"]["course"]
+        self.coding_weight = self.definition["weights"]["coding"]
+
+        self._keyword_skill: Dict[str, int] = {}
+        self._language_skill: Dict[str, str] = {}
+        for index, skill in enumerate(self.definition["skills"]):
+            for keyword in skill["keywords"]:
+                self._keyword_skill.setdefault(keyword, index)
+            for language in skill["languages"]:
+                self._language_skill[language] = skill["name"]
+        ordered = sorted(self._keyword_skill, key=lambda keyword: (self._keyword_skill[keyword], -len(keyword)))
+        self._pattern = re.compile("(?=(" + "|".join(map(re.escape, ordered)) + "))") if ordered else None
+        self._topic_memo: Dict[str, Optional[int]] = {}
+
+    def topic_skill_index(self, topic: str) -> Optional[int]:
+        """Index (into self.skills) of the skill a topic counts towards, memoized per topic"""
+        key = (topic or '').lower()
+        try:
+            return self._topic_memo[key]
+        except KeyError:
+            pass
+        best = None
+        if self._pattern is not None:
+            for match in self._pattern.finditer(key):
+                index = self._keyword_skill[match.group(1)]
+                if best is None or index < best:
+                    best = index
+                    if best == 0:
+                        break
+        if len(self._topic_memo) >= MAX_MEMO_ENTRIES:
+            self._topic_memo.clear()
+        self._topic_memo[key] = best
+        return best
+
+    def classify_topic(self, topic: str) -> Optional[str]:
+        """Skill bucket a course topic counts towards"""
+        index = self.topic_skill_index(topic)
+        return self.skills[index] if index is not None else None
+
+    def classify_language(self, language: str) -> Optional[str]:
+        """Skill bucket a submission language counts towards"""
+        return self._language_skill.get((language or '').lower())
+
+    # ------------------------------------------------------------------
+    # Batch scoring
+    # ------------------------------------------------------------------
+
+    def skill_matrix(self, courses: Iterable[Dict[str, Any]],
+                     submissions: Iterable[Dict[str, Any]]) -> Tuple[List[str], np.ndarray]:
+        """Raw skill points for every user at once: (user_ids, users x skills float array).
+
+        Same arithmetic as the per-user rollup deltas; completed courses only.
+        """
+        user_index: Dict[str, int] = {}
+        rows, columns, values = [], [], []
+        for course in courses:
+            if not course.get('completed', False):
+                continue
+            index = self.topic_skill_index(course.get('topic', ''))
+            if index is not None:
+                rows.append(user_index.setdefault(course['user_id'], len(user_index)))
+                columns.append(index)
+                values.append((course.get('points', 0) or 0) * self.course_weight)
+        for submission in submissions:
+            skill = self.classify_language(submission.get('language', ''))
+            if skill is not None:
+                rows.append(user_index.setdefault(submission['user_id'], len(user_index)))
+                columns.append(self.skill_index[skill])
+                values.append((submission.get('points_earned', 0) or 0) * self.coding_weight)
+
+        matrix = np.zeros((len(user_index), len(self.skills)), dtype=np.float64)
+        if values:
+            np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)),
+                      np.asarray(values, dtype=np.float64))
+        return list(user_index), matrix
+
+    def matrix_from_rollups(self, user_stats: Iterable[Dict[str, Any]]) -> Tuple[List[str], np.ndarray]:
+        """Stored rollup.skills_raw for many users as a users x skills array"""
+        user_ids, rows = [], []
+        for document in user_stats:
+            skills_raw = document.get('rollup', {}).get('skills_raw', {})
+            user_ids.append(document['user_id'])
+            rows.append([skills_raw.get(skill, 0) for skill in self.skills])
+        return user_ids, np.asarray(rows, dtype=np.float64).reshape(len(rows), len(self.skills))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "skills": len(self.skills),
+            "keywords": len(self._keyword_skill),
+            "memoized_topics": len(self._topic_memo)
+        }
+
+
+def skill_levels(raw: np.ndarray) -> np.ndarray:
+    """0-100 levels per row, each row scaled by its own strongest skill (as the dashboard shows them)"""
+    raw = np.atleast_2d(np.asarray(raw, dtype=np.float64))
+    top = raw.max(axis=1, initial=0.0, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        levels = np.minimum(100, np.trunc(raw / top * 100))
+    return np.where(top > 0, levels, 0).astype(np.int64)
+
+
+class SkillTaxonomy:
+    """The active taxonomy for this process, hot-reloaded from MongoDB.
+
+    Admins replace the taxonomy through save(); every worker compares the
+    stored version at most once per SKILL_TAXONOMY_CHECK_INTERVAL seconds and
+    recompiles when it moved, so no restart is needed. Without a stored
+    document the built-in DEFAULT_TAXONOMY is used.
+    """
+
+    def __init__(self):
+        self.check_interval = float(os.getenv('SKILL_TAXONOMY_CHECK_INTERVAL', 30))
+        self._lock = threading.Lock()
+        self._compiled = CompiledTaxonomy(DEFAULT_TAXONOMY)
+        self._last_check = 0.0
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+
+    @property
+    def collection(self):
+        return mongo_registry.get_db().skill_taxonomy
+
+    def current(self) -> CompiledTaxonomy:
+        """Compiled taxonomy, picking up a newer stored version when the check interval has passed"""
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self.reload()
+        return self._compiled
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompile from the stored definition if its version changed; True if it did"""
+        with self._lock:
+            self._last_check = time.monotonic()
+            try:
+                header = self.collection.find_one({"_id": TAXONOMY_ID}, {"version": 1})
+                version = (header or {}).get("version", 0)
+                if version == self._compiled.version and not force:
+                    return False
+                stored = self.collection.find_one({"_id": TAXONOMY_ID}) if header else None
+                self._compiled = CompiledTaxonomy(stored["definition"] if stored else DEFAULT_TAXONOMY,
+                                                  stored["version"] if stored else 0)
+                logger.info(f"✅ Skill taxonomy v{self._compiled.version} loaded "
+                            f"({len(self._compiled.skills)} skills)")
+                return True
+            except Exception as e:
+                logger.warning(f"⚠️ Skill taxonomy reload failed, keeping v{self._compiled.version}: {e}")
+                return False
+
+    def save(self, definition: Dict[str, Any], updated_by: Optional[str] = None) -> CompiledTaxonomy:
+        """Validate, store and activate a new taxonomy (other workers follow within the check interval)"""
+        normalized = validate_taxonomy(definition)
+        stored = self.collection.find_one_and_update(
+            {"_id": TAXONOMY_ID},
+            {"$set": {"definition": normalized, "updated_at": datetime.utcnow(), "updated_by": updated_by},
+             "$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        compiled = CompiledTaxonomy(stored["definition"], stored["version"])
+        with self._lock:
+            self._compiled = compiled
+            self._last_check = time.monotonic()
+        return compiled
+
+    def stats(self) -> Dict[str, Any]:
+        return self._compiled.stats()
+
+
+# Create global instance
+skill_taxonomy = SkillTaxonomy()
@@ -0,0 +1,125 @@
+import logging
+from datetime import datetime, date, timedelta
+from typing import Dict, Iterable, List, Optional, Any
+
+from services.activity_buckets import local_day, default_timezone, resolve_timezone
+
+logger = logging.getLogger(__name__)
+
+# Streak state lives on user_stats:
+#   current_streak   consecutive local days with a submission, ending on last_active_day
+#   longest_streak   best current_streak ever reached
+#   last_active_day  YYYY-MM-DD of the latest submission in the user's timezone
+#   timezone         IANA name (optional; ACTIVITY_DEFAULT_TIMEZONE otherwise)
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Submission time from a datetime or an ISO string (both are stored)"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def submission_day(submission: Dict[str, Any], tz) -> Optional[str]:
+    return local_day(parse_timestamp(submission.get('submitted_at')), tz)
+
+
+def _previous_day(day: str) -> str:
+    return (date.fromisoformat(day) - timedelta(days=1)).isoformat()
+
+
+def streak_update(day: str) -> List[Dict[str, Any]]:
+    """Update pipeline advancing the streak for a submission on `day` - O(1), atomic.
+
+    Same day: unchanged. Day after last_active_day: +1. A later gap: restart
+    at 1. An older (backdated) day never moves the streak.
+    """
+    return [
+        {"$set": {"current_streak": {"$switch": {
+            "branches": [
+                {"case": {"$eq": ["$last_active_day", day]},
+                 "then": {"$max": [{"$ifNull": ["$current_streak", 0]}, 1]}},
+                {"case": {"$eq": ["$last_active_day", _previous_day(day)]},
+                 "then": {"$add": [{"$ifNull": ["$current_streak", 0]}, 1]}},
+                {"case": {"$gt": ["$last_active_day", day]},
+                 "then": {"$ifNull": ["$current_streak", 0]}},
+            ],
+            "default": 1
+        }}}},
+        {"$set": {
+            "longest_streak": {"$max": [{"$ifNull": ["$longest_streak", 0]}, "$current_streak"]},
+            "last_active_day": {"$max": ["$last_active_day", day]}
+        }},
+    ]
+
+
+def streak_state_from_days(days: Iterable[str]) -> Dict[str, Any]:
+    """Streak fields recomputed from every active day (rebuilds and checks)"""
+    ordered = sorted(set(days))
+    if not ordered:
+        return {"current_streak": 0, "longest_streak": 0, "last_active_day": None}
+    longest = run = 1
+    for previous, day in zip(ordered, ordered[1:]):
+        run = run + 1 if _previous_day(day) == previous else 1
+        longest = max(longest, run)
+    return {"current_streak": run, "longest_streak": longest, "last_active_day": ordered[-1]}
+
+
+def effective_streak(user_stats: Dict[str, Any], today: date) -> int:
+    """Current streak as of today: still alive if the last submission was today or yesterday"""
+    last_active_day = user_stats.get('last_active_day')
+    if last_active_day and last_active_day >= (today - timedelta(days=1)).isoformat():
+        return user_stats.get('current_streak', 0) or 0
+    return 0
+
+
+def decay_filter() -> Dict[str, Any]:
+    """user_stats whose streak broke: last_active_day before yesterday in their own timezone"""
+    yesterday = {"$dateToString": {
+        "format": "%Y-%m-%d",
+        "date": {"$subtract": ["$$NOW", 24 * 60 * 60 * 1000]},
+        "timezone": {"$ifNull": ["$timezone", default_timezone()]}
+    }}
+    return {
+        "current_streak": {"$gt": 0},
+        "$expr": {"$lt": ["$last_active_day", yesterday]}
+    }
+
+
+def advance_streaks(db, since: datetime) -> int:
+    """Apply streak_update for every user_submissions day stored since `since`.
+
+    Submissions are written straight into user_submissions by other
+    services, so this runs before the decay to keep stored streaks (and the
+    leaderboard) moving for users who never open their dashboard. Re-applying
+    a day is a no-op, so overlapping windows are safe.
+    """
+    days_by_user: Dict[str, set] = {}
+    for submission in db.user_submissions.find({"submitted_at": {"$gte": since}},
+                                               {"_id": 0, "user_id": 1, "submitted_at": 1}):
+        if submission.get('user_id'):
+            days_by_user.setdefault(submission['user_id'], set()).add(submission['submitted_at'])
+    if not days_by_user:
+        return 0
+    timezones = {
+        stats['user_id']: stats.get('timezone')
+        for stats in db.user_stats.find({"user_id": {"$in": list(days_by_user)}}, {"_id": 0, "user_id": 1, "timezone": 1})
+    }
+    for user_id, timestamps in days_by_user.items():
+        tz = resolve_timezone(timezones.get(user_id))
+        for day in sorted(filter(None, (local_day(parse_timestamp(when), tz) for when in timestamps))):
+            db.user_stats.update_one({"user_id": user_id}, streak_update(day), upsert=True)
+    logger.info(f"✅ Advanced streaks for {len(days_by_user)} users")
+    return len(days_by_user)
+
+
+def decay_streaks(db) -> int:
+    """Reset broken streaks across the whole collection in one update_many"""
+    result = db.user_stats.update_many(decay_filter(), {"$set": {"current_streak": 0}})
+    logger.info(f"✅ Decayed {result.modified_count} streaks")
+    return result.modified_count
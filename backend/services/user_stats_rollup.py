@@ -0,0 +1,585 @@
+import os
+import logging
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+
+from pymongo import ReturnDocument
+
+from services.mongo_registry import mongo_registry
+from services.activity_buckets import activity_buckets, resolve_timezone, ACTIVITY_BUCKETS_VERSION, ACTIVITY_SOURCES
+from services.response_cache import response_cache
+from services.rank_index import xp_rank_index
+from services.leaderboard_snapshot import leaderboard_snapshot
+from services.activity_feed import (
+    activity_feed, ACTIVITY_FEED_VERSION, ACTIVITY_SOURCES as FEED_SOURCES, SOURCE_PROJECTION as FEED_SOURCE_PROJECTION
+)
+from services.skill_taxonomy import skill_taxonomy
+from services.streaks import streak_state_from_days, streak_update, effective_streak, submission_day
+from models.dashboard_models import (
+    COURSE_PROGRESS_PROJECTION, QUIZ_RESULT_PROJECTION, SUBMISSION_PROJECTION, ACHIEVEMENT_PROJECTION
+)
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_VERSION = 3
+RECENT_ACHIEVEMENTS = 5
+
+# Source collection -> timestamp field. Activity lands in these collections
+# from outside this service; the rollup stores a per-source cursor (newest
+# timestamp folded in, the _ids stamped exactly then, and for courses the
+# _ids still in progress) so reads fold in only what arrived after it.
+WATERMARK_SOURCES = {
+    "user_courses": "completed_at",
+    "user_quizzes": "completed_at",
+    "user_submissions": "submitted_at",
+    "user_achievements": "earned_at",
+}
+
+
+def sync_interval() -> int:
+    """Seconds a stats document is trusted before its sources are checked again (STATS_SYNC_INTERVAL)"""
+    return int(os.getenv('STATS_SYNC_INTERVAL', 30))
+
+
+def cache_marker(user_stats: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """What a cached dashboard response depends on in the stats document"""
+    if user_stats is None:
+        return None
+    return {
+        "activity_version": user_stats.get('activity_version', 0),
+        "rollup_version": user_stats.get('rollup', {}).get('version', 0),
+        "activity_buckets_version": user_stats.get('activity_buckets_version', 0),
+        "activity_feed_version": user_stats.get('activity_feed_version', 0),
+        "timezone": user_stats.get('timezone'),
+    }
+
+
+def _topic_key(topic: str) -> str:
+    # Field names can't contain '.' or start with '$'
+    return topic.replace('.', '．').replace('$', '＄')
+
+
+def _topic_name(key: str) -> str:
+    return key.replace('．', '.').replace('＄', '$')
+
+
+# ===================================================================
+# Deltas: how one source document changes the rollup
+# ===================================================================
+
+def course_delta(course: Dict[str, Any]) -> Dict[str, Any]:
+    delta = {"$inc": {"rollup.courses_total": 1}}
+    completed = course.get('completed', False)
+    points = course.get('points', 0) or 0
+    topic = course.get('topic', 'General')
+    if completed:
+        delta["$inc"]["rollup.courses_completed"] = 1
+        delta["$inc"]["rollup.xp.courses"] = points
+        taxonomy = skill_taxonomy.current()
+        skill = taxonomy.classify_topic(topic)
+        if skill:
+            delta["$inc"][f"rollup.skills_raw.{skill}"] = points * taxonomy.course_weight
+    if topic and topic != 'General':
+        delta["$inc"][f"rollup.topics.{_topic_key(topic)}"] = 2 if completed else 1
+    return delta
+
+
+def course_completion_delta(course: Dict[str, Any], previous: Dict[str, Any]) -> Dict[str, Any]:
+    """Delta for an existing course document flipping from in-progress to completed"""
+    before, after = course_delta(previous)["$inc"], course_delta(course)["$inc"]
+    changed = {key: after.get(key, 0) - before.get(key, 0) for key in set(before) | set(after)}
+    return {"$inc": {key: value for key, value in changed.items() if value}}
+
+
+def quiz_delta(quiz: Dict[str, Any]) -> Dict[str, Any]:
+    delta = {"$inc": {"rollup.quizzes_total": 1, "rollup.xp.quizzes": quiz.get('points', 0) or 0}}
+    if quiz.get('score') is not None:
+        delta["$inc"]["rollup.quiz_score_sum"] = quiz['score']
+        delta["$inc"]["rollup.quiz_scored_count"] = 1
+    topic = quiz.get('topic', 'General')
+    if topic and topic != 'General':
+        delta["$inc"][f"rollup.topics.{_topic_key(topic)}"] = 1
+    return delta
+
+
+def submission_delta(submission: Dict[str, Any]) -> Dict[str, Any]:
+    points = submission.get('points_earned', 0) or 0
+    delta = {"$inc": {"rollup.submissions_total": 1, "rollup.xp.coding": points}}
+    taxonomy = skill_taxonomy.current()
+    skill = taxonomy.classify_language(submission.get('language', ''))
+    if skill:
+        delta["$inc"][f"rollup.skills_raw.{skill}"] = points * taxonomy.coding_weight
+    return delta
+
+
+def achievement_delta(achievement: Dict[str, Any]) -> Dict[str, Any]:
+    delta = {"$inc": {"rollup.achievements_total": 1, "rollup.xp.achievements": achievement.get('points', 0) or 0}}
+    if achievement.get('type') == 'certificate':
+        delta["$inc"]["rollup.certificates"] = 1
+    if achievement.get('blockchain_verified', False):
+        delta["$inc"]["rollup.verified_achievements"] = 1
+    earned_at = achievement.get('earned_at')
+    delta["$push"] = {"rollup.recent_achievements": {
+        "$each": [{
+            "id": str(achievement.get('_id', '')),
+            "title": achievement.get('title', ''),
+            "description": achievement.get('description', ''),
+            "earned_at": earned_at.isoformat() if isinstance(earned_at, datetime) else earned_at,
+            "points": achievement.get('points', 0),
+            "rarity": achievement.get('rarity', 'common')
+        }],
+        "$slice": -RECENT_ACHIEVEMENTS
+    }}
+    return delta
+
+
+def _xp_total(delta: Dict[str, Any]) -> int:
+    return sum(value for key, value in delta.get("$inc", {}).items() if key.startswith("rollup.xp."))
+
+
+# Source collection -> (projection, delta) for folding; display fields only, never submitted code
+SOURCE_DELTAS = {
+    "user_courses": ({**COURSE_PROGRESS_PROJECTION, "_id": 1}, course_delta),
+    "user_quizzes": ({**QUIZ_RESULT_PROJECTION, "_id": 1}, quiz_delta),
+    "user_submissions": ({**SUBMISSION_PROJECTION, "_id": 1}, submission_delta),
+    "user_achievements": (ACHIEVEMENT_PROJECTION, achievement_delta),
+}
+
+
+def _merge(combined: Dict[str, Any], delta: Dict[str, Any]):
+    """Add one delta into a combined update (several source documents, one write)"""
+    for path, amount in delta.get("$inc", {}).items():
+        increments = combined.setdefault("$inc", {})
+        increments[path] = increments.get(path, 0) + amount
+    for path, spec in delta.get("$push", {}).items():
+        pushes = combined.setdefault("$push", {})
+        if path in pushes:
+            pushes[path]["$each"] = pushes[path]["$each"] + spec["$each"]
+        else:
+            pushes[path] = dict(spec)
+
+
+def _empty_mark(collection: str) -> Dict[str, Any]:
+    mark = {"latest": None, "at_latest": []}
+    if collection == "user_courses":
+        mark["open"] = []
+    return mark
+
+
+def _advance(mark: Dict[str, Any], document: Dict[str, Any], field: str):
+    """Move a source cursor past a document that has just been folded in"""
+    when = document.get(field)
+    if not isinstance(when, datetime):
+        if "open" in mark and when is None and document["_id"] not in mark["open"]:
+            mark["open"].append(document["_id"])
+        return
+    if "open" in mark and document["_id"] in mark["open"]:
+        mark["open"].remove(document["_id"])
+    if mark["latest"] is None or when > mark["latest"]:
+        mark["latest"], mark["at_latest"] = when, [document["_id"]]
+    elif when == mark["latest"] and document["_id"] not in mark["at_latest"]:
+        mark["at_latest"].append(document["_id"])
+
+
+def _timestamp_order(field: str):
+    return lambda document: (isinstance(document.get(field), datetime), document.get(field) or datetime.min)
+
+
+# ===================================================================
+# Reading: rollup -> the comprehensive-stats payload
+# ===================================================================
+
+def stats_from_rollup(user_stats: Dict[str, Any], wallet_address: Optional[str], current_time: datetime,
+                      global_rank: int = 0, blockchain_data: Optional[Dict[str, Any]] = None,
+                      activity: Optional[Dict[str, Any]] = None, today: Optional[date] = None) -> Dict[str, Any]:
+    """Comprehensive stats computed from the rollup, the streak state and the activity bucket summary"""
+    rollup = user_stats.get('rollup', {})
+    xp = rollup.get('xp', {})
+    activity = activity or {}
+    courses_total = rollup.get('courses_total', 0)
+    courses_completed = rollup.get('courses_completed', 0)
+    quizzes_total = rollup.get('quizzes_total', 0)
+    submissions_total = rollup.get('submissions_total', 0)
+
+    coding_streak = effective_streak(user_stats, today or current_time.date())
+    longest_streak = user_stats.get('longest_streak', 0) or 0
+
+    skills_raw = {skill: rollup.get('skills_raw', {}).get(skill, 0) for skill in skill_taxonomy.current().skills}
+    max_skill = max(skills_raw.values()) if any(skills_raw.values()) else 1
+    skill_levels = {
+        skill: min(100, int((value / max_skill) * 100)) if max_skill > 0 else 0
+        for skill, value in skills_raw.items()
+    }
+
+    topics = sorted(rollup.get('topics', {}).items(), key=lambda x: x[1], reverse=True)
+    favorite_topics = [_topic_name(topic) for topic, count in topics[:3] if count > 0]
+
+    quiz_scored = rollup.get('quiz_scored_count', 0)
+
+    return {
+        "total_xp": sum(xp.get(source, 0) for source in ('courses', 'quizzes', 'coding', 'achievements')),
+        "courses_completed": courses_completed,
+        "coding_problems_solved": submissions_total,
+        "quiz_accuracy": rollup.get('quiz_score_sum', 0) / quiz_scored if quiz_scored else 0,
+        "coding_streak": coding_streak,
+        "longest_streak": max(longest_streak, coding_streak),
+        "total_courses": courses_total,
+        "total_quizzes": quizzes_total,
+        "global_rank": global_rank,
+        "weekly_activity": activity.get('weekly_activity', [0] * 7),
+        "monthly_goals": {
+            "target": user_stats.get('monthly_target', 0),
+            "completed": activity.get('monthly_completed', 0)
+        },
+        "blockchain": {
+            "wallet_connected": True,
+            "wallet_address": wallet_address,
+            "total_earned": blockchain_data.get('total_earned', 0) if blockchain_data else 0,
+            "transactions": len(blockchain_data.get('transactions', [])) if blockchain_data else 0,
+            "certificates": rollup.get('certificates', 0),
+            "verified_achievements": rollup.get('verified_achievements', 0)
+        },
+        "learning_analytics": {
+            "time_spent_hours": int(courses_completed * 2 + quizzes_total * 0.5 + submissions_total * 1),
+            "average_session_minutes": user_stats.get('avg_session_minutes', 0),
+            "completion_rate": (courses_completed / courses_total * 100) if courses_total else 0,
+            "favorite_topics": favorite_topics,
+            "skill_levels": skill_levels
+        },
+        "recent_achievements": rollup.get('recent_achievements', [])
+    }
+
+
+def rollup_counts(user_stats: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    rollup = (user_stats or {}).get('rollup', {})
+    return {
+        "courses": rollup.get('courses_total', 0),
+        "quizzes": rollup.get('quizzes_total', 0),
+        "coding_submissions": rollup.get('submissions_total', 0),
+        "achievements": rollup.get('achievements_total', 0)
+    }
+
+
+# ===================================================================
+# Writing: source document + rollup update per event
+# ===================================================================
+
+class UserStatsRollup:
+    """Keeps user_stats.rollup in step with the four activity collections.
+
+    Activity lands in the source collections (through the record_* methods
+    or straight from other services). refresh_if_stale() folds in only the
+    documents stamped after the per-source cursor stored with the rollup -
+    a few bounded (user_id, timestamp) index reads and one update - so the
+    dashboard reads a handful of small documents instead of every activity.
+    The same new documents advance the streak and the daily activity buckets
+    and are appended to the activity feed.
+    rebuild_user() refolds everything; it is for the backfill script and
+    rollup format changes.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else mongo_registry.get_db()
+
+    def _refresh(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.refresh_if_stale(user_id, self.db.user_stats.find_one({"user_id": user_id}))
+
+    def record_course(self, user_id: str, course: Dict[str, Any]):
+        course = {**course, "user_id": user_id}
+        self.db.user_courses.insert_one(course)
+        self._refresh(user_id)
+        return course
+
+    def complete_course(self, user_id: str, course_id: str, points: Optional[int] = None,
+                        completed_at: Optional[datetime] = None) -> bool:
+        """Mark an enrolled course completed; only the first completion changes the rollup"""
+        changes = {"completed": True, "completed_at": completed_at or datetime.now()}
+        if points is not None:
+            changes["points"] = points
+        previous = self.db.user_courses.find_one_and_update(
+            {"user_id": user_id, "course_id": course_id, "completed": {"$ne": True}},
+            {"$set": changes}
+        )
+        if previous is None:
+            return False
+        self._refresh(user_id)
+        return True
+
+    def record_quiz(self, user_id: str, quiz: Dict[str, Any]):
+        quiz = {**quiz, "user_id": user_id}
+        self.db.user_quizzes.insert_one(quiz)
+        self._refresh(user_id)
+        return quiz
+
+    def record_submission(self, user_id: str, submission: Dict[str, Any]):
+        submission = {**submission, "user_id": user_id}
+        self.db.user_submissions.insert_one(submission)
+        self._refresh(user_id)
+        return submission
+
+    def _timezone(self, user_id: str) -> Optional[str]:
+        stored = self.db.user_stats.find_one({"user_id": user_id}, {"_id": 0, "timezone": 1})
+        return (stored or {}).get('timezone')
+
+    def record_achievement(self, user_id: str, achievement: Dict[str, Any]):
+        achievement = {**achievement, "user_id": user_id}
+        self.db.user_achievements.insert_one(achievement)
+        self._refresh(user_id)
+        return achievement
+
+    # ------------------------------------------------------------------
+    # Rebuild
+    # ------------------------------------------------------------------
+
+    def compute_rollup(self, user_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Fold every source document for a user through the same deltas; returns the rollup and its cursor"""
+        rollup: Dict[str, Any] = {"version": ROLLUP_VERSION}
+        cursor = {}
+        for collection, field in WATERMARK_SOURCES.items():
+            projection, delta_fn = SOURCE_DELTAS[collection]
+            mark = cursor[collection] = _empty_mark(collection)
+            documents = sorted(self.db[collection].find({"user_id": user_id}, projection), key=_timestamp_order(field))
+            for document in documents:
+                _fold(rollup, delta_fn(document))
+                _advance(mark, document, field)
+        return rollup, cursor
+
+    def rebuild_user(self, user_id: str) -> Dict[str, Any]:
+        """Recompute one user's rollup from the source collections and store it.
+
+        A user with no activity and no stats document gets the computed
+        (empty) rollup back without a document being created for them.
+        """
+        rollup, cursor = self.compute_rollup(user_id)
+        rollup["updated_at"] = datetime.now()
+        total_xp = sum(rollup.get('xp', {}).values())
+        streak = self.compute_streak(user_id, self._timezone(user_id))
+        has_activity = any(rollup.get(key) for key in
+                           ('courses_total', 'quizzes_total', 'submissions_total', 'achievements_total'))
+        stored = self.db.user_stats.find_one_and_update(
+            {"user_id": user_id},
+            {"$set": {"rollup": rollup, "total_xp": total_xp, "source_cursor": cursor, **streak},
+             "$inc": {"activity_version": 1},
+             "$unset": {"source_watermark": ""}},
+            upsert=has_activity,
+            return_document=ReturnDocument.AFTER
+        )
+        xp_rank_index.set_score(user_id, total_xp)
+        leaderboard_snapshot.note_xp_change(user_id, total_xp)
+        response_cache.invalidate_user(user_id)
+        return stored if stored is not None else {"user_id": user_id, "total_xp": total_xp, "rollup": rollup, **streak}
+
+    # ------------------------------------------------------------------
+    # Sync with the source collections
+    # ------------------------------------------------------------------
+
+    def synced(self, user_id: str, user_stats: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """The user's stats document, with its sources checked at most every sync_interval() seconds.
+
+        Between checks this is a single document read (pass the document in
+        when it was already read). Activity written through the record_*
+        methods is folded in straight away; activity other services write
+        into the source collections shows up at the next check.
+        """
+        if user_stats is None:
+            user_stats = self.db.user_stats.find_one({"user_id": user_id})
+        now = datetime.now()
+        if user_stats is not None and not _versions_behind(user_stats):
+            checked_at = user_stats.get('source_checked_at')
+            if isinstance(checked_at, datetime) and now - checked_at < timedelta(seconds=sync_interval()):
+                return user_stats
+        user_stats = self.refresh_if_stale(user_id, user_stats)
+        if user_stats is None:
+            return None
+        self.db.user_stats.update_one({"user_id": user_id}, {"$set": {"source_checked_at": now}})
+        return {**user_stats, "source_checked_at": now}
+
+    def cache_fingerprint(self, user_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """response_cache fingerprint: the stats version marker, and the synced document for the view"""
+        user_stats = self.synced(user_id)
+        return cache_marker(user_stats), user_stats
+
+    def new_documents(self, user_id: str, cursor: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """Source documents stamped at or after each cursor (minus those already folded), plus courses
+        started since; one bounded index range read per collection"""
+        found = {}
+        for collection, field in WATERMARK_SOURCES.items():
+            # The feed entries come from the same documents, so read their display fields too
+            projection = {**SOURCE_DELTAS[collection][0], **FEED_SOURCE_PROJECTION, "_id": 1}
+            mark = cursor.get(collection) or _empty_mark(collection)
+            query: Dict[str, Any] = {"user_id": user_id,
+                                     field: {"$gte": mark["latest"]} if mark.get("latest") else {"$type": "date"}}
+            if mark.get("at_latest"):
+                query["_id"] = {"$nin": mark["at_latest"]}
+            documents = list(self.db[collection].find(query, projection))
+            if "open" in mark:
+                documents += self.db[collection].find(
+                    {"user_id": user_id, field: None, "_id": {"$nin": mark["open"]}}, projection
+                )
+            if documents:
+                found[collection] = sorted(documents, key=_timestamp_order(field))
+        return found
+
+    def _fold_new(self, user_id: str, cursor: Dict[str, Any],
+                  found: Dict[str, List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Apply the new documents' deltas and the advanced cursor in one update.
+
+        Guarded by the cursor the documents were read against: when another
+        request folded them first, nothing is applied and None comes back.
+        """
+        combined: Dict[str, Any] = {}
+        advanced = {collection: {key: list(value) if isinstance(value, list) else value
+                                 for key, value in (cursor.get(collection) or _empty_mark(collection)).items()}
+                    for collection in WATERMARK_SOURCES}
+        for collection, documents in found.items():
+            field = WATERMARK_SOURCES[collection]
+            _, delta_fn = SOURCE_DELTAS[collection]
+            mark = advanced[collection]
+            for document in documents:
+                if "open" in mark and document["_id"] in mark["open"]:
+                    # Started earlier (already counted as in progress), completed since
+                    delta = course_completion_delta(document, {**document, "completed": False})
+                else:
+                    delta = delta_fn(document)
+                _merge(combined, delta)
+                _advance(mark, document, field)
+
+        update: Dict[str, Any] = {key: dict(value) for key, value in combined.items()}
+        xp = _xp_total(combined)
+        if xp:
+            update.setdefault("$inc", {})["total_xp"] = xp
+        update.setdefault("$inc", {})["activity_version"] = 1
+        update["$set"] = {"rollup.updated_at": datetime.now(), "source_cursor": advanced}
+        stored = self.db.user_stats.find_one_and_update(
+            {"user_id": user_id, "source_cursor": cursor}, update, return_document=ReturnDocument.AFTER
+        )
+        if stored is None:
+            return None
+        xp_rank_index.set_score(user_id, stored.get('total_xp', 0))
+        leaderboard_snapshot.note_xp_change(user_id, stored.get('total_xp', 0))
+        return stored
+
+    def refresh_if_stale(self, user_id: str, user_stats: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """The user's stats document with source activity newer than its cursor folded in.
+
+        user_stats may be a projection, but needs source_cursor and
+        rollup.version (plus the bucket/feed versions and timezone). Returns
+        None for a user with neither a stats document nor any activity.
+        """
+        cursor = (user_stats or {}).get('source_cursor')
+        if cursor is None or user_stats.get('rollup', {}).get('version', 0) < ROLLUP_VERSION:
+            # Rollup from before the cursor, or an old rollup format: one full fold
+            if user_stats is None and not any(self.db[collection].find_one({"user_id": user_id}, {"_id": 1})
+                                              for collection in WATERMARK_SOURCES):
+                return None
+            logger.info(f"🔄 Rebuilding the stats rollup for {user_id}")
+            user_stats = self.rebuild_user(user_id)
+            found = {}
+        else:
+            found = self.new_documents(user_id, cursor)
+            if found:
+                stored = self._fold_new(user_id, cursor, found)
+                if stored is None:
+                    # Another request folded the same documents
+                    return self.db.user_stats.find_one({"user_id": user_id})
+                user_stats = stored
+                if "user_submissions" in found:
+                    streak = self.advance_streak(user_id, found["user_submissions"], user_stats.get('timezone'))
+                    user_stats = {**user_stats, **streak}
+        if user_stats.get('activity_buckets_version', 0) < ACTIVITY_BUCKETS_VERSION:
+            activity_buckets.rebuild_user(user_id, user_stats.get('timezone'))
+            user_stats = {**user_stats, "activity_buckets_version": ACTIVITY_BUCKETS_VERSION}
+        elif found:
+            activity_buckets.record_many(user_id, (
+                (activity_type, document.get(field))
+                for activity_type, (collection, field) in ACTIVITY_SOURCES.items()
+                for document in found.get(collection, [])
+            ), user_stats.get('timezone'))
+        if user_stats.get('activity_feed_version', 0) < ACTIVITY_FEED_VERSION:
+            activity_feed.backfill_user(user_id)
+            user_stats = {**user_stats, "activity_feed_version": ACTIVITY_FEED_VERSION}
+        elif found:
+            # Deterministic feed _ids: a course completed since it was started replaces its entry
+            activity_feed.append_many(
+                (activity_type, document)
+                for activity_type, (collection, _, _) in FEED_SOURCES.items()
+                for document in found.get(collection, [])
+            )
+        if found:
+            # After the streak, buckets and feed, so nothing cached in between survives
+            response_cache.invalidate_user(user_id)
+        return user_stats
+
+    def compute_streak(self, user_id: str, tz_name: Optional[str] = None) -> Dict[str, Any]:
+        """Streak fields recomputed from every submission's local day"""
+        tz = resolve_timezone(tz_name)
+        submissions = self.db.user_submissions.find({"user_id": user_id}, {"_id": 0, "submitted_at": 1})
+        return streak_state_from_days(filter(None, (submission_day(s, tz) for s in submissions)))
+
+    def advance_streak(self, user_id: str, submissions: List[Dict[str, Any]],
+                       tz_name: Optional[str] = None) -> Dict[str, Any]:
+        """Move the stored streak forward by the local days of newly folded submissions"""
+        tz = resolve_timezone(tz_name)
+        streak: Dict[str, Any] = {}
+        for day in sorted(set(filter(None, (submission_day(s, tz) for s in submissions)))):
+            streak = self.db.user_stats.find_one_and_update(
+                {"user_id": user_id}, streak_update(day),
+                projection={"_id": 0, "current_streak": 1, "longest_streak": 1, "last_active_day": 1},
+                return_document=ReturnDocument.AFTER
+            ) or streak
+        if streak:
+            leaderboard_snapshot.note_profile_change(user_id)
+        return streak
+
+    def rebuild_streak(self, user_id: str, tz_name: Optional[str] = None) -> Dict[str, Any]:
+        """Recompute and store the streak fields (local days move when the timezone changes)"""
+        streak = self.compute_streak(user_id, tz_name)
+        self.db.user_stats.update_one({"user_id": user_id}, {"$set": streak})
+        leaderboard_snapshot.note_profile_change(user_id)
+        return streak
+
+    def active_user_ids(self):
+        """Every user id that has at least one activity document"""
+        user_ids = set()
+        for name in ('user_courses', 'user_quizzes', 'user_submissions', 'user_achievements'):
+            user_ids.update(self.db[name].distinct('user_id'))
+        return sorted(user_id for user_id in user_ids if user_id)
+
+
+def _versions_behind(user_stats: Dict[str, Any]) -> bool:
+    return (user_stats.get('source_cursor') is None
+            or user_stats.get('rollup', {}).get('version', 0) < ROLLUP_VERSION
+            or user_stats.get('activity_buckets_version', 0) < ACTIVITY_BUCKETS_VERSION
+            or user_stats.get('activity_feed_version', 0) < ACTIVITY_FEED_VERSION)
+
+
+def _fold(rollup: Dict[str, Any], delta: Dict[str, Any]):
+    """Apply an update delta to an in-memory rollup (mirrors the server-side operators)"""
+    for path, amount in delta.get("$inc", {}).items():
+        target, key = _walk_path(rollup, path)
+        target[key] = target.get(key, 0) + amount
+    for path, value in delta.get("$addToSet", {}).items():
+        target, key = _walk_path(rollup, path)
+        values = target.setdefault(key, [])
+        if value not in values:
+            values.append(value)
+    for path, spec in delta.get("$push", {}).items():
+        target, key = _walk_path(rollup, path)
+        values = target.setdefault(key, []) + spec["$each"]
+        target[key] = values[spec["$slice"]:] if "$slice" in spec else values
+
+
+def _walk_path(rollup: Dict[str, Any], path: str):
+    parts = path.split('.')[1:]  # strip the leading "rollup"
+    target = rollup
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    return target, parts[-1]
+
+
+# Create global instance
+user_stats_rollup = UserStatsRollup()
@@ -2,6 +2,7 @@
 import React, { useState, useEffect, useCallback, useRef } from 'react'
 import { useRouter, useParams } from 'next/navigation'
 import { Trophy, Clock, Users, Send, RefreshCw, Play, Code, Wallet, Shield, TestTube } from 'lucide-react'
+import { subscribeExamStream } from '@/lib/examStream'
 
 interface Participant {
   name: string
@@ -56,7 +57,6 @@ export default function EnhancedExamInterface() {
   const [timerInitialized, setTimerInitialized] = useState(false)
 
   // ✅ CRITICAL FIX: Use refs to prevent infinite loops
-  const intervalRef = useRef<NodeJS.Timeout | null>(null)
   const timerRef = useRef<NodeJS.Timeout | null>(null)
   const refreshTimeoutRefs = useRef<NodeJS.Timeout[]>([])
   const isInitializedRef = useRef(false)
@@ -159,30 +159,34 @@ export default function EnhancedExamInterface() {
     }
   }, [examCode, fetchProblem, fetchLeaderboard])
 
-  // ✅ FIXED: Separate effect for polling - controlled interval
+  // Live leaderboard stream (replaces polling): a snapshot, then deltas as they happen
   useEffect(() => {
     if (!examCode || !examSession) return
 
-    console.log('📡 Starting leaderboard polling...')
-    
-    // Clear any existing interval
-    if (intervalRef.current) {
-      clearInterval(intervalRef.current)
-    }
+    console.log('📡 Subscribing to live leaderboard...')
+    const studentName = examSession.student_name
 
-    // Set up polling interval - less aggressive
-    intervalRef.current = setInterval(() => {
-      fetchLeaderboard(examCode)
-    }, 5000) // ✅ REDUCED: Changed from 2000ms to 5000ms
+    const unsubscribe = subscribeExamStream(examCode, (board) => {
+      setLeaderboard(board.leaderboard as Participant[])
+      setWaitingParticipants(board.waiting_participants as Participant[])
+      setExamStats(board.stats)
 
-    return () => {
-      console.log('🛑 Cleaning up polling interval')
-      if (intervalRef.current) {
-        clearInterval(intervalRef.current)
-        intervalRef.current = null
+      if (board.exam_info?.status === 'active' && board.exam_info.end_time) {
+        const endTime = new Date(board.exam_info.end_time).getTime()
+        setTimeRemaining(Math.max(0, Math.floor((endTime - Date.now()) / 1000)))
+        setTimerInitialized(true)
+      }
+
+      if (studentName && board.leaderboard.some((p) => p.name.toLowerCase() === studentName.toLowerCase())) {
+        setHasSubmitted(true)
       }
+    })
+
+    return () => {
+      console.log('🛑 Closing live leaderboard stream')
+      unsubscribe()
     }
-  }, [examCode, examSession, fetchLeaderboard])
+  }, [examCode, examSession?.student_name])
 
   // ✅ FIXED: Timer effect - separate and controlled
   useEffect(() => {
@@ -306,8 +310,27 @@ export default function EnhancedExamInterface() {
         body: JSON.stringify(submissionData)
       })
 
-      const data = await response.json()
+      let data = await response.json()
       console.log('📦 Submit result:', data)
+
+      if (response.status === 429) {
+        alert(`⏳ Grading is busy. Please submit again in ${data.retry_after || response.headers.get('Retry-After') || 5} seconds.`)
+        return
+      }
+
+      // Grading is queued: poll the submission until it has a result
+      if (data.success && data.submission_id && !data.result) {
+        let pollSeconds = 1
+        while (data.success && !['done', 'failed'].includes(data.status)) {
+          await new Promise(resolve => setTimeout(resolve, pollSeconds * 1000))
+          const statusResponse = await fetch(`http://127.0.0.1:5000/api/exam/submission/${data.submission_id}`)
+          pollSeconds = Number(statusResponse.headers.get('Retry-After')) || 1
+          data = await statusResponse.json()
+        }
+        if (data.status === 'failed') {
+          data = { success: false, error: data.error || 'Grading failed' }
+        }
+      }
       
       if (data.success) {
         setHasSubmitted(true)
@@ -5,6 +5,7 @@ import {
   Users, Trophy, Clock, Play, Square, RefreshCw, Settings,
   Upload, Plus, UserMinus, AlertCircle, Timer, TestTube, Award
 } from 'lucide-react'
+import { subscribeExamStream } from '@/lib/examStream'
 
 /* ---------- Enhanced Models ---------- */
 interface TestCase {
@@ -231,11 +232,15 @@ export default function EnhancedHostPanel() {
 
   useEffect(() => {
     fetchExamInfo()
-    fetchLeaderboard()
     
-    // Poll leaderboard every 3 seconds for real-time updates
-    const interval = setInterval(fetchLeaderboard, 3000)
-    return () => clearInterval(interval)
+    // Live leaderboard: a snapshot, then joins / submissions / rank changes as they happen
+    return subscribeExamStream(examCode, (board) => {
+      setLeaderboardData({
+        leaderboard: board.leaderboard as Participant[],
+        waiting_participants: board.waiting_participants as Participant[],
+        stats: board.stats
+      })
+    })
   }, [examCode])
 
   /* ---------- Enhanced Question Upload ---------- */
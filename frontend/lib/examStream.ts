@@ -0,0 +1,173 @@
+const API_BASE_URL = process.env.NEXT_PUBLIC_BACKEND_URL || "http://127.0.0.1:5000"
+
+// Live exam leaderboard over Server-Sent Events (/api/exam/stream/<code>).
+// The stream opens with a snapshot and then sends deltas, which are applied
+// here. /api/exam/leaderboard is only polled, slowly, while the stream is down
+// or has been quiet for a while (a worker that can't see every event).
+
+const POLL_INTERVAL_MS = 30000
+const QUIET_STREAM_MS = 120000
+
+export interface LiveParticipant {
+  name: string
+  score: number
+  completed: boolean
+  rank?: number
+  joined_at?: string
+  submission_time?: string
+  submitted_at?: string
+  language?: string
+  passed_tests?: number
+  total_tests?: number
+  [key: string]: any
+}
+
+export interface LiveLeaderboard {
+  exam_info: any
+  leaderboard: LiveParticipant[]
+  waiting_participants: LiveParticipant[]
+  stats: {
+    total_participants: number
+    completed_submissions: number
+    waiting_submissions: number
+    average_score: number
+    highest_score: number
+  }
+}
+
+const EVENT_TYPES = [
+  "snapshot", "joined", "left", "submitted", "score_changed", "rank_changed", "exam_started", "exam_ended",
+]
+
+interface LiveState {
+  examInfo: any
+  participants: Map<string, LiveParticipant>
+}
+
+function applyEvent(state: LiveState, type: string, data: any) {
+  const key = (name: string) => name.toLowerCase()
+  switch (type) {
+    case "snapshot":
+      state.examInfo = data.exam_info || {}
+      state.participants = new Map()
+      for (const participant of [...(data.leaderboard || []), ...(data.waiting_participants || [])]) {
+        state.participants.set(key(participant.name), participant)
+      }
+      break
+    case "joined":
+      if (!state.participants.has(key(data.name))) {
+        state.participants.set(key(data.name), { name: data.name, score: 0, completed: false, joined_at: data.joined_at })
+      }
+      state.examInfo = { ...state.examInfo, participant_count: data.participants_count }
+      break
+    case "left":
+      state.participants.delete(key(data.name))
+      state.examInfo = { ...state.examInfo, participant_count: data.participants_count }
+      break
+    case "submitted": {
+      const participant = state.participants.get(key(data.name)) || { name: data.name, score: 0, completed: false }
+      state.participants.set(key(data.name), {
+        ...participant,
+        score: data.score,
+        completed: true,
+        language: data.language,
+        passed_tests: data.passed_tests,
+        total_tests: data.total_tests,
+        submission_time: data.submitted_at,
+        submitted_at: data.submitted_at,
+      })
+      break
+    }
+    case "score_changed": {
+      const participant = state.participants.get(key(data.name))
+      if (participant) state.participants.set(key(data.name), { ...participant, score: data.score })
+      break
+    }
+    case "exam_started":
+      state.examInfo = { ...state.examInfo, status: "active", start_time: data.start_time, end_time: data.end_time }
+      break
+    case "exam_ended":
+      state.examInfo = { ...state.examInfo, status: "completed", ended_at: data.ended_at }
+      break
+    // rank_changed needs no bookkeeping: ranks are re-derived from scores below
+  }
+}
+
+function buildLeaderboard(state: LiveState): LiveLeaderboard {
+  const participants = Array.from(state.participants.values())
+  const leaderboard = participants
+    .filter((p) => p.completed)
+    .sort((a, b) => (b.score || 0) - (a.score || 0) ||
+      new Date(a.submission_time || 0).getTime() - new Date(b.submission_time || 0).getTime())
+    .map((p, index) => ({ ...p, rank: index + 1 }))
+  const waiting = participants.filter((p) => !p.completed)
+  const scores = leaderboard.map((p) => p.score || 0)
+  return {
+    exam_info: state.examInfo,
+    leaderboard,
+    waiting_participants: waiting,
+    stats: {
+      total_participants: participants.length,
+      completed_submissions: leaderboard.length,
+      waiting_submissions: waiting.length,
+      average_score: scores.length ? Math.round((scores.reduce((a, b) => a + b, 0) / scores.length) * 10) / 10 : 0,
+      highest_score: scores.length ? Math.max(...scores) : 0,
+    },
+  }
+}
+
+/** Subscribe to an exam's live leaderboard; returns a function that closes the stream */
+export function subscribeExamStream(examCode: string, onUpdate: (board: LiveLeaderboard) => void): () => void {
+  const state: LiveState = { examInfo: {}, participants: new Map() }
+  let source: EventSource | null = null
+  let lastEventId = ""
+  let retryTimer: ReturnType<typeof setTimeout> | null = null
+  let lastUpdate = Date.now()
+  let closed = false
+
+  const apply = (type: string, data: any) => {
+    applyEvent(state, type, data)
+    lastUpdate = Date.now()
+    onUpdate(buildLeaderboard(state))
+  }
+
+  const poll = async () => {
+    const streaming = source?.readyState === EventSource.OPEN
+    if (closed || (streaming && Date.now() - lastUpdate < QUIET_STREAM_MS)) return
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/exam/leaderboard/${examCode}`)
+      if (!response.ok || closed) return
+      apply("snapshot", await response.json())
+    } catch {
+      // Next tick retries; the stream may be back by then
+    }
+  }
+  const pollTimer = setInterval(poll, POLL_INTERVAL_MS)
+
+  const connect = () => {
+    // EventSource resumes by itself after a dropped connection; a refused one
+    // (e.g. the per-exam stream cap) is retried here from the last event seen
+    const resume = lastEventId ? `?last_event_id=${encodeURIComponent(lastEventId)}` : ""
+    source = new EventSource(`${API_BASE_URL}/api/exam/stream/${examCode}${resume}`)
+    for (const type of EVENT_TYPES) {
+      source.addEventListener(type, (event) => {
+        const message = event as MessageEvent
+        lastEventId = message.lastEventId || lastEventId
+        apply(type, JSON.parse(message.data))
+      })
+    }
+    source.onerror = () => {
+      if (source?.readyState === EventSource.CLOSED && !closed) {
+        retryTimer = setTimeout(connect, 30000)
+      }
+    }
+  }
+
+  connect()
+  return () => {
+    closed = true
+    if (retryTimer) clearTimeout(retryTimer)
+    clearInterval(pollTimer)
+    source?.close()
+  }
+}